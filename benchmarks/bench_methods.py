@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks of the ETo and ETc methods on a prepared ETo object.
+"""
+import numpy as np
+from eto import ETo, eto_fused
+from benchmarks.common import SITE, SIZES, daily_inputs, hourly_inputs
+
+
+class EToFao(object):
+    params = (SIZES, ['D', 'h'], ['short', 'tall'])
+    param_names = ['n', 'freq', 'ref_crop']
+    timeout = 600
+
+    def setup(self, n, freq, ref_crop):
+        if freq == 'h':
+            data, day_of_year, hour = hourly_inputs(n)
+        else:
+            (data, day_of_year), hour = daily_inputs(n), None
+        self.et = ETo(data, freq, day_of_year=day_of_year, hour=hour, validate=False, **SITE)
+        self.et.ts_param.evaluate()
+
+    def time_eto_fao(self, n, freq, ref_crop):
+        self.et.eto_fao(ref_crop=ref_crop)
+
+    def peakmem_eto_fao(self, n, freq, ref_crop):
+        self.et.eto_fao(ref_crop=ref_crop)
+
+
+class EToHargreaves(object):
+    params = SIZES
+    param_names = ['n']
+    timeout = 600
+
+    def setup(self, n):
+        data, day_of_year = daily_inputs(n, 'minimal')
+        self.et = ETo(data, 'D', day_of_year=day_of_year, validate=False, **SITE)
+
+    def time_eto_hargreaves(self, n):
+        self.et.eto_hargreaves()
+
+    def peakmem_eto_hargreaves(self, n):
+        self.et.eto_hargreaves()
+
+
+class BatchStations(object):
+    """n rows split over 100 stations in (station x time) batch mode."""
+    params = SIZES
+    param_names = ['n']
+    timeout = 600
+
+    def setup(self, n):
+        data, day_of_year = daily_inputs(n)
+        n_time = max(1, n // 100)
+        self.data = {k: v[:100*n_time].reshape(100, n_time) for k, v in data.items()}
+        self.day_of_year = day_of_year[:n_time]
+        self.lat = np.linspace(-46, -35, 100)
+
+    def time_batch_eto_fao(self, n):
+        ETo(self.data, 'D', z_msl=500, lat=self.lat, day_of_year=self.day_of_year, validate=False).eto_fao()
+
+    def peakmem_batch_eto_fao(self, n):
+        ETo(self.data, 'D', z_msl=500, lat=self.lat, day_of_year=self.day_of_year, validate=False).eto_fao()
+
+
+class CropCoefficients(object):
+    """ETc methods with the memoised ETo cleared, so each call includes the Penman-Monteith evaluation."""
+    params = SIZES
+    param_names = ['n']
+    timeout = 600
+
+    def setup(self, n):
+        data, day_of_year = daily_inputs(n)
+        self.et = ETo(data, 'D', day_of_year=day_of_year, validate=False, **SITE)
+        self.et.ts_param.evaluate()
+
+    def time_etc(self, n):
+        self.et.ts_param.clear_results()
+        self.et.etc(crop='maize_grain', stage='mid')
+
+    def time_etc_dual(self, n):
+        self.et.ts_param.clear_results()
+        self.et.etc_dual(Kcb=0.8, Kr=0.7, Kc_max=1.2, few=0.3)
+
+    def time_etc_adj(self, n):
+        self.et.ts_param.clear_results()
+        self.et.etc_adj(Kc=1.1, TAW=100, Dr=60)
+
+    def peakmem_etc(self, n):
+        self.et.ts_param.clear_results()
+        self.et.etc(crop='maize_grain', stage='mid')
+
+
+class Fused(object):
+    params = (SIZES, ['numpy', 'numba'])
+    param_names = ['n', 'engine']
+    timeout = 600
+
+    def setup(self, n, engine):
+        if engine == 'numba':
+            try:
+                import numba  # noqa: F401
+            except ImportError:
+                raise NotImplementedError('numba is not installed')
+        self.data, self.day_of_year = daily_inputs(n)
+        # Compile the kernel outside the timed region
+        warm, day_of_year = daily_inputs(100)
+        eto_fused(warm, day_of_year=day_of_year, engine=engine, validate=False, **SITE)
+
+    def time_eto_fused(self, n, engine):
+        eto_fused(self.data, day_of_year=self.day_of_year, engine=engine, validate=False, **SITE)
+
+    def peakmem_eto_fused(self, n, engine):
+        eto_fused(self.data, day_of_year=self.day_of_year, engine=engine, validate=False, **SITE)
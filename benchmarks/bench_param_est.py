@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks of the parameter estimation for daily and hourly data, including the missing-data fallback paths.
+"""
+from eto import ETo
+from benchmarks.common import SCENARIOS, SITE, SIZES, daily_inputs, hourly_inputs
+
+
+class ParamEstDaily(object):
+    params = (SIZES, SCENARIOS)
+    param_names = ['n', 'scenario']
+    timeout = 600
+
+    def setup(self, n, scenario):
+        self.data, self.day_of_year = daily_inputs(n, scenario)
+
+    def _run(self):
+        ETo(self.data, 'D', day_of_year=self.day_of_year, validate=False, **SITE).ts_param.evaluate()
+
+    def time_param_est(self, n, scenario):
+        self._run()
+
+    def peakmem_param_est(self, n, scenario):
+        self._run()
+
+    def time_validate(self, n, scenario):
+        ETo(self.data, 'D', day_of_year=self.day_of_year, validate=True, **SITE)
+
+
+class ParamEstHourly(object):
+    params = SIZES
+    param_names = ['n']
+    timeout = 600
+
+    def setup(self, n):
+        self.data, self.day_of_year, self.hour = hourly_inputs(n)
+
+    def _run(self):
+        ETo(self.data, 'h', day_of_year=self.day_of_year, hour=self.hour, validate=False, **SITE).ts_param.evaluate()
+
+    def time_param_est(self, n):
+        self._run()
+
+    def peakmem_param_est(self, n):
+        self._run()
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Shared inputs for the benchmarks, seeded from the bundled example dataset.
+"""
+import os
+import numpy as np
+from eto import datasets
+
+# Rows per benchmark. 1e8 rows need tens of GB, so the largest sizes are opt-in through ETO_BENCH_MAX_SIZE.
+ALL_SIZES = [10**2, 10**4, 10**6, 10**8]
+SIZES = [n for n in ALL_SIZES if n <= float(os.environ.get('ETO_BENCH_MAX_SIZE', 10**6))]
+
+SITE = dict(z_msl=500, lat=-43.6, lon=172, TZ_lon=173)
+
+# Missing-data scenarios for the daily fallback paths
+SCENARIOS = ['example', 'minimal', 'humidity', 'gaps']
+
+_example = None
+
+
+def load_example():
+    """The example daily dataset as a dict of arrays and a datetime64[D] array, loaded once."""
+    global _example
+    if _example is None:
+        data, dates = datasets.load('example_daily', mmap=False)
+        _example = (data, dates)
+    return _example
+
+
+def _tile(arr, n):
+    return np.resize(arr, n)
+
+
+def _sat_vp(T):
+    return 0.6108*np.exp(17.27*T/(T + 237.3))
+
+
+def daily_inputs(n, scenario='example'):
+    """
+    n rows of daily data tiled from the example dataset, for one of the SCENARIOS:
+
+    - 'example': the example columns (R_s, T_max, T_min, e_a)
+    - 'minimal': T_min and T_max only, so e_a, R_s and U_2 take their fallbacks
+    - 'humidity': RH_min/RH_max instead of e_a, exercising the humidity cascade
+    - 'gaps': the example columns with 20% of R_s and e_a missing
+    """
+    example, dates = load_example()
+    data = {k: _tile(v, n) for k, v in example.items()}
+    day_of_year = _tile((dates - dates.astype('datetime64[Y]')).astype(int) + 1, n)
+    if scenario == 'minimal':
+        data = {'T_min': data['T_min'], 'T_max': data['T_max']}
+    elif scenario == 'humidity':
+        e_a = data.pop('e_a')
+        data['RH_max'] = np.minimum(100*e_a/_sat_vp(data['T_min']), 100)
+        data['RH_min'] = np.minimum(100*e_a/_sat_vp(data['T_max']), 100)
+    elif scenario == 'gaps':
+        rng = np.random.default_rng(42)
+        for name in ('R_s', 'e_a'):
+            data[name] = np.where(rng.random(n) < 0.2, np.nan, data[name])
+    return data, day_of_year
+
+
+def hourly_inputs(n):
+    """
+    n rows of hourly data (T_mean, RH_mean, R_s, U_z) disaggregated from the example daily dataset with a sinusoidal diurnal cycle.
+    """
+    example, dates = load_example()
+    hours = np.arange(n)
+    day = hours // 24 % len(dates)
+    hour = hours % 24
+    cycle = np.sin(np.pi*(hour - 6)/12)
+    T_min = example['T_min'][day]
+    T_max = example['T_max'][day]
+    T_mean = (T_max + T_min)/2 + (T_max - T_min)/2*cycle
+    e_a = np.where(np.isnan(example['e_a'][day]), _sat_vp(T_min), example['e_a'][day])
+    data = {
+        'T_mean': T_mean,
+        'RH_mean': np.minimum(100*e_a/_sat_vp(T_mean), 100),
+        'R_s': np.maximum(cycle, 0)*example['R_s'][day]/7.6,
+        'U_z': np.full(n, 2.5),
+    }
+    day_of_year = ((dates - dates.astype('datetime64[Y]')).astype(int) + 1)[day]
+    return data, day_of_year, hour
@@ -1,4 +1,8 @@
 from eto.core import ETo
+from eto.fused import eto_fused
+from eto.grid import eto_grid
+from eto.stream import eto_stream, eto_memmap
+from eto.parallel import eto_parallel
 import eto.datasets
 import eto.methods
 
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""
+Aggregation of time series to calendar periods with vectorised segment reductions.
+"""
+import numpy as np
+
+_hows = ('sum', 'mean', 'min', 'max')
+
+
+def segment_starts(labels):
+    """
+    Indices where each run of equal consecutive labels starts, for use with the ufunc reduceat methods.
+    """
+    labels = np.asarray(labels)
+    if labels.ndim != 1:
+        raise ValueError('labels must be 1-D')
+    if labels.size == 0:
+        return np.zeros(0, dtype=np.intp)
+    return np.flatnonzero(np.r_[True, labels[1:] != labels[:-1]])
+
+
+def _reduce(values, starts, how, min_count=None):
+    """The segment reduction of values over the time segments beginning at starts, and the valid count of each."""
+    if how not in _hows:
+        raise ValueError(f'how must be one of {_hows}, got {how!r}')
+    shape = values.shape[:-1] + (len(starts),)
+    if not len(starts):
+        return np.zeros(shape, dtype=values.dtype), np.zeros(shape, dtype=np.int64)
+    valid = ~np.isnan(values)
+    count = np.add.reduceat(valid, starts, axis=-1, dtype=np.int64)
+    if how in ('sum', 'mean'):
+        out = np.add.reduceat(np.where(valid, values, 0), starts, axis=-1)
+        if how == 'mean':
+            with np.errstate(invalid='ignore', divide='ignore'):
+                out /= count
+    elif how == 'min':
+        out = np.fmin.reduceat(values, starts, axis=-1)
+    else:
+        out = np.fmax.reduceat(values, starts, axis=-1)
+    out[count < (1 if min_count is None else min_count)] = np.nan
+    return out, count
+
+
+def aggregate(values, dates=None, period='D', how='sum', day_of_year=None, min_count=None):
+    """
+    Reduce a time series (e.g. hourly ETo) to calendar periods (e.g. daily totals) with one segment reduction per output, together with the number of values that went into each period so that incomplete periods can be flagged.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        1-D (time) or N-D array with time along the last axis, e.g. (station x time). NaN values are skipped and not counted.
+    dates : np.ndarray of datetime64 or None
+        Date or datetime of each time step. The rows of a period must be consecutive, as in any time ordered record.
+    period : str
+        Any numpy datetime unit to aggregate to: 'D' (default) for days, 'W', 'M' or 'Y'.
+    how : str
+        The reduction: 'sum' (default), 'mean', 'min' or 'max'.
+    day_of_year : np.ndarray of int or None
+        Used instead of dates to find the days when dates is not given (period 'D' only).
+    min_count : int or None
+        Periods with fewer valid values than min_count are set to NaN. Default keeps every period with at least one valid value.
+
+    Returns
+    -------
+    dict
+        'period': the label of each period (datetime64 of the period unit, or the day of year), 'values': the reduced values with the time axis replaced by the period axis, 'count': the number of valid values of each period, 'expected': the number of time steps a complete period holds (None without dates) and 'complete': whether count equals expected.
+    """
+    values = np.asarray(values)
+    n = values.shape[-1] if values.ndim else 0
+
+    expected = None
+    if dates is not None:
+        dates = np.asarray(dates)
+        if dates.dtype.kind != 'M':
+            raise ValueError('dates must be a datetime64 array')
+        if dates.shape != (n,):
+            raise ValueError('dates must be 1-D with the length of the time axis of values')
+        labels = dates.astype(f'datetime64[{period}]')
+        starts = segment_starts(labels)
+        labels = labels[starts]
+        ## Time steps in a complete period, from the record's time step
+        step = np.diff(dates).min() if n > 1 else np.timedelta64(1, np.datetime_data(dates.dtype)[0])
+        if n:
+            expected = ((labels + 1).astype(dates.dtype) - labels.astype(dates.dtype)) // step
+    elif day_of_year is not None:
+        if period != 'D':
+            raise ValueError("day_of_year can only be aggregated to period 'D'; pass dates for other periods")
+        day_of_year = np.asarray(day_of_year)
+        if day_of_year.shape != (n,):
+            raise ValueError('day_of_year must be 1-D with the length of the time axis of values')
+        starts = segment_starts(day_of_year)
+        labels = day_of_year[starts]
+    else:
+        raise ValueError('Either dates or day_of_year must be provided')
+
+    out, count = _reduce(values, starts, how, min_count)
+
+    return {'period': labels, 'values': out, 'count': count, 'expected': expected,
+            'complete': None if expected is None else count == expected}
+
+
+def eto_aggregate(self, method='eto_fao', period='D', how='sum', dates=None, min_count=None, **kwargs):
+    """
+    Evaluate an ETo or ETc method and aggregate its result to calendar periods, e.g. hourly ETo to daily totals (see aggregate).
+
+    Parameters
+    ----------
+    method : str or np.ndarray
+        The method to evaluate ('eto_fao' (default), 'eto_hargreaves', 'etc', 'etc_dual' or 'etc_adj'), or an array computed from this instance to aggregate.
+    period : str
+        Any numpy datetime unit to aggregate to: 'D' (default) for days, 'W', 'M' or 'Y'.
+    how : str
+        The reduction: 'sum' (default), 'mean', 'min' or 'max'.
+    dates : np.ndarray of datetime64 or None
+        Dates of the time steps. Default is the dates the instance was created with; without dates the day_of_year is used for daily periods.
+    min_count : int or None
+        Periods with fewer valid values than min_count are set to NaN.
+    **kwargs
+        Passed to the method.
+
+    Returns
+    -------
+    dict
+        The aggregate dict with 'period', 'values', 'count', 'expected' and 'complete'.
+    """
+    values = getattr(self, method)(**kwargs) if isinstance(method, str) else method
+    if dates is None:
+        dates = self.dates
+    day_of_year = None
+    if dates is None:
+        day_of_year = self.ts_param.time['day_of_year']
+        if np.ndim(day_of_year) != 1:
+            raise ValueError('Aggregation needs a 1-D time axis shared by all stations')
+    return aggregate(values, dates, period, how, day_of_year, min_count)
+
+
+def monthly_inputs(data, dates, how=None, min_count=None):
+    """
+    Aggregate daily met records to the monthly inputs of the monthly (freq='M') mode with one segment reduction per key. FAO 56 monthly estimates use mean daily values, so every input is averaged by default: T_min and T_max give the mean daily minimum and maximum, and R_s, R_n and n_sun the mean daily radiation (MJ/m2/day) and sunshine hours.
+
+    Parameters
+    ----------
+    data : dict of str to np.ndarray
+        Daily meteorological data, 1-D (time) or 2-D (station x time).
+    dates : np.ndarray of datetime64
+        Date of each day. The days of a month must be consecutive.
+    how : dict of str to str or None
+        Reduction per key overriding the mean, e.g. {'R_s': 'sum'} for monthly radiation totals (for reporting; ETo expects the means).
+    min_count : int, dict of str to int, or None
+        Months with fewer valid days than min_count (or than its entry for the key) are set to NaN for that key, e.g. {'R_s': 20} lets the radiation of months with few measured days be estimated by the FAO 56 fallbacks instead.
+
+    Returns
+    -------
+    tuple of (dict of str to np.ndarray, np.ndarray, dict of str to np.ndarray)
+        The monthly data, the datetime64[M] months (for ETo's dates) and the number of valid days of each key in each month.
+    """
+    dates = np.asarray(dates)
+    months = dates.astype('datetime64[M]')
+    starts = segment_starts(months)
+    how = how or {}
+    monthly = {}
+    counts = {}
+    for key, values in data.items():
+        values = np.asarray(values)
+        if values.shape[-1:] != dates.shape:
+            raise ValueError('dates must have the length of the time axis of data')
+        if values.dtype.kind != 'f':
+            values = values.astype(np.float64)
+        monthly[key], counts[key] = _reduce(values, starts, how.get(key, 'mean'), min_count.get(key) if isinstance(min_count, dict) else min_count)
+    return monthly, months[starts], counts
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+Astronomical terms of the radiation calculations and a cache of their per-site lookup tables.
+"""
+import threading
+from collections import OrderedDict
+import numpy as np
+
+
+def solar_terms(lat, day_of_year):
+    """
+    Latitude in radians, solar declination and inverse relative distance Earth-Sun (FAO Eq 22-24).
+    """
+    Day = day_of_year
+    phi = lat*np.pi/180
+    delta = 0.409*np.sin(2*np.pi*Day/365-1.39)
+    d_r = 1+0.033*np.cos(2*np.pi*Day/365)
+    return phi, delta, d_r
+
+
+def sunset_hour_angle(lat, day_of_year):
+    """
+    Sunset hour angle w_s in radians (FAO Eq 25).
+    """
+    phi, delta, d_r = solar_terms(lat, day_of_year)
+    return np.arccos(-np.tan(phi)*np.tan(delta))
+
+
+def ra_daily(lat, day_of_year, w_s=None):
+    """
+    Daily extraterrestrial radiation R_a in MJ/m2/day (FAO Eq 21).
+    """
+    phi, delta, d_r = solar_terms(lat, day_of_year)
+    if w_s is None:
+        w_s = np.arccos(-np.tan(phi)*np.tan(delta))
+    return 24*60/np.pi*0.082*d_r*(w_s*np.sin(phi)*np.sin(delta) + np.cos(phi)*np.cos(delta)*np.sin(w_s))
+
+
+def ra_hourly(lat, lon, TZ_lon, day_of_year, hour):
+    """
+    Hourly extraterrestrial radiation R_a in MJ/m2/hour (FAO Eq 28-33), clamped to >= 0 when the sun is below the horizon.
+    """
+    phi, delta, d_r = solar_terms(lat, day_of_year)
+    Day = day_of_year
+    b = (2*np.pi*(Day - 81))/364
+    S_c = 0.1645*np.sin(2*b) - 0.1255*np.cos(b) - 0.025*np.sin(b)
+    w = np.pi/12*(((hour+0.5) + 0.06667*(TZ_lon - lon) + S_c) - 12)
+    w_1 = w - (np.pi*1)/24
+    w_2 = w + (np.pi*1)/24
+
+    R_a = 12*60/np.pi*0.082*d_r*((w_2 - w_1)*np.sin(phi)*np.sin(delta) + np.cos(phi)*np.cos(delta)*(np.sin(w_2) - np.sin(w_1)))
+    return np.maximum(R_a, 0)
+
+
+def _is_index(arr, lo, hi):
+    """True if arr is an integer array with all values in [lo, hi]."""
+    arr = np.asarray(arr)
+    return np.issubdtype(arr.dtype, np.integer) and arr.size > 0 and arr.min() >= lo and arr.max() <= hi
+
+
+class AstroCache(object):
+    """
+    Least-recently-used cache of per-site astronomy tables. For daily data a table holds the sunset hour angle and R_a for each day of year (366 entries); for hourly data it holds R_a for each (day of year, hour) pair (366 x 24 entries). Looking up a long record is then a gather instead of a series of trig calls.
+
+    A cache can be shared between ETo instances by passing the same object as their astro_cache, or by passing True to use the module-level default_cache.
+
+    Parameters
+    ----------
+    maxsize : int
+        Maximum number of site tables to keep.
+    """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._tables = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._tables)
+
+    def clear(self):
+        """Remove all tables and reset the hit/miss counters."""
+        with self._lock:
+            self._tables.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def _get(self, key, build):
+        with self._lock:
+            table = self._tables.get(key)
+            if table is not None:
+                self._tables.move_to_end(key)
+                self.hits += 1
+                return table
+            self.misses += 1
+        table = build()
+        with self._lock:
+            self._tables[key] = table
+            self._tables.move_to_end(key)
+            while len(self._tables) > self.maxsize:
+                self._tables.popitem(last=False)
+        return table
+
+    def daily(self, lat):
+        """
+        Daily table for a latitude: dict with 'w_s' and 'R_a' arrays indexed by day of year.
+        """
+        def build():
+            Day = np.arange(367)
+            w_s = sunset_hour_angle(lat, Day)
+            return {'w_s': w_s, 'R_a': ra_daily(lat, Day, w_s)}
+
+        return self._get(('D', float(lat)), build)
+
+    def hourly(self, lat, lon, TZ_lon):
+        """
+        Hourly table for a site: dict with a 'w_s' array indexed by day of year and an 'R_a' array indexed by [day of year, hour].
+        """
+        def build():
+            Day = np.arange(367)
+            hour = np.arange(24)
+            return {'w_s': sunset_hour_angle(lat, Day), 'R_a': ra_hourly(lat, lon, TZ_lon, Day[:, np.newaxis], hour[np.newaxis, :])}
+
+        return self._get(('H', float(lat), float(lon), float(TZ_lon)), build)
+
+    def lookup(self, hourly, lat, lon, TZ_lon, day_of_year, hour):
+        """
+        The table for a site if it applies to the given temporal arrays, otherwise None. Tables only apply to scalar site parameters and integer day of year (1-366) and hour (0-23) arrays.
+        """
+        if lat is None or np.ndim(lat) != 0 or not _is_index(day_of_year, 1, 366):
+            return None
+        if hourly:
+            if lon is None or TZ_lon is None or np.ndim(lon) != 0 or np.ndim(TZ_lon) != 0:
+                return None
+            if not _is_index(hour, 0, 23):
+                return None
+            return self.hourly(lat, lon, TZ_lon)
+        return self.daily(lat)
+
+
+# Cache shared by ETo instances created with astro_cache=True
+default_cache = AstroCache()
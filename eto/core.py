@@ -4,10 +4,13 @@ Class to estimate reference ET (ETo) from the FAO 56 paper using a minimum of T_
 """
 import numpy as np
 from eto.param_est import param_est
-from eto.methods.ETo import eto_fao
+from eto.util import data_shape, temporal_arrays
+from eto.methods.ETo import eto_fao, eto_fao_cached
 from eto.methods.hargreaves import hargreaves
-from eto.crop_coefficients import etc, etc_adj, kc_adjust
+from eto.crop_coefficients import etc, etc_adj, etc_matrix, kc_adjust
 from eto.methods.dual_kc import etc_dual
+from eto.water_balance import etc_balance, etc_dual_balance
+from eto.aggregate import eto_aggregate
 
 
 class ETo(object):
@@ -21,61 +24,91 @@ class ETo(object):
     data : dict of str to np.ndarray, or None
         Input meteorological data. Keys are parameter names (R_n, R_s, G,
         T_min, T_max, T_mean, T_dew, RH_min, RH_max, RH_mean, n_sun, U_z,
-        P, e_a). All arrays must have the same length.
+        P, e_a). All arrays must have the same shape: 1-D (time) for a single
+        station, or 2-D (station x time) for a batch of stations.
+    z_msl, lat, lon, TZ_lon, z_u, K_rs : float or np.ndarray
+        Site parameters. In batch mode each may be a scalar shared by all
+        stations or a 1-D array with one value per station.
     freq : str
-        Time frequency: 'D' for daily, 'H' or 'h' for hourly.
+        Time frequency: 'D' for daily, 'H' or 'h' for hourly, 'M' for monthly (mean daily values of each month).
     day_of_year : np.ndarray of int, or None
-        Day of year (1-366). Required if dates is not provided.
+        Day of year (1-366). Required if dates is not provided. In batch mode
+        it is shared by all stations (1-D) or given per station (2-D).
     hour : np.ndarray of int, or None
         Hour of day (0-23). Required for hourly frequency if dates is not provided.
     dates : np.ndarray of datetime64, or None
-        Datetime array. Used to derive day_of_year and hour if they are not provided.
+        Datetime array. Used to derive day_of_year and hour if they are not provided. For monthly data the day of year is the FAO 56 mid-month day J = int(30.4 M - 15).
+    validate : bool or str
+        True or 'warn' (default) warns when input values are outside physically reasonable ranges, 'strict' raises a ValueError instead and False or 'off' skips the range checks.
+    astro_cache : AstroCache, bool, or None
+        Cache of the per-site extraterrestrial radiation tables. True shares eto.astro.default_cache between instances; None (default) computes the terms directly.
+    dtype : np.dtype
+        Working float dtype (default np.float64). With np.float32 the parameter estimation, ETo and ETc methods all run in single precision.
+    copy : bool
+        If True (default), the input arrays are copied. If False, arrays that already have the working dtype and are C-contiguous are used as given.
+    inplace : bool
+        If True, missing values of the input arrays are filled in place rather than in a copy. Only affects the caller's arrays when copy is False.
+    profiler : StageProfiler, bool, callable, or None
+        Per-stage timing and counters (see eto.profile.StageProfiler). True creates a new profiler and a callable receives each stage's metrics. None (default) records nothing.
+    filled : np.ndarray or None
+        Gap filling level of each row as returned by eto.gapfill.fill_gaps, recorded in est_val and est_flags.
+
+    Attributes
+    ----------
+    dates : np.ndarray or None
+        The dates the instance was created with, used by aggregate().
+    validation : dict
+        The input validation report: out-of-range counts and first indices per key, missing value counts and the coverage matrix (see eto.param_est.validate_inputs).
+    ts_param : TsParam
+        Lazy mapping of the input and derived parameters. Derived parameters are computed the first time they are read, so methods only compute what they need.
     """
 
+    dates = None
+
     def __init__(self, data=None, freq='D', z_msl=None, lat=None, lon=None, TZ_lon=None,
                  z_u=2, K_rs=0.16, a_s=0.25, b_s=0.5, alb=0.23,
-                 day_of_year=None, hour=None, dates=None, validate=True):
+                 day_of_year=None, hour=None, dates=None, validate=True, astro_cache=None, dtype=np.float64,
+                 copy=True, inplace=False, profiler=None, filled=None):
 
         if data is None:
             pass
         else:
-            # Validate data is a dict with consistent array lengths
-            if not isinstance(data, dict):
-                raise TypeError('data must be a dict of str to np.ndarray')
-            lengths = [len(v) for v in data.values()]
-            if lengths and len(set(lengths)) > 1:
-                raise ValueError('All arrays in data must have the same length')
-            n = lengths[0] if lengths else 0
+            # Validate data is a dict with consistent array shapes
+            shape = data_shape(data)
+            n = shape[-1] if shape else 0
 
-            # Derive temporal arrays
+            day_of_year, hour = temporal_arrays(freq, n, day_of_year, hour, dates)
             if dates is not None:
-                dates = np.asarray(dates)
-                day_of_year = (dates.astype('datetime64[D]') - dates.astype('datetime64[Y]')).astype(int) + 1
-                if 'h' in freq.lower():
-                    hour = (dates - dates.astype('datetime64[D]')).astype('timedelta64[h]').astype(int)
-            elif day_of_year is not None:
-                day_of_year = np.asarray(day_of_year)
-            else:
-                raise ValueError('Either dates or day_of_year must be provided')
-
-            # Validate temporal array lengths
-            if len(day_of_year) != n:
-                raise ValueError('day_of_year length must match data array length')
-            if 'h' in freq.lower():
-                if hour is None:
-                    raise ValueError('hour array or dates must be provided for hourly frequency')
-                hour = np.asarray(hour)
-                if len(hour) != n:
-                    raise ValueError('hour length must match data array length')
+                self.dates = np.asarray(dates)
 
             self.param_est(data, freq, z_msl, lat, lon, TZ_lon, z_u, K_rs, a_s, b_s, alb,
-                           day_of_year=day_of_year, hour=hour, validate=validate)
+                           day_of_year=day_of_year, hour=hour, validate=validate, astro_cache=astro_cache,
+                           dtype=dtype, copy=copy, inplace=inplace, profiler=profiler, filled=filled)
+
+    @property
+    def est_val(self):
+        """
+        Integer array tracking which parameters were estimated on each row. Each decimal digit counts the estimation levels used for one parameter (P, T_mean, e_a, R_s, R_n, G, U_z from the millions down to the ones); the tens of millions hold the gap filling level of the inputs (see eto.gapfill.fill_gaps). Reading it computes the estimated parameters that have not been computed yet.
+        """
+        return self.ts_param.est_val
+
+    @property
+    def est_flags(self):
+        """
+        uint16 bitmask of the estimation paths used on each row, one bit per path (see eto.flags.EST_FLAGS, e.g. 'e_a_RH_mean' or 'R_s_T_range'). It holds the same information as est_val in a quarter of the memory, and rows can be selected with a single bitwise and, e.g. ``et.est_flags & flag_mask('e_a') != 0``.
+        """
+        return self.ts_param.est_flags
 
 
 ### Add in the ETo methods
 ETo.param_est = param_est
 ETo.eto_fao = eto_fao
+ETo.eto_fao_cached = eto_fao_cached
 ETo.eto_hargreaves = hargreaves
 ETo.etc = etc
 ETo.etc_dual = etc_dual
 ETo.etc_adj = etc_adj
+ETo.etc_matrix = etc_matrix
+ETo.etc_balance = etc_balance
+ETo.etc_dual_balance = etc_dual_balance
+ETo.aggregate = eto_aggregate
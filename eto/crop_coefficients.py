@@ -3,6 +3,7 @@
 Crop coefficient functions for ETc estimation (FAO 56).
 """
 import numpy as np
+from eto.methods.ETo import eto_fao_cached
 
 
 # FAO 56 Table 12 — single crop coefficients (Kc_ini, Kc_mid, Kc_end)
@@ -56,21 +57,124 @@ def kc_adjust(Kc, u2, RH_min, h):
     return Kc + (0.04*(u2 - 2) - 0.004*(RH_min - 45)) * (h/3)**0.3
 
 
-def etc(self, Kc=None, crop=None, stage=None, **kwargs):
+def kc_max(Kcb, u2, RH_min, h):
+    """
+    Upper limit of Kc following rain or irrigation (FAO 56 Eq 72).
+
+    Parameters
+    ----------
+    Kcb : float or np.ndarray
+        Basal crop coefficient.
+    u2 : float or np.ndarray
+        Daily wind speed at 2 m (m/s).
+    RH_min : float or np.ndarray
+        Daily minimum relative humidity (%).
+    h : float or np.ndarray
+        Mean maximum plant height (m).
+
+    Returns
+    -------
+    float or np.ndarray
+        Kc_max.
+    """
+    return np.maximum(kc_adjust(1.2, u2, RH_min, h), np.asarray(Kcb) + 0.05)
+
+
+def _day_numbers(dates):
+    """Day numbers (days since 1970-01-01) of datetime64 dates, or the numeric values as given."""
+    dates = np.asarray(dates)
+    if dates.dtype.kind == 'M':
+        return dates.astype('datetime64[D]').astype(np.int64)
+    return dates
+
+
+def kc_curve(dates, planting, L, Kc=None, crop=None, fill=np.nan, dtype=np.float64):
+    """
+    Piecewise-linear FAO 56 crop coefficient curves (FAO 56 Fig 25, Eq 66) for many fields at once.
+
+    Kc is Kc_ini during the initial stage, rises linearly to Kc_mid over the development stage, stays at Kc_mid during the mid-season stage and falls linearly to Kc_end over the late season stage. The day of the season is counted from each field's planting date.
+
+    Parameters
+    ----------
+    dates : np.ndarray of datetime64 or int
+        Dates of the time series (n_time), or day numbers on the same scale as planting. Hourly dates are evaluated per day.
+    planting : datetime64, int, or np.ndarray
+        Planting date of each field (n_fields), or a single date shared by all fields.
+    L : sequence or np.ndarray
+        Stage lengths in days (L_ini, L_dev, L_mid, L_late), either shared by all fields or of shape (n_fields, 4).
+    Kc : sequence or np.ndarray, optional
+        Crop coefficients (Kc_ini, Kc_mid, Kc_end), either shared by all fields or of shape (n_fields, 3). Required if crop is not provided.
+    crop : str or np.ndarray of str, optional
+        Crop name of all fields or of each field, used to look up Kc in KC_TABLE.
+    fill : float
+        Kc outside the growing season (before planting and after the end of the late season stage). Default NaN.
+    dtype : np.dtype
+        dtype of the returned array.
+
+    Returns
+    -------
+    np.ndarray
+        Kc with shape (n_fields, n_time), or (n_time,) if planting, L and Kc are shared by all fields. Pass it as Kc to etc() for the (n_fields, n_time) ETc.
+    """
+    if Kc is None:
+        if crop is None:
+            raise ValueError('Either Kc or crop must be provided')
+        names, inverse = np.unique(np.char.lower(np.asarray(crop, dtype=str)), return_inverse=True)
+        unknown = [c for c in names if c not in KC_TABLE]
+        if unknown:
+            raise ValueError(f'Unknown crop: {unknown}. Available: {sorted(KC_TABLE.keys())}')
+        Kc = np.array([KC_TABLE[c] for c in names])[inverse.reshape(np.shape(crop))]
+
+    L = np.asarray(L, dtype=dtype)
+    Kc = np.asarray(Kc, dtype=dtype)
+    if L.shape[-1:] != (4,) or Kc.shape[-1:] != (3,):
+        raise ValueError('L must hold 4 stage lengths and Kc 3 crop coefficients per field')
+    if (L <= 0).any():
+        raise ValueError('Stage lengths must be positive')
+
+    planting = _day_numbers(planting)
+    # Fields on the first axis, time on the last
+    n_fields = np.broadcast_shapes(np.shape(planting), L.shape[:-1], Kc.shape[:-1])
+    field_shape = n_fields + (1,) if n_fields else ()
+    L_ini, L_dev, L_mid, L_late = (np.reshape(L[..., i], field_shape) if L.ndim > 1 else L[i] for i in range(4))
+    Kc_ini, Kc_mid, Kc_end = (np.reshape(Kc[..., i], field_shape) if Kc.ndim > 1 else Kc[i] for i in range(3))
+
+    day = (_day_numbers(dates) - np.reshape(planting, field_shape if np.ndim(planting) else ())).astype(dtype)
+    day = np.broadcast_to(day, n_fields + day.shape[-1:])
+
+    ## Development and late season progress (0 to 1), FAO 56 Eq 66
+    Kc_out = day - L_ini
+    Kc_out /= L_dev
+    np.clip(Kc_out, 0, 1, out=Kc_out)
+    Kc_out *= Kc_mid - Kc_ini
+    Kc_out += Kc_ini
+    f_late = day - (L_ini + L_dev + L_mid)
+    f_late /= L_late
+    np.clip(f_late, 0, 1, out=f_late)
+    f_late *= Kc_end - Kc_mid
+    Kc_out += f_late
+
+    Kc_out[(day < 0) | (day >= L_ini + L_dev + L_mid + L_late)] = fill
+    return Kc_out
+
+
+def etc(self, Kc=None, crop=None, stage=None, out=None, **kwargs):
     """
     Crop evapotranspiration ETc = Kc * ETo (FAO 56 Eq 58, single Kc).
 
     Parameters
     ----------
     Kc : float or np.ndarray, optional
-        Crop coefficient. If not provided, looked up from KC_TABLE.
+        Crop coefficient. If not provided, looked up from KC_TABLE. A (n_fields, n_time) array such as from kc_curve() gives the ETc of every field against the single ETo series.
     crop : str, optional
         Crop name (key in KC_TABLE). Required if Kc is not provided.
     stage : str, optional
         Growth stage: 'ini', 'mid', or 'end'. Required if crop is provided
         without Kc.
+    out : np.ndarray or None
+        Array with the shape of the input data to write the result into. If None, a new array is returned.
     **kwargs
-        Passed to eto_fao().
+        Passed to eto_fao(), whose result is memoised per instance.
 
     Returns
     -------
@@ -90,10 +194,53 @@ def etc(self, Kc=None, crop=None, stage=None, **kwargs):
             raise ValueError(f"stage must be 'ini', 'mid', or 'end', got '{stage}'")
         Kc = KC_TABLE[crop_lower][stage_idx[stage]]
 
-    return np.asarray(Kc) * self.eto_fao(**kwargs)
+    return np.multiply(np.asarray(Kc, dtype=self.ts_param.dtype), eto_fao_cached(self, **kwargs), out=out)
+
+
+def etc_matrix(self, crops=None, stages=None, table=None, out=None, **kwargs):
+    """
+    ETc for several crops and growth stages in one broadcast multiply against a single ETo evaluation.
+
+    Parameters
+    ----------
+    crops : list of str, optional
+        Crop names (keys in table). Default is every crop in the table, in table order.
+    stages : list of str, optional
+        Growth stages out of 'ini', 'mid' and 'end'. Default is all three.
+    table : dict of str to tuple of float, optional
+        Crop coefficient table of (Kc_ini, Kc_mid, Kc_end) per crop. Default is KC_TABLE; pass an extended copy (e.g. dict(KC_TABLE, my_crop=(0.4, 1.1, 0.6))) for custom crops.
+    out : np.ndarray or None
+        Array of shape (n_crops, n_stages) + the input data shape to write the result into. If None, a new array is returned.
+    **kwargs
+        Passed to eto_fao(), whose result is memoised per instance.
+
+    Returns
+    -------
+    np.ndarray
+        ETc in mm with shape (n_crops, n_stages) + the input data shape.
+    """
+    if table is None:
+        table = KC_TABLE
+    table = {k.lower(): v for k, v in table.items()}
+    if crops is None:
+        crops = list(table)
+    if stages is None:
+        stages = ['ini', 'mid', 'end']
+    unknown = [c for c in crops if c.lower() not in table]
+    if unknown:
+        raise ValueError(f'Unknown crop: {unknown}. Available: {sorted(table)}')
+    stage_idx = {'ini': 0, 'mid': 1, 'end': 2}
+    for stage in stages:
+        if stage not in stage_idx:
+            raise ValueError(f"stage must be 'ini', 'mid', or 'end', got '{stage}'")
+
+    ETo = eto_fao_cached(self, **kwargs)
+    Kc = np.array([[table[c.lower()][stage_idx[s]] for s in stages] for c in crops], dtype=self.ts_param.dtype).reshape(len(crops), len(stages))
+    Kc = Kc.reshape(Kc.shape + (1,)*ETo.ndim)
+    return np.multiply(Kc, ETo, out=out)
 
 
-def etc_adj(self, Kc, TAW, Dr, p=0.5, **kwargs):
+def etc_adj(self, Kc, TAW, Dr, p=0.5, out=None, **kwargs):
     """
     Adjusted ETc under water stress (FAO 56 Eq 84).
 
@@ -109,15 +256,18 @@ def etc_adj(self, Kc, TAW, Dr, p=0.5, **kwargs):
         Root zone depletion (mm).
     p : float
         Depletion fraction for no stress (default 0.5).
+    out : np.ndarray or None
+        Array with the shape of the input data to write the result into. If None, a new array is returned.
     **kwargs
-        Passed to eto_fao().
+        Passed to eto_fao(), whose result is memoised per instance.
 
     Returns
     -------
     np.ndarray
         ETc_adj in mm.
     """
-    TAW = np.asarray(TAW, dtype=np.float64)
-    Dr = np.asarray(Dr, dtype=np.float64)
+    dtype = self.ts_param.dtype
+    TAW = np.asarray(TAW, dtype=dtype)
+    Dr = np.asarray(Dr, dtype=dtype)
     Ks = np.clip((TAW - Dr) / ((1 - p) * TAW), 0, 1)
-    return Ks * np.asarray(Kc) * self.eto_fao(**kwargs)
+    return np.multiply(Ks * np.asarray(Kc, dtype=dtype), eto_fao_cached(self, **kwargs), out=out)
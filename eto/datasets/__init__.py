@@ -1,7 +1,14 @@
+import csv
+import hashlib
+import io
 import os
+import shutil
+import tempfile
+import zipfile
+import numpy as np
 
 
-__all__ = ['available', 'get_path']
+__all__ = ['available', 'get_path', 'load']
 
 _module_path = os.path.dirname(__file__)
 _available_csv = {p.split('.')[0]: p for p in os.listdir(_module_path) if p.endswith('.csv.zip')}
@@ -25,3 +32,100 @@ def get_path(dataset):
     else:
         msg = f"The dataset '{dataset}' is not available"
         raise ValueError(msg)
+
+
+def _cache_root(cache_dir):
+    if cache_dir is not None:
+        return cache_dir
+    return os.environ.get('ETO_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'eto'))
+
+
+# Hash of each data file for this process, keyed by path and checked against its size and mtime
+_hashes = {}
+
+
+def _file_hash(path):
+    stat = os.stat(path)
+    cached = _hashes.get(path)
+    if cached is not None and cached[:2] == (stat.st_size, stat.st_mtime_ns):
+        return cached[2]
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    digest = h.hexdigest()[:16]
+    _hashes[path] = (stat.st_size, stat.st_mtime_ns, digest)
+    return digest
+
+
+def _parse_csv_zip(path):
+    """Parse a zipped CSV with a 'date' column into a dict of float64 columns and a datetime64[D] array."""
+    with zipfile.ZipFile(path) as z:
+        with z.open(z.namelist()[0]) as f:
+            reader = csv.reader(io.TextIOWrapper(f))
+            header = next(reader)
+            columns = list(zip(*reader))
+
+    data = {}
+    dates = None
+    for name, col in zip(header, columns):
+        if name == 'date':
+            dates = np.array(col, dtype='datetime64[D]')
+        else:
+            data[name] = np.array([v if v else 'nan' for v in col], dtype=np.float64)
+    return data, dates
+
+
+def load(dataset, cache=True, mmap=True, cache_dir=None):
+    """
+    Load a bundled dataset as the dict of arrays and dates array that ETo expects, without pandas.
+
+    The first load parses the zipped CSV and stores each column as a .npy file in a cache directory keyed by the hash of the data file, so later loads only open those files (memory-mapped by default). The hash is computed once per process and reused while the file's size and mtime are unchanged.
+
+    Parameters
+    ----------
+    dataset : str
+        The name of the dataset, e.g. 'example_daily' or 'example_daily_results'. See ``available``.
+    cache : bool
+        Whether to read from and write to the binary cache. If the cache directory cannot be written, the data is parsed without it.
+    mmap : bool
+        Whether to memory-map the cached columns (read-only) instead of reading them into memory.
+    cache_dir : str or None
+        Cache directory. Default is $ETO_CACHE_DIR or ~/.cache/eto.
+
+    Returns
+    -------
+    tuple of (dict of str to np.ndarray, np.ndarray)
+        The data columns and the datetime64[D] dates.
+    """
+    path = get_path(dataset)
+    if not cache:
+        return _parse_csv_zip(path)
+
+    target = os.path.join(_cache_root(cache_dir), f'{dataset}-{_file_hash(path)}')
+    if not os.path.isdir(target):
+        data, dates = _parse_csv_zip(path)
+        tmp = None
+        try:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            tmp = tempfile.mkdtemp(dir=os.path.dirname(target))
+            for name, arr in data.items():
+                np.save(os.path.join(tmp, f'{name}.npy'), arr)
+            np.save(os.path.join(tmp, '_dates.npy'), dates)
+            try:
+                os.rename(tmp, target)
+            except OSError:
+                # Another process wrote the cache first
+                shutil.rmtree(tmp, ignore_errors=True)
+        except OSError:
+            if tmp is not None:
+                shutil.rmtree(tmp, ignore_errors=True)
+            return data, dates
+
+    mmap_mode = 'r' if mmap else None
+    data = {}
+    for file in sorted(os.listdir(target)):
+        if file.endswith('.npy') and file != '_dates.npy':
+            data[file[:-4]] = np.load(os.path.join(target, file), mmap_mode=mmap_mode)
+    dates = np.load(os.path.join(target, '_dates.npy'), mmap_mode=mmap_mode)
+    return data, dates
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+Compact bitmask of the estimation paths used for each row (see ETo.est_flags).
+"""
+import numpy as np
+
+# Estimation paths of each estimated parameter, in the order of its fallback chain (level 1, 2, ...)
+EST_PATHS = {
+    'P': ('P',),
+    'T_mean': ('T_mean',),
+    'e_a': ('e_a_RH_min_max', 'e_a_RH_max', 'e_a_RH_mean', 'e_a_T_min'),
+    'R_s': ('R_s_n_sun', 'R_s_T_range'),
+    'R_n': ('R_n',),
+    'G': ('G',),
+    'U_2': ('U_2',),
+    'filled': ('filled_interpolate', 'filled_climatology', 'filled_neighbours'),
+}
+
+# One bit per estimation path
+EST_FLAGS = {name: 1 << i for i, name in enumerate(name for paths in EST_PATHS.values() for name in paths)}
+
+flag_dtype = np.uint16
+
+# Weights of each estimated parameter (and of the input gap filling) in the decimal est_val
+est_weights = {'filled': 10000000, 'P': 1000000, 'T_mean': 100000, 'e_a': 10000, 'R_s': 1000, 'R_n': 100, 'G': 10, 'U_2': 1}
+
+## Per parameter: the flags of level 0 (not estimated), 1, 2, ... for indexing with the level counts
+_level_tables = {key: np.array([0] + [EST_FLAGS[name] for name in paths], dtype=flag_dtype) for key, paths in EST_PATHS.items()}
+
+
+def flags_from_counts(counts, shape):
+    """
+    The est_flags array for a dict of parameter to the number of estimation levels used on each row.
+    """
+    flags = np.zeros(shape, dtype=flag_dtype)
+    for key, level in counts.items():
+        flags |= _level_tables[key][level.astype(np.uint8, copy=False)]
+    return flags
+
+
+def flag_mask(*names):
+    """
+    The integer mask of the given flags, for filtering rows with a single bitwise and, e.g. ``est_flags & flag_mask('e_a') != 0``.
+
+    Parameters
+    ----------
+    *names : str
+        Flag names (keys of EST_FLAGS) or estimated parameter names (keys of EST_PATHS), which stand for all of the parameter's paths.
+
+    Returns
+    -------
+    int
+    """
+    mask = 0
+    for name in names:
+        if name in EST_FLAGS:
+            mask |= EST_FLAGS[name]
+        elif name in EST_PATHS:
+            mask |= flag_mask(*EST_PATHS[name])
+        else:
+            raise ValueError(f'Unknown flag: {name}. Available: {list(EST_FLAGS) + list(EST_PATHS)}')
+    return mask
+
+
+def decode_flags(est_flags):
+    """
+    Split est_flags into one boolean array per flag.
+
+    Parameters
+    ----------
+    est_flags : np.ndarray
+        Flags array as from ETo.est_flags.
+
+    Returns
+    -------
+    dict of str to np.ndarray
+        For each flag of EST_FLAGS, whether it is set on each row.
+    """
+    est_flags = np.asarray(est_flags)
+    return {name: (est_flags & bit) != 0 for name, bit in EST_FLAGS.items()}
+
+
+def flag_counts(est_flags, periods=None):
+    """
+    Count the rows on which each flag is set, over the whole (last) time axis or per period.
+
+    Parameters
+    ----------
+    est_flags : np.ndarray
+        Flags array as from ETo.est_flags, 1-D (time) or N-D with time last.
+    periods : np.ndarray or None
+        Period label of each time step, e.g. ``dates.astype('datetime64[M]')`` for monthly counts. Rows of a period do not need to be consecutive.
+
+    Returns
+    -------
+    dict of str to np.ndarray
+        For each flag of EST_FLAGS, the counts with the time axis removed, or replaced by a period axis ordered as ``np.unique(periods)``.
+    """
+    est_flags = np.asarray(est_flags)
+    if periods is None:
+        return {name: np.count_nonzero(est_flags & bit, axis=-1) for name, bit in EST_FLAGS.items()}
+
+    periods = np.asarray(periods)
+    if periods.shape != est_flags.shape[-1:]:
+        raise ValueError('periods must have one label per time step')
+    _, inverse = np.unique(periods, return_inverse=True)
+    order = np.argsort(inverse, kind='stable')
+    starts = np.flatnonzero(np.r_[True, np.diff(inverse[order]) != 0])
+    sorted_flags = est_flags[..., order]
+    return {name: np.add.reduceat((sorted_flags & bit) != 0, starts, axis=-1, dtype=np.int64) for name, bit in EST_FLAGS.items()}
+
+
+def est_val_from_flags(est_flags):
+    """
+    The decimal est_val (see ETo.est_val) encoded by est_flags.
+    """
+    est_flags = np.asarray(est_flags)
+    est_val = np.zeros(est_flags.shape, dtype=np.int64)
+    for key, paths in EST_PATHS.items():
+        for level, name in enumerate(paths, 1):
+            est_val += np.where(est_flags & EST_FLAGS[name], est_weights[key]*level, 0)
+    return est_val
+
+
+def flags_from_est_val(est_val):
+    """
+    The est_flags encoded by a decimal est_val, e.g. to convert stored est_val arrays.
+    """
+    est_val = np.asarray(est_val)
+    counts = {key: est_val // weight % 10 for key, weight in est_weights.items()}
+    return flags_from_counts(counts, est_val.shape)
@@ -0,0 +1,364 @@
+# -*- coding: utf-8 -*-
+"""
+Fused single-pass evaluation of the FAO 56 parameter estimation and Penman-Monteith equation.
+"""
+import math
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from eto.flags import flags_from_est_val
+from eto.param_est import boundary_T_mean, check_inputs, met_names
+from eto.util import data_shape, jit, resolve_engine, temporal_arrays
+
+
+# Intermediates that can be requested from the fused kernel, in kernel slot order
+FUSED_PARAMS = ('P', 'gamma', 'T_mean', 'e_max', 'e_min', 'e_s', 'e_mean', 'e_a', 'T_dew', 'VPD', 'delta', 'R_a', 'R_s', 'R_n', 'G', 'U_2')
+
+_GAMMA_COEF = 0.665*10**-3
+
+_DAILY_ONLY = ('e_max', 'e_min', 'e_s')
+_HOURLY_ONLY = ('e_mean',)
+
+
+def _freq_code(freq):
+    if 'h' in freq.lower():
+        return 1
+    elif freq.upper() == 'M':
+        return 2
+    else:
+        return 0
+
+
+def _ref_coefs(freq_code, ref_crop):
+    """Cn and the day/night Cd of the Penman-Monteith equation."""
+    if freq_code == 1:
+        if ref_crop == 'tall':
+            return 66.0, 0.25, 1.7
+        return 37.0, 0.34, 0.34
+    if ref_crop == 'tall':
+        return 1600.0, 0.38, 0.38
+    return 900.0, 0.34, 0.34
+
+
+def _fao_rows(R_n_in, R_s_in, G_in, T_min_in, T_max_in, T_mean_in, T_dew_in, RH_min_in, RH_max_in, RH_mean_in, n_sun_in, U_z_in, P_in, e_a_in, Day, hour, freq_code, z_msl, lat, lon, TZ_lon, z_u, K_rs, a_s, b_s, alb, Cn, Cd_day, Cd_night, max_ETo, min_ETo, T_mean_prev, has_prev, slots, out_eto, out_est, out_params):
+    """
+    Walk every row once and evaluate param_est and eto_fao on scalars. Inputs of length 1 are broadcast to all rows (used for parameters that were not provided). slots maps each entry of FUSED_PARAMS to a row of out_params, or -1 if it was not requested. T_mean_prev is the T_mean before the first row, used for the monthly G if has_prev is True.
+    """
+    n = out_eto.shape[0]
+    phi = lat*math.pi/180
+    default_rso = (a_s == 0.25) and (b_s == 0.5)
+
+    for i in range(n):
+        est = 0
+
+        ## Atmospheric components
+        P = P_in[i if P_in.shape[0] > 1 else 0]
+        if math.isnan(P):
+            est += 1000000
+            P = 101.3*((293 - 0.0065*z_msl)/293)**5.26
+        gamma = _GAMMA_COEF*P
+
+        ## Temperature and humidity components
+        T_min = T_min_in[i if T_min_in.shape[0] > 1 else 0]
+        T_max = T_max_in[i if T_max_in.shape[0] > 1 else 0]
+        T_mean = T_mean_in[i if T_mean_in.shape[0] > 1 else 0]
+        if math.isnan(T_mean):
+            est += 100000
+            T_mean = (T_max + T_min)/2
+
+        e_a = e_a_in[i if e_a_in.shape[0] > 1 else 0]
+        T_dew = T_dew_in[i if T_dew_in.shape[0] > 1 else 0]
+        e_max = np.nan
+        e_min = np.nan
+        e_s = np.nan
+        e_mean = np.nan
+        if freq_code == 1:
+            e_mean = 0.6108*math.exp(17.27*T_mean/(T_mean+237.3))
+            if math.isnan(e_a):
+                e_a = e_mean*RH_mean_in[i if RH_mean_in.shape[0] > 1 else 0]/100
+        else:
+            e_max = 0.6108*math.exp(17.27*T_max/(T_max+237.3))
+            e_min = 0.6108*math.exp(17.27*T_min/(T_min+237.3))
+            e_s = (e_max + e_min)/2
+            RH_max = RH_max_in[i if RH_max_in.shape[0] > 1 else 0]
+            if math.isnan(e_a):
+                e_a = 0.6108*math.exp(17.27*T_dew/(T_dew + 237.3))
+            if math.isnan(e_a):
+                est += 10000
+                e_a = (e_min*RH_max/100 + e_max*RH_min_in[i if RH_min_in.shape[0] > 1 else 0]/100)/2
+            if math.isnan(e_a):
+                est += 10000
+                e_a = e_min*RH_max/100
+            if math.isnan(e_a):
+                est += 10000
+                e_a = RH_mean_in[i if RH_mean_in.shape[0] > 1 else 0]/100*(e_max + e_min)/2
+            if math.isnan(e_a):
+                est += 10000
+                e_a = 0.6108*math.exp(17.27*T_min/(T_min + 237.3))
+
+        if math.isnan(T_dew) and e_a > 0:
+            ln_ratio = math.log(e_a/0.6108)
+            T_dew = 237.3*ln_ratio/(17.27 - ln_ratio)
+
+        if freq_code == 1:
+            VPD = e_mean - e_a
+        else:
+            VPD = e_s - e_a
+
+        delta = 4098*(0.6108*math.exp(17.27*T_mean/(T_mean + 237.3)))/((T_mean + 237.3)**2)
+
+        ## Radiation components
+        Day_i = Day[i]
+        sol_dec = 0.409*math.sin(2*math.pi*Day_i/365 - 1.39)
+        d_r = 1 + 0.033*math.cos(2*math.pi*Day_i/365)
+        ws_arg = -math.tan(phi)*math.tan(sol_dec)
+        if ws_arg < -1 or ws_arg > 1:
+            w_s = np.nan
+        else:
+            w_s = math.acos(ws_arg)
+
+        if freq_code == 1:
+            b = (2*math.pi*(Day_i - 81))/364
+            S_c = 0.1645*math.sin(2*b) - 0.1255*math.cos(b) - 0.025*math.sin(b)
+            w = math.pi/12*(((hour[i] + 0.5) + 0.06667*(TZ_lon - lon) + S_c) - 12)
+            w_1 = w - math.pi/24
+            w_2 = w + math.pi/24
+            R_a = 12*60/math.pi*0.082*d_r*((w_2 - w_1)*math.sin(phi)*math.sin(sol_dec) + math.cos(phi)*math.cos(sol_dec)*(math.sin(w_2) - math.sin(w_1)))
+            if R_a < 0:
+                R_a = 0.0
+        else:
+            R_a = 24*60/math.pi*0.082*d_r*(w_s*math.sin(phi)*math.sin(sol_dec) + math.cos(phi)*math.cos(sol_dec)*math.sin(w_s))
+
+        N = 24*w_s/math.pi
+
+        R_s = R_s_in[i if R_s_in.shape[0] > 1 else 0]
+        if math.isnan(R_s):
+            est += 1000
+            R_s = (a_s + b_s*n_sun_in[i if n_sun_in.shape[0] > 1 else 0]/N)*R_a
+        if math.isnan(R_s):
+            est += 1000
+            R_s = K_rs*np.sqrt(T_max - T_min)*R_a
+
+        if default_rso:
+            R_so = (0.75 + 2e-5*z_msl)*R_a
+        else:
+            R_so = (a_s + b_s)*R_a
+
+        R_n = R_n_in[i if R_n_in.shape[0] > 1 else 0]
+        if math.isnan(R_n):
+            est += 100
+            Rs_Rso = 1.0
+            if R_so > 0:
+                Rs_Rso = R_s/R_so
+                if Rs_Rso > 1.0:
+                    Rs_Rso = 1.0
+            if freq_code == 1:
+                R_nl = (2.043e-10)*((T_mean + 273.16)**4)*(0.34 - 0.14*np.sqrt(e_a))*(1.35*Rs_Rso - 0.35)
+            else:
+                R_nl = (4.903e-9)*(((T_max + 273.16)**4 + (T_min + 273.16)**4)/2)*(0.34 - 0.14*np.sqrt(e_a))*(1.35*Rs_Rso - 0.35)
+            R_n = (1 - alb)*R_s - R_nl
+
+        G = G_in[i if G_in.shape[0] > 1 else 0]
+        if math.isnan(G):
+            est += 10
+            if freq_code == 1:
+                if R_n > 0:
+                    G = 0.1*R_n
+                elif R_n <= 0:
+                    G = 0.5*R_n
+            elif freq_code == 2:
+                if i == 0 and not has_prev:
+                    G = 0.0
+                else:
+                    G = 0.14*(T_mean - T_mean_prev)
+            else:
+                G = 0.0
+        T_mean_prev = T_mean
+
+        ## Wind component
+        U_z = U_z_in[i if U_z_in.shape[0] > 1 else 0]
+        if math.isnan(U_z):
+            est += 1
+            U_2 = 2.0
+        else:
+            U_2 = U_z*4.87/math.log(67.8*z_u - 5.42)
+
+        ## ETo equation
+        if freq_code == 1:
+            Cd = Cd_day if R_n > 0 else Cd_night
+            ETo_FAO = (0.408*delta*(R_n - G) + gamma*Cn/(T_mean + 273)*U_2*(e_mean - e_a))/(delta + gamma*(1 + Cd*U_2))
+        else:
+            ETo_FAO = (0.408*delta*(R_n - G) + gamma*Cn/(T_mean + 273)*U_2*(e_s - e_a))/(delta + gamma*(1 + Cd_day*U_2))
+
+        if ETo_FAO < min_ETo:
+            ETo_FAO = min_ETo
+        if ETo_FAO > max_ETo:
+            ETo_FAO = np.nan
+
+        out_eto[i] = ETo_FAO
+        out_est[i] = est
+
+        if slots[0] >= 0:
+            out_params[slots[0], i] = P
+        if slots[1] >= 0:
+            out_params[slots[1], i] = gamma
+        if slots[2] >= 0:
+            out_params[slots[2], i] = T_mean
+        if slots[3] >= 0:
+            out_params[slots[3], i] = e_max
+        if slots[4] >= 0:
+            out_params[slots[4], i] = e_min
+        if slots[5] >= 0:
+            out_params[slots[5], i] = e_s
+        if slots[6] >= 0:
+            out_params[slots[6], i] = e_mean
+        if slots[7] >= 0:
+            out_params[slots[7], i] = e_a
+        if slots[8] >= 0:
+            out_params[slots[8], i] = T_dew
+        if slots[9] >= 0:
+            out_params[slots[9], i] = VPD
+        if slots[10] >= 0:
+            out_params[slots[10], i] = delta
+        if slots[11] >= 0:
+            out_params[slots[11], i] = R_a
+        if slots[12] >= 0:
+            out_params[slots[12], i] = R_s
+        if slots[13] >= 0:
+            out_params[slots[13], i] = R_n
+        if slots[14] >= 0:
+            out_params[slots[14], i] = G
+        if slots[15] >= 0:
+            out_params[slots[15], i] = U_2
+
+
+_fao_rows_jit = jit(_fao_rows)
+
+
+def _float_or_nan(value):
+    return np.nan if value is None else float(value)
+
+
+def _eto_numpy(data, freq, start, stop, site, day_of_year, hour, max_ETo, min_ETo, ref_crop, params, chunk_size, out_eto, out_est, out_params, T_mean_prev=None):
+    """
+    Pure-NumPy fallback: evaluate param_est and eto_fao on rows start to stop block by block so that the temporaries stay cache-sized. The last T_mean of each block is carried over for the monthly G.
+    """
+    from eto.core import ETo
+
+    for block_start in range(start, stop, chunk_size):
+        end = min(block_start + chunk_size, stop)
+        block = {k: v[block_start:end] for k, v in data.items()}
+        et = ETo()
+        et.param_est(block, freq, day_of_year=day_of_year[block_start:end], hour=None if hour is None else hour[block_start:end], validate=False, T_mean_prev=T_mean_prev, **site)
+        out_eto[block_start:end] = et.eto_fao(max_ETo, min_ETo, ref_crop)
+        out_est[block_start:end] = et.est_val
+        for j, name in enumerate(params):
+            out_params[j, block_start:end] = et.ts_param[name]
+        if freq.upper() == 'M':
+            T_mean_prev = et.ts_param['T_mean'][-1]
+
+
+def eto_fused(data, freq='D', z_msl=None, lat=None, lon=None, TZ_lon=None, z_u=2, K_rs=0.16, a_s=0.25, b_s=0.5, alb=0.23, day_of_year=None, hour=None, dates=None, max_ETo=15, min_ETo=0, ref_crop='short', params=(), validate=True, engine='auto', chunk_size=65536, n_threads=1):
+    """
+    Estimate FAO 56 Penman-Monteith ETo directly from the met data in a single pass over the rows, without materialising the intermediate series that ETo.param_est stores in ts_param. The results are the same as ``ETo(data, ...).eto_fao()``, but peak memory is roughly the inputs plus the outputs.
+
+    Parameters
+    ----------
+    data : dict of str to np.ndarray
+        Input meteorological data (see ETo).
+    freq : str
+        Time frequency: 'D' for daily, 'H' or 'h' for hourly, 'M' for monthly.
+    z_msl, lat, lon, TZ_lon, z_u, K_rs, a_s, b_s, alb
+        Site and coefficient parameters (see ETo).
+    day_of_year, hour, dates : np.ndarray or None
+        Temporal arrays (see ETo).
+    max_ETo : float or int
+        The max realistic value of ETo (mm).
+    min_ETo : float or int
+        The min realistic value of ETo (mm).
+    ref_crop : str
+        Reference crop type: 'short' (FAO 56 grass) or 'tall' (ASCE alfalfa).
+    params : sequence of str
+        Intermediates to return alongside ETo. Any of FUSED_PARAMS that applies to the frequency, plus 'est_val' and 'est_flags'.
+    validate : bool
+        If True (default), warn when input values are outside physically reasonable ranges.
+    engine : str
+        'numba' for the compiled single-pass kernel, 'numpy' for a blockwise NumPy evaluation, or 'auto' (default) to use numba when it is installed.
+    chunk_size : int
+        Rows per block for the 'numpy' engine, and per thread task when n_threads > 1.
+    n_threads : int
+        Number of threads. With more than one, the rows are split into chunks of chunk_size that are evaluated concurrently (both engines release the GIL in their array or compiled loops). The T_mean before each chunk is passed to it so the monthly G is the same as for a single pass.
+
+    Returns
+    -------
+    tuple of (np.ndarray, dict of str to np.ndarray)
+        Estimated ETo in mm and the requested intermediates.
+    """
+    engine = resolve_engine(engine)
+    shape = data_shape(data)
+    n = shape[-1] if shape else 0
+
+    day_of_year, hour = temporal_arrays(freq, n, day_of_year, hour, dates)
+    data = {k: np.asarray(v, dtype=np.float64) for k, v in data.items() if k in met_names}
+    if any(v.ndim != 1 for v in data.values()):
+        raise ValueError('eto_fused only supports 1-D (single station) data')
+    check_inputs(data, freq, validate)
+
+    freq_code = _freq_code(freq)
+    params = list(params)
+    want_est = 'est_val' in params
+    want_flags = 'est_flags' in params
+    params = [p for p in params if p not in ('est_val', 'est_flags')]
+    for name in params:
+        if (name not in FUSED_PARAMS) or (freq_code == 1 and name in _DAILY_ONLY) or (freq_code != 1 and name in _HOURLY_ONLY):
+            raise ValueError(f'{name} is not available for freq {freq}')
+
+    out_eto = np.empty(n)
+    out_est = np.empty(n, dtype=np.int64)
+    out_params = np.empty((len(params), n))
+
+    if engine == 'numba':
+        slots = np.full(len(FUSED_PARAMS), -1, dtype=np.int64)
+        for j, name in enumerate(params):
+            slots[FUSED_PARAMS.index(name)] = j
+        nan1 = np.full(1, np.nan)
+        ins = [np.ascontiguousarray(data[name]) if name in data else nan1 for name in met_names]
+        day_arr = np.asarray(day_of_year, dtype=np.float64)
+        hour_arr = np.zeros(1, dtype=np.float64) if hour is None else np.asarray(hour, dtype=np.float64)
+        Cn, Cd_day, Cd_night = _ref_coefs(freq_code, ref_crop)
+        coefs = (freq_code, _float_or_nan(z_msl), _float_or_nan(lat), _float_or_nan(lon), _float_or_nan(TZ_lon),
+                 float(z_u), float(K_rs), float(a_s), float(b_s), float(alb), Cn, Cd_day, Cd_night,
+                 float(max_ETo), float(min_ETo))
+
+        def run(start, stop, T_mean_prev):
+            rows = [v[start:stop] if v.shape[0] > 1 else v for v in ins]
+            _fao_rows_jit(*rows, day_arr[start:stop], hour_arr if hour is None else hour_arr[start:stop], *coefs,
+                          np.nan if T_mean_prev is None else float(T_mean_prev), T_mean_prev is not None,
+                          slots, out_eto[start:stop], out_est[start:stop], out_params[:, start:stop])
+    else:
+        site = dict(z_msl=z_msl, lat=lat, lon=lon, TZ_lon=TZ_lon, z_u=z_u, K_rs=K_rs, a_s=a_s, b_s=b_s, alb=alb)
+
+        def run(start, stop, T_mean_prev):
+            _eto_numpy(data, freq, start, stop, site, day_of_year, hour, max_ETo, min_ETo, ref_crop, params, int(chunk_size), out_eto, out_est, out_params, T_mean_prev)
+
+    if n_threads > 1 and n > chunk_size:
+        ## Independent chunks on a thread pool; the monthly G of each chunk starts from the T_mean before it
+        starts = range(0, n, int(chunk_size))
+        with ThreadPoolExecutor(max_workers=n_threads) as pool:
+            futures = [pool.submit(run, start, min(start + int(chunk_size), n),
+                                   boundary_T_mean(data, start - 1) if freq_code == 2 and start > 0 else None)
+                       for start in starts]
+            for future in futures:
+                future.result()
+    else:
+        run(0, n, None)
+
+    if engine == 'numba':
+        np.round(out_eto, 2, out=out_eto)
+
+    ts = {name: out_params[j] for j, name in enumerate(params)}
+    if want_est:
+        ts['est_val'] = out_est
+    if want_flags:
+        ts['est_flags'] = flags_from_est_val(out_est)
+
+    return out_eto, ts
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""
+Vectorised gap filling of the met inputs before the parameter estimation.
+"""
+import numpy as np
+
+# Level recorded for each filling method in est_val (the 'filled' digit) and est_flags
+fill_levels = {'interpolate': 1, 'climatology': 2, 'neighbours': 3}
+
+# Inputs filled by default: the minimum data, whose gaps stop the estimation. Gaps of other inputs are estimated by the FAO 56 fallbacks.
+fill_keys = ('T_min', 'T_max', 'T_mean', 'RH_mean')
+
+
+def interpolate_gaps(values, max_gap=None):
+    """
+    Fill gaps by linear interpolation between the valid values on either side, along the last (time) axis. Leading and trailing gaps are left missing.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        1-D (time) or N-D array with time along the last axis.
+    max_gap : int or None
+        Longest run of missing time steps to fill. Longer gaps are left missing. None fills every interior gap.
+
+    Returns
+    -------
+    np.ndarray
+        A filled copy of values.
+    """
+    values = np.asarray(values)
+    out = np.array(values, dtype=np.result_type(values.dtype, np.float32))
+    n = out.shape[-1] if out.ndim else 0
+    if not out.size:
+        return out
+    v = out.reshape(-1, n)
+    valid = ~np.isnan(v)
+    if valid.all():
+        return out
+
+    ## Index of the previous and next valid value of every time step
+    idx = np.arange(n)
+    prev = np.where(valid, idx, -1)
+    np.maximum.accumulate(prev, axis=1, out=prev)
+    nxt = np.where(valid, idx, n)[:, ::-1]
+    nxt = np.minimum.accumulate(nxt, axis=1)[:, ::-1]
+
+    gap = ~valid & (prev >= 0) & (nxt < n)
+    if max_gap is not None:
+        gap &= (nxt - prev - 1) <= max_gap
+    rows, cols = np.nonzero(gap)
+    p = prev[rows, cols]
+    q = nxt[rows, cols]
+    lo = v[rows, p]
+    v[rows, cols] = lo + (v[rows, q] - lo)*(cols - p)/(q - p)
+    return out
+
+
+def climatology_fill(values, day_of_year, hour=None):
+    """
+    Fill missing values with the mean of each series for the same day of year (and hour of day, for hourly data) over the record.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        1-D (time) or N-D array with time along the last axis. Each series (e.g. each station) has its own climatology.
+    day_of_year : np.ndarray of int
+        Day of year (1-366) of each time step, 1-D shared by all series.
+    hour : np.ndarray of int or None
+        Hour of day (0-23) of each time step, for an hourly climatology.
+
+    Returns
+    -------
+    np.ndarray
+        A filled copy of values. Days of year without any valid value stay missing.
+    """
+    values = np.asarray(values)
+    out = np.array(values, dtype=np.result_type(values.dtype, np.float32))
+    n = out.shape[-1] if out.ndim else 0
+    if not out.size:
+        return out
+    v = out.reshape(-1, n)
+    valid = ~np.isnan(v)
+    if valid.all():
+        return out
+
+    slot = np.asarray(day_of_year, dtype=np.intp) - 1
+    n_slots = 366
+    if hour is not None:
+        slot = slot*24 + np.asarray(hour, dtype=np.intp)
+        n_slots *= 24
+    ## One bincount over (series, slot) keys
+    key = np.arange(v.shape[0])[:, None]*n_slots + slot
+    sums = np.bincount(key[valid], weights=v[valid], minlength=v.shape[0]*n_slots)
+    counts = np.bincount(key[valid], minlength=v.shape[0]*n_slots)
+    missing = ~valid
+    with np.errstate(invalid='ignore', divide='ignore'):
+        v[missing] = (sums/counts)[key[missing]]
+    return out
+
+
+def neighbour_fill(values, weights=None, adjust=True):
+    """
+    Fill the missing values of each station from the weighted mean of the other stations at the same time step.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        2-D (station x time) array.
+    weights : np.ndarray or None
+        (station x station) weights of each neighbour (columns) for each station (rows), e.g. inverse distances. The diagonal is ignored. Default weights all other stations equally.
+    adjust : bool
+        If True (default), shift each neighbour by its mean difference to the station over the time steps where both are known, which removes systematic offsets such as elevation effects on temperature. Neighbours without common time steps are then ignored.
+
+    Returns
+    -------
+    np.ndarray
+        A filled copy of values. Time steps without any valid neighbour stay missing.
+    """
+    values = np.asarray(values)
+    if values.ndim != 2:
+        raise ValueError('neighbour_fill needs 2-D (station x time) values')
+    out = np.array(values, dtype=np.result_type(values.dtype, np.float32))
+    valid = ~np.isnan(out)
+    if valid.all():
+        return out
+
+    m = out.shape[0]
+    if weights is None:
+        weights = np.ones((m, m))
+    weights = np.array(weights, dtype=np.float64)
+    if weights.shape != (m, m):
+        raise ValueError(f'weights must have shape {(m, m)}')
+    np.fill_diagonal(weights, 0)
+
+    present = valid.astype(np.float64)
+    known = np.where(valid, out, 0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if adjust:
+            ## Mean difference of each station to each neighbour over their common time steps
+            common = present @ present.T
+            offset = (known @ present.T - present @ known.T)/common
+            weights *= common > 0
+            shift = (weights*np.nan_to_num(offset)) @ present
+        else:
+            shift = 0
+        est = (weights @ known + shift)/(weights @ present)
+    missing = ~valid
+    out[missing] = est[missing]
+    return out
+
+
+def fill_gaps(data, dates=None, day_of_year=None, hour=None, keys=None, methods=('interpolate', 'climatology'), max_gap=3, weights=None, adjust=True):
+    """
+    Fill the gaps of the met inputs with NumPy only, so that records with missing T_min/T_max (or T_mean/RH_mean) can still be passed to ETo. The methods are applied in order, each filling what the previous ones left, and the method used on each time step is returned for ETo's filled argument, which records it in est_val and est_flags.
+
+    Parameters
+    ----------
+    data : dict of str to np.ndarray
+        Input meteorological data, 1-D (time) or 2-D (station x time).
+    dates : np.ndarray of datetime64 or None
+        Dates of the time steps, used for the climatology.
+    day_of_year, hour : np.ndarray of int or None
+        Used for the climatology when dates is not given. The climatology is hourly when hour is given or the dates are sub-daily.
+    keys : sequence of str or None
+        The keys of data to fill. Default is the minimum data keys in data (T_min, T_max, T_mean and RH_mean).
+    methods : sequence of str
+        Any of 'interpolate' (linear, up to max_gap steps), 'climatology' (mean by day of year) and 'neighbours' (from the other stations, 2-D data only), in the order to apply them.
+    max_gap : int or None
+        Longest gap filled by interpolation (see interpolate_gaps).
+    weights : np.ndarray or None
+        Station weights for the neighbour fill (see neighbour_fill).
+    adjust : bool
+        Offset adjustment of the neighbour fill (see neighbour_fill).
+
+    Returns
+    -------
+    tuple of (dict of str to np.ndarray, np.ndarray)
+        A copy of data with the filled keys replaced, and a uint8 array with the shape of the data giving the highest fill level used on each time step over all keys (1 interpolate, 2 climatology, 3 neighbours, 0 not filled).
+    """
+    for method in methods:
+        if method not in fill_levels:
+            raise ValueError(f'Unknown fill method: {method}. Available: {list(fill_levels)}')
+    if keys is None:
+        keys = [k for k in fill_keys if k in data]
+
+    if 'climatology' in methods:
+        if dates is not None:
+            dates = np.asarray(dates)
+            day_of_year = (dates.astype('datetime64[D]') - dates.astype('datetime64[Y]')).astype(int) + 1
+            if np.datetime_data(dates.dtype)[0] in ('h', 'm', 's', 'ms', 'us', 'ns'):
+                hour = (dates - dates.astype('datetime64[D]')).astype('timedelta64[h]').astype(int)
+        elif day_of_year is None:
+            raise ValueError('The climatology fill needs dates or day_of_year')
+
+    out = dict(data)
+    filled = None
+    for key in keys:
+        v = np.asarray(data[key])
+        if filled is None:
+            filled = np.zeros(v.shape, dtype=np.uint8)
+        missing = np.isnan(v)
+        if not missing.any():
+            continue
+        for method in methods:
+            if method == 'interpolate':
+                v = interpolate_gaps(v, max_gap)
+            elif method == 'climatology':
+                v = climatology_fill(v, day_of_year, hour)
+            else:
+                v = neighbour_fill(v, weights, adjust)
+            now = missing & ~np.isnan(v)
+            np.maximum(filled, np.where(now, fill_levels[method], 0).astype(np.uint8), out=filled)
+            missing &= ~now
+            if not missing.any():
+                break
+        out[key] = v
+
+    if filled is None:
+        filled = np.zeros(np.shape(next(iter(data.values()))) if data else (0,), dtype=np.uint8)
+    return out, filled
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+Reference ET for gridded (time, y, x) data.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from eto.core import ETo
+from eto.param_est import boundary_T_mean, check_inputs, met_names
+from eto.util import data_shape, temporal_arrays
+
+
+def _lat_rows(lat):
+    """
+    Reduce a latitude grid that is constant along x to a (y, 1) column, so the latitude-only radiation terms are computed once per (row, day) and broadcast across the columns.
+    """
+    if lat is None or np.ndim(lat) == 0:
+        return lat
+    lat = np.asarray(lat, dtype=np.float64)
+    if lat.ndim == 1:
+        return lat[:, np.newaxis]
+    if np.all(lat == lat[:, :1]):
+        return lat[:, :1]
+    return lat
+
+
+def eto_grid(data, freq='D', z_msl=None, lat=None, lon=None, TZ_lon=None, z_u=2, K_rs=0.16, a_s=0.25, b_s=0.5, alb=0.23, day_of_year=None, hour=None, dates=None, validate=True, method='eto_fao', dtype=np.float64, n_threads=1, chunk_size=65536, **kwargs):
+    """
+    Estimate reference ET on a grid of (time, y, x) meteorological fields in one vectorised call.
+
+    Parameters
+    ----------
+    data : dict of str to np.ndarray
+        Input meteorological data (see ETo), each a 3-D (time, y, x) array.
+    freq : str
+        Time frequency: 'D' for daily, 'H' or 'h' for hourly, 'M' for monthly.
+    z_msl : float or np.ndarray
+        Elevation above mean sea level (m), as a scalar or a (y, x) grid.
+    lat : float or np.ndarray
+        Latitude (decimal degrees), as a scalar, a (y,) vector for regular grids, or a (y, x) grid. The extraterrestrial radiation terms are only computed per (y, x) cell when the latitude varies along x.
+    lon, TZ_lon : float or np.ndarray
+        Longitude and time zone longitude (decimal degrees), as scalars or (y, x) grids. Only needed for hourly data.
+    z_u, K_rs, a_s, b_s, alb
+        Coefficients (see ETo). z_u and K_rs may be (y, x) grids.
+    day_of_year, hour, dates : np.ndarray or None
+        1-D temporal arrays along the time axis (see ETo).
+    validate : bool
+        If True (default), warn when input values are outside physically reasonable ranges.
+    dtype : np.dtype
+        The floating point dtype of the working arrays and results (see ETo).
+    method : str
+        The ETo method to evaluate: 'eto_fao' (default) or 'eto_hargreaves'.
+    n_threads : int
+        Number of threads. With more than one, the time axis is split into chunks of about chunk_size grid values that are evaluated concurrently, each writing its slice of the result. The T_mean before each chunk is passed to it so the monthly G is the same as for a single pass.
+    chunk_size : int
+        Approximate number of grid values (time steps x cells) per thread task.
+    **kwargs
+        Passed to the method.
+
+    Returns
+    -------
+    np.ndarray
+        Estimated ETo in mm with shape (time, y, x).
+    """
+    shape = data_shape(data)
+    if len(shape) != 3:
+        raise ValueError('All arrays in data must be 3-D (time, y, x)')
+    day_of_year, hour = temporal_arrays(freq, shape[0], day_of_year, hour, dates)
+
+    if method not in ('eto_fao', 'eto_hargreaves'):
+        raise ValueError(f"method must be 'eto_fao' or 'eto_hargreaves', got '{method}'")
+    lat = _lat_rows(lat)
+
+    def run(start, stop, T_mean_prev, validate, out=None):
+        et = ETo()
+        et.param_est({k: v[start:stop] for k, v in data.items()}, freq, z_msl, lat, lon, TZ_lon, z_u, K_rs, a_s, b_s, alb,
+                     day_of_year=day_of_year[start:stop], hour=None if hour is None else hour[start:stop],
+                     validate=validate, time_axis=0, T_mean_prev=T_mean_prev, dtype=dtype)
+        return getattr(et, method)(out=out, **kwargs)
+
+    n = shape[0]
+    step = max(1, int(chunk_size) // max(1, int(np.prod(shape[1:]))))
+    if n_threads <= 1 or n <= step:
+        return run(0, n, None, validate)
+
+    ## Time chunks on a thread pool; the monthly G of each chunk starts from the T_mean before it
+    data = {k: np.asarray(v) for k, v in data.items()}
+    check_inputs({k: v for k, v in data.items() if k in met_names}, freq, validate)
+    out = np.empty(shape, dtype=dtype)
+    with ThreadPoolExecutor(max_workers=n_threads) as pool:
+        futures = [pool.submit(run, start, min(start + step, n),
+                               boundary_T_mean(data, start - 1, time_axis=0) if freq.upper() == 'M' and start > 0 else None,
+                               False, out[start:start + step])
+                   for start in range(0, n, step)]
+        for future in futures:
+            future.result()
+    return out
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+Peak memory measurement and memory planning for ETo runs.
+"""
+import tracemalloc
+import numpy as np
+from eto.flags import est_weights
+from eto.param_est import TsParam, _NODES, _freq_kind
+
+# The ts_param entries read by each method
+METHOD_PARAMS = {
+    'eto_fao': {'daily': ('delta', 'R_n', 'G', 'gamma', 'T_mean', 'U_2', 'e_s', 'e_a'),
+                'hourly': ('delta', 'R_n', 'G', 'gamma', 'T_mean', 'U_2', 'e_mean', 'e_a')},
+    'eto_hargreaves': {'daily': ('T_mean', 'T_max', 'T_min', 'R_a')},
+}
+for _method in ('etc', 'etc_dual', 'etc_adj'):
+    METHOD_PARAMS[_method] = METHOD_PARAMS['eto_fao']
+
+# Temporary arrays of n values alive at once while each node is computed, besides its result, counted from the
+# node's expressions (e.g. R_n holds R_ns, R_ns - _R_nl and the gap values). Bool masks are covered by rounding up.
+NODE_TEMPORARIES = {
+    'P': 1, 'gamma': 0, 'T_mean': 2, 'e_max': 3, 'e_min': 3, 'e_s': 1, 'e_mean': 3, 'e_a': 3, 'T_dew': 3,
+    'VPD': 0, 'delta': 3, '_w_s': 3, 'R_a': 5, '_N': 1, 'R_s': 3, '_R_nl': 5, 'R_n': 3, 'G': 3, 'U_2': 1,
+}
+# Hourly R_a keeps the declination, distance, equation of time and three hour angles alive with its expression
+NODE_TEMPORARIES_HOURLY = {'R_a': 11}
+# Nodes computed in float64 from the integer day of year whatever the working dtype; their temporaries and
+# their float64 result (cast to the working dtype) are counted at 8 bytes
+ASTRO_NODES = ('_w_s', 'R_a')
+# Temporaries of the method itself on top of its result (e.g. the aerodynamic term and one expression of eto_fao).
+# They can be alive while a node the method reads is first computed, so they add to the node temporaries.
+METHOD_TEMPORARIES = {'eto_fao': 3, 'eto_hargreaves': 2, 'etc': 3, 'etc_dual': 3, 'etc_adj': 3}
+
+
+def _planned_nodes(ts, keys, provided):
+    """The nodes that are computed for keys. A node whose own input is provided without gaps returns it as is, so its dependencies are not needed."""
+    needed = set()
+    stack = list(keys)
+    while stack:
+        key = stack.pop()
+        if key in needed or key not in _NODES:
+            continue
+        needed.add(key)
+        if key not in provided:
+            stack.extend(d for d in ts.deps(key) if d != key)
+    return needed
+
+
+def measure_peak(func, *args, **kwargs):
+    """
+    Call func(*args, **kwargs) and measure the peak memory it allocated with tracemalloc (NumPy reports its array allocations to tracemalloc).
+
+    If tracemalloc is already tracing, the caller's session and traces are kept and only its peak is reset. Python 3.8 cannot reset the peak, so there the 'peak' of a call made inside an existing session is measured against the session's peak so far and can be overstated.
+
+    Returns
+    -------
+    tuple
+        The result of func and a dict with 'peak' (the highest allocation above the starting point during the call) and 'retained' (the memory still allocated afterwards), in bytes.
+    """
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    elif hasattr(tracemalloc, 'reset_peak'):
+        tracemalloc.reset_peak()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        result = func(*args, **kwargs)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        if started:
+            tracemalloc.stop()
+    return result, {'peak': peak - base, 'retained': current - base}
+
+
+def plan_memory(n, freq='D', method='eto_fao', inputs=('T_min', 'T_max'), dtype=np.float64, est_val=False):
+    """
+    Predict an upper bound of the memory of a run over n values (rows, or stations x rows) before it is made. The computed parameters are found by walking the FAO 56 dependency graph from the parameters the method reads, stopping at parameters provided as inputs, and the temporaries are the method's METHOD_TEMPORARIES plus the largest NODE_TEMPORARIES among them, as each node's temporaries are freed before the next one runs.
+
+    Parameters
+    ----------
+    n : int
+        Number of values per input array.
+    freq : str
+        Time frequency: 'D' for daily, 'H' or 'h' for hourly, 'M' for monthly.
+    method : str
+        'eto_fao', 'eto_hargreaves', 'etc', 'etc_dual' or 'etc_adj'.
+    inputs : sequence of str
+        The input parameters that will be provided, assumed without gaps (an input with gaps is still estimated where it is missing, so leave it out to plan for its fallbacks).
+    dtype : np.dtype
+        The working float dtype.
+    est_val : bool
+        Whether est_val will be read.
+
+    Returns
+    -------
+    dict of str to int
+        Predicted bytes of the 'inputs' (copies held by ts_param), the computed 'params', the estimation 'flags' (one byte per value for each estimated parameter), the 'result', the 'transient' temporaries and the 'peak' total.
+    """
+    kind = _freq_kind(freq)
+    keys = METHOD_PARAMS[method].get('hourly' if kind == 'H' else 'daily')
+    if keys is None:
+        raise ValueError(f'{method} is not available for freq {freq}')
+    itemsize = np.dtype(dtype).itemsize
+    ts = TsParam({}, freq, (0,), {}, {}, dtype=dtype)
+    provided = {k for k in inputs if k in _NODES and k in _NODES[k][0]}
+    if est_val:
+        keys = tuple(keys) + tuple(k for k in est_weights if k in _NODES)
+    nodes = _planned_nodes(ts, keys, provided)
+    computed = nodes.difference(provided)
+    temporaries = dict(NODE_TEMPORARIES, **NODE_TEMPORARIES_HOURLY) if kind == 'H' else NODE_TEMPORARIES
+    node_bytes = [(temporaries[k] + 1)*8 if k in ASTRO_NODES else temporaries[k]*itemsize for k in computed]
+
+    plan = {
+        'inputs': len(inputs)*n*itemsize,
+        'params': len(computed)*n*itemsize,
+        'flags': len(computed.intersection(est_weights))*n,
+        'result': n*itemsize*(2 if method.startswith('etc') else 1),
+        'transient': (METHOD_TEMPORARIES[method]*itemsize + max(node_bytes, default=0))*n,
+    }
+    if est_val:
+        # The est_val array, and the cast and weighted copy of one count array while it is summed
+        est_size = 4 if itemsize < 8 else 8
+        plan['params'] += n*est_size
+        plan['transient'] = max(plan['transient'], 2*n*est_size)
+    plan['peak'] = sum(plan.values())
+    return plan
+
+
+def plan_chunk_size(memory_limit, freq='D', method='eto_fao', inputs=('T_min', 'T_max'), dtype=np.float64, est_val=False):
+    """
+    The largest number of values per chunk (e.g. the chunk_size of eto_fused or the block length for eto_stream) whose predicted peak memory (see plan_memory) fits in memory_limit bytes.
+    """
+    per_value = plan_memory(1, freq, method, inputs, dtype, est_val)['peak']
+    n = int(memory_limit // per_value)
+    if n < 1:
+        raise ValueError(f'memory_limit is too small for a single value ({per_value} bytes)')
+    return n
@@ -3,9 +3,12 @@
 Function to estimate reference ET (ETo) from the FAO 56 paper using a minimum of T_min and T_max for daily estimates and T_mean and RH_mean for hourly, but utilizing the maximum number of available met parameters.
 """
 import numpy as np
+from eto.profile import profiled
+from eto.util import out_array
 
 
-def eto_fao(self, max_ETo=15, min_ETo=0, ref_crop='short'):
+@profiled('eto_fao')
+def eto_fao(self, max_ETo=15, min_ETo=0, ref_crop='short', out=None):
     """
     Function to estimate reference ET (ETo) from the `FAO 56 paper <http://www.fao.org/docrep/X0490E/X0490E00.htm>`_ [1]_ using a minimum of T_min and T_max for daily estimates and T_mean and RH_mean for hourly, but optionally utilising the maximum number of available met parameters.
 
@@ -17,28 +20,32 @@ def eto_fao(self, max_ETo=15, min_ETo=0, ref_crop='short'):
         The min realistic value of ETo (mm).
     ref_crop : str
         Reference crop type: 'short' (FAO 56 grass) or 'tall' (ASCE alfalfa).
+    out : np.ndarray or None
+        Array with the shape of the input data to write the result into. If None, a new array is returned.
 
     Returns
     -------
     np.ndarray
-        Estimated ETo in mm.
+        Estimated ETo in mm (out if it was provided).
 
     References
     ----------
 
     .. [1] Allen, R. G., Pereira, L. S., Raes, D., & Smith, M. (1998). Crop evapotranspiration-Guidelines for computing crop water requirements-FAO Irrigation and drainage paper 56. FAO, Rome, 300(9), D05109.
     """
+    ts = self.ts_param
+    ETo_FAO = out_array(out, ts.shape, ts.dtype)
 
     ######
     ## ETo equation — select Cn and Cd based on ref_crop and frequency
     if 'h' in self.freq.lower():
         if ref_crop == 'tall':
             Cn = 66
-            Cd = np.where(self.ts_param['R_n'] > 0, 0.25, 1.7)
+            Cd = np.where(ts['R_n'] > 0, 0.25, 1.7).astype(ts.dtype)
         else:
             Cn = 37
             Cd = 0.34
-        ETo_FAO = (0.408*self.ts_param['delta']*(self.ts_param['R_n'] - self.ts_param['G']) + self.ts_param['gamma']*Cn/(self.ts_param['T_mean'] + 273)*self.ts_param['U_2']*(self.ts_param['e_mean'] - self.ts_param['e_a']))/(self.ts_param['delta'] + self.ts_param['gamma']*(1 + Cd*self.ts_param['U_2']))
+        e_sat = ts['e_mean']
     else:
         if ref_crop == 'tall':
             Cn = 1600
@@ -46,10 +53,38 @@ def eto_fao(self, max_ETo=15, min_ETo=0, ref_crop='short'):
         else:
             Cn = 900
             Cd = 0.34
-        ETo_FAO = (0.408*self.ts_param['delta']*(self.ts_param['R_n'] - self.ts_param['G']) + self.ts_param['gamma']*Cn/(self.ts_param['T_mean'] + 273)*self.ts_param['U_2']*(self.ts_param['e_s'] - self.ts_param['e_a']))/(self.ts_param['delta'] + self.ts_param['gamma']*(1 + Cd*self.ts_param['U_2']))
+        e_sat = ts['e_s']
+
+    ## Evaluated into the result array, with the same operation order as
+    ## (0.408*delta*(R_n - G) + gamma*Cn/(T_mean + 273)*U_2*(e_sat - e_a))/(delta + gamma*(1 + Cd*U_2))
+    np.multiply(0.408, ts['delta'], out=ETo_FAO)
+    ETo_FAO *= ts['R_n'] - ts['G']
+    aero = ts['gamma']*Cn
+    aero /= ts['T_mean'] + 273
+    aero *= ts['U_2']
+    aero *= e_sat - ts['e_a']
+    ETo_FAO += aero
+    denom = np.multiply(Cd, ts['U_2'], out=aero)
+    denom += 1
+    denom *= ts['gamma']
+    denom += ts['delta']
+    ETo_FAO /= denom
 
     ## Clamp negatives to min_ETo, NaN for suspect highs
-    ETo_FAO = np.maximum(ETo_FAO, min_ETo)
+    np.maximum(ETo_FAO, min_ETo, out=ETo_FAO)
     ETo_FAO[ETo_FAO > max_ETo] = np.nan
 
-    return np.round(ETo_FAO, 2)
+    return np.round(ETo_FAO, 2, out=ETo_FAO)
+
+
+def eto_fao_cached(self, **kwargs):
+    """
+    The eto_fao result for the given keyword arguments, memoised per instance in ts_param and keyed by (method, ref_crop, max_ETo, min_ETo). Used by the crop coefficient methods so that evaluating many crops and stages reuses one ETo evaluation. The returned array is read-only.
+    """
+    params = dict(max_ETo=15, min_ETo=0, ref_crop='short')
+    unknown = set(kwargs).difference(params)
+    if unknown:
+        raise TypeError(f'eto_fao() got unexpected keyword arguments {sorted(unknown)}')
+    params.update(kwargs)
+    key = ('eto_fao', params['ref_crop'], params['max_ETo'], params['min_ETo'])
+    return self.ts_param.result(key, lambda: self.eto_fao(**params))
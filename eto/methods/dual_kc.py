@@ -3,9 +3,10 @@
 Dual crop coefficient method (FAO 56 Eq 58).
 """
 import numpy as np
+from eto.methods.ETo import eto_fao_cached
 
 
-def etc_dual(self, Kcb, Ke=None, Kr=None, Kc_max=None, few=None, **kwargs):
+def etc_dual(self, Kcb, Ke=None, Kr=None, Kc_max=None, few=None, out=None, **kwargs):
     """
     Dual crop coefficient ETc = (Kcb + Ke) * ETo (FAO 56 Eq 58).
 
@@ -23,22 +24,25 @@ def etc_dual(self, Kcb, Ke=None, Kr=None, Kc_max=None, few=None, **kwargs):
     few : float or np.ndarray, optional
         Fraction of soil surface wetted and exposed (0-1). Required if Ke
         not provided.
+    out : np.ndarray or None
+        Array with the shape of the input data to write the result into. If None, a new array is returned.
     **kwargs
-        Passed to eto_fao().
+        Passed to eto_fao(), whose result is memoised per instance.
 
     Returns
     -------
     np.ndarray
         ETc in mm.
     """
+    dtype = self.ts_param.dtype
     if Ke is None:
         if Kr is None or Kc_max is None or few is None:
             raise ValueError('When Ke is not provided, Kr, Kc_max, and few are required')
-        Kcb = np.asarray(Kcb, dtype=np.float64)
-        Kr = np.asarray(Kr, dtype=np.float64)
-        Kc_max = np.asarray(Kc_max, dtype=np.float64)
-        few = np.asarray(few, dtype=np.float64)
+        Kcb = np.asarray(Kcb, dtype=dtype)
+        Kr = np.asarray(Kr, dtype=dtype)
+        Kc_max = np.asarray(Kc_max, dtype=dtype)
+        few = np.asarray(few, dtype=dtype)
         # FAO 56 Eq 71: Ke = Kr * (Kc_max - Kcb), limited by few * Kc_max
         Ke = np.minimum(Kr * (Kc_max - Kcb), few * Kc_max)
 
-    return (np.asarray(Kcb) + np.asarray(Ke)) * self.eto_fao(**kwargs)
+    return np.multiply(np.asarray(Kcb, dtype=dtype) + np.asarray(Ke, dtype=dtype), eto_fao_cached(self, **kwargs), out=out)
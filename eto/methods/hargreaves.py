@@ -5,9 +5,12 @@ Created on Sun May 13 09:45:39 2018
 @author: MichaelEK
 """
 import numpy as np
+from eto.profile import profiled
+from eto.util import out_array
 
 
-def hargreaves(self, max_ETo=15, min_ETo=0):
+@profiled('eto_hargreaves')
+def hargreaves(self, max_ETo=15, min_ETo=0, out=None):
     """
     Function to estimate Hargreaves ETo using a minimum of T_min and T_max, but optionally utilising the maximum number of available met parameters.
 
@@ -17,11 +20,13 @@ def hargreaves(self, max_ETo=15, min_ETo=0):
         The max realistic value of ETo (mm).
     min_ETo : float or int
         The min realistic value of ETo (mm).
+    out : np.ndarray or None
+        Array with the shape of the input data to write the result into. If None, a new array is returned.
 
     Returns
     -------
     np.ndarray
-        Estimated ETo in mm.
+        Estimated ETo in mm (out if it was provided).
     """
 
     ######
@@ -30,10 +35,19 @@ def hargreaves(self, max_ETo=15, min_ETo=0):
     if 'h' in self.freq.lower():
         raise ValueError('Hargreaves should not be calculated at time frequencies of less than a day.')
 
-    ETo_Har = 0.0023*(self.ts_param['T_mean'] + 17.8)*((self.ts_param['T_max'] - self.ts_param['T_min']) **0.5)*self.ts_param['R_a']*0.408
+    ts = self.ts_param
+    ETo_Har = out_array(out, ts.shape, ts.dtype)
+
+    ## 0.0023*(T_mean + 17.8)*((T_max - T_min)**0.5)*R_a*0.408, evaluated into the result array
+    np.add(ts['T_mean'], 17.8, out=ETo_Har)
+    ETo_Har *= 0.0023
+    T_range = ts['T_max'] - ts['T_min']
+    ETo_Har *= np.sqrt(T_range, out=T_range)
+    ETo_Har *= ts['R_a']
+    ETo_Har *= 0.408
 
     ## Clamp negatives to min_ETo, NaN for suspect highs
-    ETo_Har = np.maximum(ETo_Har, min_ETo)
+    np.maximum(ETo_Har, min_ETo, out=ETo_Har)
     ETo_Har[ETo_Har > max_ETo] = np.nan
 
-    return np.round(ETo_Har, 2)
+    return np.round(ETo_Har, 2, out=ETo_Har)
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+Process-pool evaluation of large station sets with the inputs and results in shared memory.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+from eto.param_est import check_inputs, met_names, station_params
+from eto.util import data_shape, temporal_arrays
+
+
+def _to_shared(arr, dtype):
+    """Copy arr into a new shared memory block and return the block and its spec."""
+    arr = np.asarray(arr, dtype=dtype)
+    shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+    view = np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)
+    view[...] = arr
+    return shm, (shm.name, arr.shape, arr.dtype.str)
+
+
+def _attach(spec):
+    """Attach to a shared memory block from its spec and return the block and an array view of it."""
+    name, shape, dtype = spec
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def _run_stations(task):
+    """
+    Worker: evaluate the ETo method on a block of stations, reading the inputs from and writing the result to shared memory.
+    """
+    from eto.core import ETo
+
+    start, stop, specs, out_spec, site, temporal, freq, method, kwargs = task
+    blocks = []
+    try:
+        data = {}
+        for name, spec in specs.items():
+            shm, arr = _attach(spec)
+            blocks.append(shm)
+            data[name] = arr[start:stop]
+        shm, out = _attach(out_spec)
+        blocks.append(shm)
+
+        et = ETo()
+        et.param_est(data, freq, **site, **temporal, validate=False, dtype=out.dtype, copy=False)
+        getattr(et, method)(out=out[start:stop], **kwargs)
+        del data, out, et
+    finally:
+        for shm in blocks:
+            shm.close()
+    return start
+
+
+class StationPool(object):
+    """
+    A persistent pool of worker processes for eto_parallel. Creating the pool once and reusing it for every run avoids paying the process start-up cost per call.
+
+    Parameters
+    ----------
+    n_workers : int or None
+        Number of worker processes. Default is the number of CPUs.
+    mp_context : multiprocessing context or None
+        Context used to start the workers (default: the platform default).
+    """
+
+    def __init__(self, n_workers=None, mp_context=None):
+        self.n_workers = n_workers or os.cpu_count() or 1
+        self._executor = ProcessPoolExecutor(max_workers=self.n_workers, mp_context=mp_context)
+
+    def map(self, tasks):
+        """Run the station tasks on the pool and wait for them all."""
+        for _ in self._executor.map(_run_stations, tasks):
+            pass
+
+    def close(self):
+        """Shut the worker processes down."""
+        self._executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def eto_parallel(data, freq='D', z_msl=None, lat=None, lon=None, TZ_lon=None, z_u=2, K_rs=0.16, a_s=0.25, b_s=0.5, alb=0.23, day_of_year=None, hour=None, dates=None, validate=True, method='eto_fao', pool=None, n_workers=None, stations_per_task=None, dtype=np.float64, **kwargs):
+    """
+    Estimate reference ET for a large set of stations on a pool of worker processes. The (station x time) inputs and the result are placed in shared memory blocks, so the large arrays are not pickled: each task carries the block names, its station range, the temporal arrays, its slice of the per-station site parameters and of the method arguments. Each station block is evaluated with the same batch code as ETo, so the result is identical to the serial ``getattr(ETo(data, ...), method)(**kwargs)``.
+
+    Parameters
+    ----------
+    data : dict of str to np.ndarray
+        Input meteorological data as 2-D (station x time) arrays (see ETo).
+    freq : str
+        Time frequency: 'D' for daily, 'H' or 'h' for hourly, 'M' for monthly.
+    z_msl, lat, lon, TZ_lon, z_u, K_rs : float or np.ndarray
+        Site parameters, either shared by all stations or 1-D arrays with one value per station.
+    a_s, b_s, alb
+        Coefficient parameters (see ETo).
+    day_of_year, hour, dates : np.ndarray or None
+        Temporal arrays (see ETo), either 1-D shared by all stations or 2-D per station.
+    validate : bool
+        If True (default), warn when input values are outside physically reasonable ranges. The check runs once in the calling process.
+    method : str
+        The ETo method to evaluate: 'eto_fao' (default), 'eto_hargreaves', 'etc', 'etc_dual' or 'etc_adj'.
+    pool : StationPool or None
+        A persistent pool to run on. If None, a pool of n_workers processes is created for this call and shut down afterwards.
+    n_workers : int or None
+        Number of worker processes when pool is None. Default is the number of CPUs.
+    stations_per_task : int or None
+        Number of stations per task. Default splits the stations into four tasks per worker.
+    dtype : np.dtype
+        The floating point dtype of the working arrays and result (see ETo).
+    **kwargs
+        Passed to the method. 2-D arrays with one row per station, such as a (station x time) Kc, are sliced to each task's stations; other values are passed whole.
+
+    Returns
+    -------
+    np.ndarray
+        Result of the method for each station, of shape (station x time) in station order.
+    """
+    shape = data_shape(data)
+    if len(shape) != 2:
+        raise ValueError('data must be 2-D (station x time) arrays')
+    n_stations, n = shape
+    day_of_year, hour = temporal_arrays(freq, n, day_of_year, hour, dates)
+    check_inputs({name: np.asarray(data[name]) for name in met_names if name in data}, freq, validate)
+
+    own_pool = pool is None
+    if own_pool:
+        pool = StationPool(n_workers)
+    if stations_per_task is None:
+        stations_per_task = max(1, -(-n_stations // (4*pool.n_workers)))
+
+    site = dict(z_msl=z_msl, lat=lat, lon=lon, TZ_lon=TZ_lon, z_u=z_u, K_rs=K_rs, a_s=a_s, b_s=b_s, alb=alb)
+    blocks = []
+    try:
+        specs = {}
+        for name in met_names:
+            if name in data:
+                shm, specs[name] = _to_shared(data[name], dtype)
+                blocks.append(shm)
+        out_shm = shared_memory.SharedMemory(create=True, size=max(n_stations*n*np.dtype(dtype).itemsize, 1))
+        blocks.append(out_shm)
+        out_spec = (out_shm.name, shape, np.dtype(dtype).str)
+
+        tasks = []
+        for start in range(0, n_stations, stations_per_task):
+            stop = min(start + stations_per_task, n_stations)
+            ## Per-station site parameters and temporal arrays are sliced to the block of stations
+            task_site = {k: (np.asarray(v)[start:stop] if k in station_params and np.ndim(v) == 1 else v) for k, v in site.items()}
+            temporal = {k: (v[start:stop] if v is not None and np.ndim(v) == 2 else v) for k, v in (('day_of_year', day_of_year), ('hour', hour))}
+            ## Method arguments with one row per station (e.g. a (station x time) Kc) are sliced the same way
+            task_kwargs = {k: (v[start:stop] if isinstance(v, np.ndarray) and v.ndim == 2 and v.shape[0] == n_stations else v) for k, v in kwargs.items()}
+            tasks.append((start, stop, specs, out_spec, task_site, temporal, freq, method, task_kwargs))
+        pool.map(tasks)
+
+        return np.ndarray(shape, dtype=dtype, buffer=out_shm.buf).copy()
+    finally:
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
+        if own_pool:
+            pool.close()
@@ -3,252 +3,897 @@
 Function for parameter estimation.
 """
 import warnings
+from collections import OrderedDict
+from collections.abc import MutableMapping
 import numpy as np
+from eto.astro import default_cache, ra_daily, ra_hourly, sunset_hour_angle
+from eto.flags import est_weights, flags_from_counts
+from eto.profile import as_profiler
+
+
+def _as_float(data, key):
+    """Return data[key] as a float array (without upcasting float32), or None if the key is absent."""
+    if key not in data:
+        return None
+    v = np.asarray(data[key])
+    if v.dtype.kind != 'f':
+        v = v.astype(np.float64)
+    return v
+
+
+# Physically reasonable input ranges: (lower, upper, lower bound excluded, warning)
+input_ranges = {
+    'T_min': (-50, 60, False, 'T_min has values outside [-50, 60] °C'),
+    'T_max': (-50, 60, False, 'T_max has values outside [-50, 60] °C'),
+    'T_mean': (-50, 60, False, 'T_mean has values outside [-50, 60] °C'),
+    'T_dew': (-50, 60, False, 'T_dew has values outside [-50, 60] °C'),
+    'RH_min': (0, 100, False, 'RH_min has values outside [0, 100] %'),
+    'RH_max': (0, 100, False, 'RH_max has values outside [0, 100] %'),
+    'RH_mean': (0, 100, False, 'RH_mean has values outside [0, 100] %'),
+    'R_s': (0, np.inf, False, 'R_s has negative values'),
+    'U_z': (0, np.inf, False, 'U_z has negative values'),
+    'P': (0, np.inf, True, 'P has non-positive values'),
+}
+
+_validate_modes = {True: 'warn', False: 'off', 'warn': 'warn', 'strict': 'strict', 'off': 'off'}
+
+
+def validate_mode(validate):
+    """Resolve the validate argument (True, False, 'warn', 'strict' or 'off') to a mode name."""
+    try:
+        return _validate_modes[validate]
+    except (KeyError, TypeError):
+        raise ValueError(f"validate must be True, False, 'warn', 'strict' or 'off', got {validate!r}") from None
+
+
+def validate_inputs(data, freq, mode='warn'):
+    """
+    Check the inputs in a single pass per array: the out-of-range values of each key (see input_ranges), the missing values of every key and the minimum data requirements. Clean arrays only cost a min and a max reduction; the masks are only built for arrays that have missing or out-of-range values.
 
+    Parameters
+    ----------
+    data : dict of str to np.ndarray
+        Input meteorological data, 1-D (time) or N-D with time last. Missing keys are treated as all NaN.
+    freq : str
+        Time frequency string ('D' for daily, 'H'/'h' for hourly, 'M' for monthly).
+    mode : str
+        'warn' (default) warns for each key with out-of-range values, 'strict' raises a ValueError instead, and 'off' skips the range checks. The minimum data requirements are always enforced.
 
-def param_est(self, data, freq='D', z_msl=None, lat=None, lon=None, TZ_lon=None, z_u=2, K_rs=0.16, a_s=0.25, b_s=0.5, alb=0.23, day_of_year=None, hour=None, validate=True):
+    Returns
+    -------
+    dict
+        The report: 'mode'; 'out_of_range' and 'first_index', the number of out-of-range values of each checked key and the index of the first one (None if there are none); 'missing', the number of missing values of each provided key; 'keys' and 'coverage', the fraction of present values of each of met_names (rows) for each station (trailing axes); and 'ok', whether no values are out of range.
     """
-    Function to estimate the parameters necessary to calculate reference ET (ETo) from the `FAO 56 paper <http://www.fao.org/docrep/X0490E/X0490E00.htm>`_ using a minimum of T_min and T_max for daily estimates and T_mean and RH_mean for hourly, but optionally utilising the maximum number of available met parameters.
+    mode = validate_mode(mode)
+    shape = None
+    report = {'mode': mode, 'out_of_range': {}, 'first_index': {}, 'missing': {}}
+    present = {}
+
+    for key in met_names:
+        v = _as_float(data, key)
+        if v is None:
+            continue
+        shape = v.shape
+        lo = hi = np.nan
+        if v.size:
+            lo = np.minimum.reduce(v, axis=None)
+            hi = np.maximum.reduce(v, axis=None)
+        has_nan = np.isnan(lo)
+        check = mode != 'off' and key in input_ranges
+        if check:
+            lower, upper, open_lower, _ = input_ranges[key]
+            in_range = (lo > lower if open_lower else lo >= lower) and hi <= upper
+        if not has_nan:
+            report['missing'][key] = 0
+            present[key] = None
+            if check and in_range:
+                report['out_of_range'][key] = 0
+                report['first_index'][key] = None
+                continue
+
+        ## Masks only for arrays with missing or out-of-range values
+        if has_nan:
+            nan = np.isnan(v)
+            report['missing'][key] = int(np.count_nonzero(nan))
+            present[key] = v.shape[-1] - np.count_nonzero(nan, axis=-1) if v.ndim else 1 - nan
+        if check:
+            bad = (v <= lower) if open_lower else (v < lower)
+            bad |= v > upper
+            bad &= np.isfinite(v)
+            count = int(np.count_nonzero(bad))
+            report['out_of_range'][key] = count
+            if count:
+                first = np.unravel_index(np.argmax(bad), v.shape)
+                report['first_index'][key] = int(first[0]) if v.ndim == 1 else tuple(int(i) for i in first)
+            else:
+                report['first_index'][key] = None
+
+    ## Coverage matrix: one row per met_names entry, one column per station
+    lead = shape[:-1] if shape else ()
+    n = shape[-1] if shape else 0
+    coverage = np.zeros((len(met_names),) + lead)
+    for i, key in enumerate(met_names):
+        if key in present:
+            coverage[i] = 1 if present[key] is None or n == 0 else present[key]/n
+    report['keys'] = list(met_names)
+    report['coverage'] = coverage
+    report['ok'] = not any(report['out_of_range'].values())
+
+    bad_keys = [key for key, count in report['out_of_range'].items() if count]
+    if bad_keys:
+        if mode == 'strict':
+            raise ValueError('Input values out of range: ' + '; '.join(f"{input_ranges[key][3]} ({report['out_of_range'][key]} values, first at {report['first_index'][key]})" for key in bad_keys))
+        for key in bad_keys:
+            warnings.warn(input_ranges[key][3])
+
+    def missing(key):
+        return report['missing'].get(key, 1) > 0
+
+    if 'h' in freq.lower():
+        if missing('T_mean') | (missing('RH_mean') & missing('e_a')):
+            raise ValueError('Minimum data input was not met. Check your data.')
+    else:
+        if missing('T_min') | missing('T_max'):
+            raise ValueError('Minimum data input was not met. Check your data.')
+
+    return report
+
+
+def check_inputs(data, freq, validate=True):
+    """
+    Warn about physically unreasonable input values and make sure the minimum data requirements are met.
 
     Parameters
     ----------
     data : dict of str to np.ndarray
-        Input meteorological data.
+        Input meteorological data. Missing keys are treated as all NaN.
     freq : str
         Time frequency string ('D' for daily, 'H'/'h' for hourly).
-    z_msl : float, int, or None
-        Elevation above mean sea level (m).
-    lat : float, int, or None
-        Latitude (decimal degrees).
-    lon : float, int, or None
-        Longitude (decimal degrees).
-    TZ_lon : float, int, or None
-        Longitude of the center of the time zone (decimal degrees).
-    z_u : float or int
-        Height of wind speed measurement (m). Default is 2 m.
-    K_rs : float
-        Rs calc coefficient (0.16 inland, 0.19 coastal).
-    a_s : float
-        Rs calc coefficient.
-    b_s : float
-        Rs calc coefficient.
-    alb : float
-        Albedo. Should be 0.23 for the reference crop.
-    day_of_year : np.ndarray of int
-        Day of year (1-366).
-    hour : np.ndarray of int or None
-        Hour of day (0-23). Required for hourly frequency.
-    validate : bool
-        If True (default), warn when input values are outside physically
-        reasonable ranges.
+    validate : bool or str
+        True or 'warn' to warn when input values are outside physically reasonable ranges, 'strict' to raise instead, False or 'off' to skip the range checks.
 
     Returns
     -------
-    None (populates self.ts_param and self.est_val)
+    dict
+        The validation report (see validate_inputs).
     """
+    return validate_inputs(data, freq, validate_mode(validate))
 
-    met_names = ['R_n', 'R_s', 'G', 'T_min', 'T_max', 'T_mean', 'T_dew', 'RH_min', 'RH_max', 'RH_mean', 'n_sun', 'U_z', 'P', 'e_a']
-    self.freq = freq
 
-    ####################################
-    ##### Set up the dict and estimated values array
-    n = len(day_of_year)
-    self.ts_param = {}
-    for name in met_names:
-        if name in data:
-            self.ts_param[name] = np.array(data[name], dtype=np.float64).copy()
-        else:
-            self.ts_param[name] = np.full(n, np.nan)
+met_names = ['R_n', 'R_s', 'G', 'T_min', 'T_max', 'T_mean', 'T_dew', 'RH_min', 'RH_max', 'RH_mean', 'n_sun', 'U_z', 'P', 'e_a']
 
-    self.est_val = np.zeros(n, dtype=np.int64)
 
-    ####################################
-    ###### Input range validation
-    if validate:
-        for t_key in ('T_min', 'T_max', 'T_mean', 'T_dew'):
-            v = self.ts_param[t_key]
-            if np.any(np.isfinite(v) & ((v < -50) | (v > 60))):
-                warnings.warn(f'{t_key} has values outside [-50, 60] °C')
-        for rh_key in ('RH_min', 'RH_max', 'RH_mean'):
-            v = self.ts_param[rh_key]
-            if np.any(np.isfinite(v) & ((v < 0) | (v > 100))):
-                warnings.warn(f'{rh_key} has values outside [0, 100] %')
-        v = self.ts_param['R_s']
-        if np.any(np.isfinite(v) & (v < 0)):
-            warnings.warn('R_s has negative values')
-        v = self.ts_param['U_z']
-        if np.any(np.isfinite(v) & (v < 0)):
-            warnings.warn('U_z has negative values')
-        v = self.ts_param['P']
-        if np.any(np.isfinite(v) & (v <= 0)):
-            warnings.warn('P has non-positive values')
+# Site parameters that may be given per station in batch mode
+station_params = ('z_msl', 'lat', 'lon', 'TZ_lon', 'z_u', 'K_rs')
 
-    ####################################
-    ###### Check to make sure minimum requirements are met
+
+def boundary_T_mean(data, index, time_axis=-1):
+    """
+    T_mean at one time step of the input data, estimated from T_min and T_max where it is missing as in param_est. Used as T_mean_prev for the monthly soil heat flux when a record is split into chunks.
+    """
+    T_max = np.take(np.asarray(data['T_max'], dtype=np.float64), index, axis=time_axis)
+    T_min = np.take(np.asarray(data['T_min'], dtype=np.float64), index, axis=time_axis)
+    estimate = (T_max + T_min)/2
+    if 'T_mean' not in data:
+        return estimate
+    T_mean = np.take(np.asarray(data['T_mean'], dtype=np.float64), index, axis=time_axis)
+    return np.where(np.isnan(T_mean), estimate, T_mean)
+
+
+def _station_param(value, ndim, dtype=np.float64):
+    """
+    Shape a per-station site parameter so that it broadcasts against (station x time) data arrays. Scalars are returned unchanged.
+    """
+    if value is None or np.ndim(value) == 0:
+        return value
+    value = np.asarray(value, dtype=dtype)
+    if value.ndim == ndim - 1:
+        value = value[..., np.newaxis]
+    return value
+
+
+def derived_names(freq):
+    """
+    Names of the derived (non-input) parameters available in ts_param for a time frequency.
+    """
     if 'h' in freq.lower():
-        T_mean_bool = np.isnan(self.ts_param['T_mean']).any()
-        RH_mean_bool = np.isnan(self.ts_param['RH_mean']).any()
-        e_a_bool = np.isnan(self.ts_param['e_a']).any()
-        if T_mean_bool | (RH_mean_bool & e_a_bool):
-            raise ValueError('Minimum data input was not met. Check your data.')
+        return ['gamma', 'e_mean', 'VPD', 'delta', 'R_a', 'U_2']
     else:
-        T_min_bool = np.isnan(self.ts_param['T_min']).any()
-        T_max_bool = np.isnan(self.ts_param['T_max']).any()
-        if T_min_bool | T_max_bool:
-            raise ValueError('Minimum data input was not met. Check your data.')
+        return ['gamma', 'e_max', 'e_min', 'e_s', 'VPD', 'delta', 'R_a', 'U_2']
 
-    ####################################
-    ###### Calculations
 
-    ######
-    ### Time index
-    Day = day_of_year
+####################################
+##### Dependency graph of the FAO 56 quantities
 
-    ######
-    ## Atmospheric components
+# key -> (inputs, deps by frequency kind, function). inputs are the raw met inputs read by the node, deps are the other nodes it reads.
+_NODES = {}
 
-    # Air Pressure
-    mask = np.isnan(self.ts_param['P'])
-    self.est_val[mask] += 1000000
-    self.ts_param['P'][mask] = 101.3*((293 - 0.0065*z_msl)/293)**5.26
 
-    # Psychrometric constant
-    self.ts_param['gamma'] = (0.665*10**-3)*self.ts_param['P']
+def _freq_kind(freq):
+    if 'h' in freq.lower():
+        return 'H'
+    elif freq.upper() == 'M':
+        return 'M'
+    else:
+        return 'D'
 
-    ######
-    ## Temperature and humidity components
-    mask = np.isnan(self.ts_param['T_mean'])
-    self.est_val[mask] += 100000
-    self.ts_param['T_mean'][mask] = (self.ts_param['T_max'][mask] + self.ts_param['T_min'][mask])/2
 
-    ## Vapor pressures
-    if 'h' in freq.lower():
-        self.ts_param['e_mean'] = 0.6108*np.exp(17.27*self.ts_param['T_mean']/(self.ts_param['T_mean']+237.3))
-        mask = np.isnan(self.ts_param['e_a'])
-        self.ts_param['e_a'][mask] = self.ts_param['e_mean'][mask]*self.ts_param['RH_mean'][mask]/100
+def _node(key, inputs=(), deps=(), hourly_deps=None, monthly_deps=None):
+    def register(func):
+        kinds = {'D': tuple(deps),
+                 'H': tuple(deps if hourly_deps is None else hourly_deps),
+                 'M': tuple(deps if monthly_deps is None else monthly_deps)}
+        _NODES[key] = (tuple(inputs), kinds, func)
+        return func
+    return register
+
+
+def _put(arr, mask, values):
+    """Assign values (scalar or broadcastable array) to arr where mask is True."""
+    if np.ndim(values) == 0:
+        arr[mask] = values
     else:
-        self.ts_param['e_max'] = 0.6108*np.exp(17.27*self.ts_param['T_max']/(self.ts_param['T_max']+237.3))
-        self.ts_param['e_min'] = 0.6108*np.exp(17.27*self.ts_param['T_min']/(self.ts_param['T_min']+237.3))
-        self.ts_param['e_s'] = (self.ts_param['e_max']+self.ts_param['e_min'])/2
-
-        # e_a if dewpoint temperature is known
-        mask = np.isnan(self.ts_param['e_a'])
-        self.ts_param['e_a'][mask] = 0.6108*np.exp(17.27*self.ts_param['T_dew'][mask]/(self.ts_param['T_dew'][mask] + 237.3))
-
-        # e_a if min and max temperatures and humidities are known
-        mask = np.isnan(self.ts_param['e_a'])
-        self.est_val[mask] += 10000
-        self.ts_param['e_a'][mask] = (self.ts_param['e_min'][mask] * self.ts_param['RH_max'][mask]/100 + self.ts_param['e_max'][mask] * self.ts_param['RH_min'][mask]/100)/2
-
-        # e_a if only max humidity is known (FAO Eq 18)
-        mask = np.isnan(self.ts_param['e_a'])
-        self.est_val[mask] += 10000
-        self.ts_param['e_a'][mask] = self.ts_param['e_min'][mask] * self.ts_param['RH_max'][mask]/100
-
-        # e_a if only mean humidity is known
-        mask = np.isnan(self.ts_param['e_a'])
-        self.est_val[mask] += 10000
-        self.ts_param['e_a'][mask] = self.ts_param['RH_mean'][mask]/100*(self.ts_param['e_max'][mask] + self.ts_param['e_min'][mask])/2
-
-        # e_a if humidity is not known
-        mask = np.isnan(self.ts_param['e_a'])
-        self.est_val[mask] += 10000
-        self.ts_param['e_a'][mask] = 0.6108*np.exp(17.27*self.ts_param['T_min'][mask]/(self.ts_param['T_min'][mask] + 237.3))
+        arr[mask] = np.broadcast_to(values, arr.shape)[mask]
 
-    # T_dew from e_a (inverse Magnus formula, FAO Eq 14 inverted)
-    mask = np.isnan(self.ts_param['T_dew']) & (self.ts_param['e_a'] > 0)
+
+def _sat_vp(T):
+    """Saturation vapour pressure (FAO Eq 11)."""
+    return 0.6108*np.exp(17.27*T/(T + 237.3))
+
+
+######
+## Atmospheric components
+
+@_node('P', inputs=('P',))
+def _est_P(ts):
+    P, mask = ts.input('P')
     if mask.any():
-        ln_ratio = np.log(self.ts_param['e_a'][mask] / 0.6108)
-        self.ts_param['T_dew'][mask] = 237.3 * ln_ratio / (17.27 - ln_ratio)
+        ts.flag('P', mask)
+        _put(P, mask, 101.3*((293 - 0.0065*ts.site['z_msl'])/293)**5.26)
+    return P
 
-    # VPD
-    if 'h' in freq.lower():
-        self.ts_param['VPD'] = self.ts_param['e_mean'] - self.ts_param['e_a']
+
+@_node('gamma', deps=('P',))
+def _est_gamma(ts):
+    # Psychrometric constant
+    return (0.665*10**-3)*ts['P']
+
+
+######
+## Temperature and humidity components
+
+@_node('T_mean', inputs=('T_mean', 'T_min', 'T_max'))
+def _est_T_mean(ts):
+    T_mean, mask = ts.input('T_mean')
+    if mask.any():
+        ts.flag('T_mean', mask)
+        _put(T_mean, mask, (ts['T_max'] + ts['T_min'])/2)
+    return T_mean
+
+
+@_node('e_max', inputs=('T_max',))
+def _est_e_max(ts):
+    return _sat_vp(ts['T_max'])
+
+
+@_node('e_min', inputs=('T_min',))
+def _est_e_min(ts):
+    return _sat_vp(ts['T_min'])
+
+
+@_node('e_s', deps=('e_max', 'e_min'))
+def _est_e_s(ts):
+    return (ts['e_max'] + ts['e_min'])/2
+
+
+@_node('e_mean', deps=('T_mean',))
+def _est_e_mean(ts):
+    return _sat_vp(ts['T_mean'])
+
+
+@_node('e_a', inputs=('e_a', 'T_dew', 'T_min', 'RH_min', 'RH_max', 'RH_mean'), deps=('e_max', 'e_min'), hourly_deps=('e_mean',))
+def _est_e_a(ts):
+    e_a, mask = ts.input('e_a')
+    if not mask.any():
+        return e_a
+
+    if ts.hourly:
+        _put(e_a, mask, ts['e_mean']*ts['RH_mean']/100)
+        return e_a
+
+    # e_a if dewpoint temperature is known
+    if ts.raw('T_dew') is not None:
+        _put(e_a, mask, _sat_vp(ts.raw('T_dew')))
+        mask = np.isnan(e_a)
+
+    # Each fallback below adds one level to the estimate count
+    counts = mask.astype(np.uint8)
+    e_min = ts['e_min']
+    e_max = ts['e_max']
+
+    # e_a if min and max temperatures and humidities are known
+    if mask.any() and ts.raw('RH_min') is not None and ts.raw('RH_max') is not None:
+        _put(e_a, mask, (e_min * ts['RH_max']/100 + e_max * ts['RH_min']/100)/2)
+        mask = np.isnan(e_a)
+    counts += mask
+
+    # e_a if only max humidity is known (FAO Eq 18)
+    if mask.any() and ts.raw('RH_max') is not None:
+        _put(e_a, mask, e_min * ts['RH_max']/100)
+        mask = np.isnan(e_a)
+    counts += mask
+
+    # e_a if only mean humidity is known
+    if mask.any() and ts.raw('RH_mean') is not None:
+        _put(e_a, mask, ts['RH_mean']/100*(e_max + e_min)/2)
+        mask = np.isnan(e_a)
+    counts += mask
+
+    # e_a if humidity is not known
+    if mask.any():
+        _put(e_a, mask, _sat_vp(ts['T_min']))
+
+    ts.flag('e_a', counts)
+    return e_a
+
+
+@_node('T_dew', inputs=('T_dew',), deps=('e_a',))
+def _est_T_dew(ts):
+    # T_dew from e_a (inverse Magnus formula, FAO Eq 14 inverted)
+    T_dew, mask = ts.input('T_dew')
+    if mask.any():
+        e_a = ts['e_a']
+        mask &= (e_a > 0)
+        if mask.any():
+            ln_ratio = np.log(np.broadcast_to(e_a, T_dew.shape)[mask] / 0.6108)
+            T_dew[mask] = 237.3 * ln_ratio / (17.27 - ln_ratio)
+    return T_dew
+
+
+@_node('VPD', deps=('e_s', 'e_a'), hourly_deps=('e_mean', 'e_a'))
+def _est_VPD(ts):
+    if ts.hourly:
+        return ts['e_mean'] - ts['e_a']
     else:
-        self.ts_param['VPD'] = self.ts_param['e_s'] - self.ts_param['e_a']
+        return ts['e_s'] - ts['e_a']
 
-    # Delta
-    self.ts_param['delta'] = 4098*(0.6108*np.exp(17.27*self.ts_param['T_mean']/(self.ts_param['T_mean'] + 237.3)))/((self.ts_param['T_mean'] + 237.3)**2)
 
+@_node('delta', deps=('T_mean',))
+def _est_delta(ts):
+    T_mean = ts['T_mean']
+    return 4098*(0.6108*np.exp(17.27*T_mean/(T_mean + 237.3)))/((T_mean + 237.3)**2)
 
-    ######
-    ## Raditation components
 
-    # R_a
-    phi = lat*np.pi/180
-    delta = 0.409*np.sin(2*np.pi*Day/365-1.39)
-    d_r = 1+0.033*np.cos(2*np.pi*Day/365)
-    w_s = np.arccos(-np.tan(phi)*np.tan(delta))
+######
+## Radiation components
 
-    if 'h' in freq.lower():
-        hour_vec = hour
-        b = (2*np.pi*(Day - 81))/364
-        S_c = 0.1645*np.sin(2*b) - 0.1255*np.cos(b) - 0.025*np.sin(b)
-        w = np.pi/12*(((hour_vec+0.5) + 0.06667*(TZ_lon - lon) + S_c) - 12)
-        w_1 = w - (np.pi*1)/24
-        w_2 = w + (np.pi*1)/24
-
-        self.ts_param['R_a'] = 12*60/np.pi*0.082*d_r*((w_2 - w_1)*np.sin(phi)*np.sin(delta) + np.cos(phi)*np.cos(delta)*(np.sin(w_2) - np.sin(w_1)))
-        self.ts_param['R_a'] = np.maximum(self.ts_param['R_a'], 0)
+def _astro_table(ts):
+    """The cached astronomy table for this site, or None if there is no cache or it does not apply."""
+    if ts.astro_cache is None:
+        return None
+    return ts.astro_cache.lookup(ts.hourly, ts.site['lat'], ts.site['lon'], ts.site['TZ_lon'], ts.time['day_of_year'], ts.time['hour'])
+
+
+@_node('_w_s')
+def _est_w_s(ts):
+    # Sunset hour angle (FAO Eq 25)
+    table = _astro_table(ts)
+    if table is not None:
+        return table['w_s'][ts.time['day_of_year']]
+    return sunset_hour_angle(ts.site['lat'], ts.time['day_of_year'])
+
+
+@_node('R_a', deps=('_w_s',), hourly_deps=())
+def _est_R_a(ts):
+    table = _astro_table(ts)
+    Day = ts.time['day_of_year']
+
+    if ts.hourly:
+        if table is not None:
+            return table['R_a'][Day, ts.time['hour']]
+        return ra_hourly(ts.site['lat'], ts.site['lon'], ts.site['TZ_lon'], Day, ts.time['hour'])
     else:
-        self.ts_param['R_a'] = 24*60/np.pi*0.082*d_r*(w_s*np.sin(phi)*np.sin(delta) + np.cos(phi)*np.cos(delta)*np.sin(w_s))
+        if table is not None:
+            return table['R_a'][Day]
+        return ra_daily(ts.site['lat'], Day, ts['_w_s'])
+
 
+@_node('_N', deps=('_w_s',))
+def _est_N(ts):
     # Daylight hours
-    N = 24*w_s/np.pi
+    return 24*ts['_w_s']/np.pi
+
+
+@_node('R_s', inputs=('R_s', 'n_sun', 'T_max', 'T_min'), deps=('R_a', '_N'))
+def _est_R_s(ts):
+    R_s, mask = ts.input('R_s')
+    if not mask.any():
+        return R_s
+
+    a_s = ts.site['a_s']
+    b_s = ts.site['b_s']
+    R_a = ts['R_a']
 
     # R_s if n_sun is known
-    mask = np.isnan(self.ts_param['R_s'])
-    self.est_val[mask] += 1000
-    self.ts_param['R_s'][mask] = (a_s + b_s*self.ts_param['n_sun'][mask]/N[mask])*self.ts_param['R_a'][mask]
+    counts = mask.astype(np.uint8)
+    if ts.raw('n_sun') is not None:
+        _put(R_s, mask, (a_s + b_s*ts['n_sun']/ts['_N'])*R_a)
+        mask = np.isnan(R_s)
 
     # R_s if n_sun is not known
-    mask = np.isnan(self.ts_param['R_s'])
-    self.est_val[mask] += 1000
-    self.ts_param['R_s'][mask] = K_rs*((self.ts_param['T_max'][mask] - self.ts_param['T_min'][mask])**0.5)*self.ts_param['R_a'][mask]
+    counts += mask
+    if mask.any():
+        _put(R_s, mask, ts.site['K_rs']*((ts['T_max'] - ts['T_min'])**0.5)*R_a)
+
+    ts.flag('R_s', counts)
+    return R_s
+
+
+@_node('_R_nl', inputs=('T_max', 'T_min'), deps=('R_a', 'R_s', 'e_a'), hourly_deps=('R_a', 'R_s', 'e_a', 'T_mean'))
+def _est_R_nl(ts):
+    # Net longwave radiation
+    a_s = ts.site['a_s']
+    b_s = ts.site['b_s']
+    R_a = ts['R_a']
+    R_s = ts['R_s']
+    e_a = ts['e_a']
 
     # R_so (FAO Eq 37 for default coefficients, Eq 36 for calibrated)
     if a_s == 0.25 and b_s == 0.5:
-        R_so = (0.75 + 2e-5*z_msl) * self.ts_param['R_a']
+        R_so = (0.75 + 2e-5*ts.site['z_msl']) * R_a
     else:
-        R_so = (a_s + b_s) * self.ts_param['R_a']
-
-    # R_ns from R_s
-    R_ns = (1 - alb)*self.ts_param['R_s']
+        R_so = (a_s + b_s) * R_a
 
-    # R_nl — safe R_s/R_so ratio to avoid division by zero when R_so=0
-    Rs_Rso = np.where(R_so > 0, np.minimum(self.ts_param['R_s'] / np.where(R_so > 0, R_so, 1.0), 1.0), 1.0)
-    if 'h' in freq.lower():
-        R_nl = (2.043e-10)*((self.ts_param['T_mean'] + 273.16)**4)*(0.34-0.14*self.ts_param['e_a']**0.5)*(1.35*Rs_Rso - 0.35)
+    # Safe R_s/R_so ratio to avoid division by zero when R_so=0
+    Rs_Rso = np.where(R_so > 0, np.minimum(R_s / np.where(R_so > 0, R_so, 1.0), 1.0), 1.0)
+    if ts.hourly:
+        return (2.043e-10)*((ts['T_mean'] + 273.16)**4)*(0.34-0.14*e_a**0.5)*(1.35*Rs_Rso - 0.35)
     else:
-        R_nl = (4.903e-9)*(((self.ts_param['T_max'] + 273.16)**4 + (self.ts_param['T_min'] + 273.16)**4)/2)*(0.34-0.14*self.ts_param['e_a']**0.5)*(1.35*Rs_Rso - 0.35)
+        return (4.903e-9)*(((ts['T_max'] + 273.16)**4 + (ts['T_min'] + 273.16)**4)/2)*(0.34-0.14*e_a**0.5)*(1.35*Rs_Rso - 0.35)
 
-    # R_n
-    mask = np.isnan(self.ts_param['R_n'])
-    self.est_val[mask] += 100
-    self.ts_param['R_n'][mask] = R_ns[mask] - R_nl[mask]
 
-    # G
-    mask = np.isnan(self.ts_param['G'])
-    self.est_val[mask] += 10
-    if 'h' in freq.lower():
-        day_mask = mask & (self.ts_param['R_n'] > 0)
-        night_mask = mask & (self.ts_param['R_n'] <= 0)
-        self.ts_param['G'][day_mask] = 0.1 * self.ts_param['R_n'][day_mask]
-        self.ts_param['G'][night_mask] = 0.5 * self.ts_param['R_n'][night_mask]
-    elif freq.upper() == 'M':
-        G_monthly = np.zeros(n)
-        G_monthly[1:] = 0.14 * (self.ts_param['T_mean'][1:] - self.ts_param['T_mean'][:-1])
-        self.ts_param['G'][mask] = G_monthly[mask]
+@_node('R_n', inputs=('R_n',), deps=('R_s', '_R_nl'))
+def _est_R_n(ts):
+    R_n, mask = ts.input('R_n')
+    if not mask.any():
+        return R_n
+
+    # R_ns from R_s
+    R_ns = (1 - ts.site['alb'])*ts['R_s']
+
+    ts.flag('R_n', mask)
+    _put(R_n, mask, R_ns - ts['_R_nl'])
+    return R_n
+
+
+@_node('G', inputs=('G',), deps=(), hourly_deps=('R_n',), monthly_deps=('T_mean',))
+def _est_G(ts):
+    G, mask = ts.input('G')
+    if not mask.any():
+        return G
+
+    ts.flag('G', mask)
+    if ts.hourly:
+        R_n = ts['R_n']
+        day_mask = mask & (R_n > 0)
+        night_mask = mask & (R_n <= 0)
+        _put(G, day_mask, 0.1 * R_n)
+        _put(G, night_mask, 0.5 * R_n)
+    elif ts.freq.upper() == 'M':
+        T_mean = ts['T_mean']
+        axis = ts.time['axis']
+        later = [slice(None)]*G.ndim
+        later[axis] = slice(1, None)
+        G_monthly = np.zeros(G.shape, dtype=G.dtype)
+        G_monthly[tuple(later)] = 0.14 * np.diff(T_mean, axis=axis)
+        if ts.time.get('T_mean_prev') is not None:
+            # Continue from the last T_mean of the previous block
+            first = [slice(None)]*G.ndim
+            first[axis] = 0
+            G_monthly[tuple(first)] = 0.14 * (np.take(T_mean, 0, axis=axis) - ts.time['T_mean_prev'])
+        _put(G, mask, G_monthly)
     else:
-        self.ts_param['G'][mask] = 0
+        G[mask] = 0
+    return G
 
 
-    ######
-    ## Wind component
+######
+## Wind component
 
-    self.ts_param['U_2'] = self.ts_param['U_z']*4.87/(np.log(67.8*z_u - 5.42))
+@_node('U_2', inputs=('U_z',))
+def _est_U_2(ts):
+    if ts.raw('U_z') is None:
+        ts.flag('U_2', np.ones(ts.shape, dtype=bool))
+        return np.full(ts.shape, 2, dtype=ts.dtype)
+
+    U_z = ts['U_z']
+    U_2 = U_z*4.87/(np.log(67.8*ts.site['z_u'] - 5.42))
 
     # or use 2 if wind speed is not known
-    mask = np.isnan(self.ts_param['U_z'])
-    self.est_val[mask] += 1
-    self.ts_param['U_2'][mask] = 2
+    mask = np.isnan(U_z)
+    if mask.any():
+        ts.flag('U_2', mask)
+        U_2[mask] = 2
+    return U_2
+
+
+
+####################################
+##### Lazy parameter mapping
+
+class TsParam(MutableMapping):
+    """
+    Lazy mapping of the input and derived meteorological parameters.
+
+    Input parameters are stored as given, and each derived or gap-filled parameter is computed from the FAO 56 dependency graph the first time it is read. Only the quantities needed by the requested ETo method are ever computed. Assigning a parameter replaces it (inputs are then treated as provided data) and discards everything computed from it, including the memoised ETo results.
+
+    Parameters
+    ----------
+    raw : dict of str to np.ndarray
+        The provided input parameters.
+    freq : str
+        Time frequency string ('D' for daily, 'H'/'h' for hourly, 'M' for monthly).
+    shape : tuple of int
+        Shape of the parameter arrays.
+    site : dict
+        Site parameters (z_msl, lat, lon, TZ_lon, z_u, K_rs, a_s, b_s, alb).
+    time : dict
+        Temporal arrays (day_of_year, hour).
+    dtype : np.dtype
+        The working float dtype.
+    astro_cache : AstroCache or None
+        Cache of the astronomical radiation terms.
+    inplace : bool
+        If True, missing values are filled directly in the provided arrays.
+    profiler : StageProfiler or None
+        Records the time and rows of each parameter computation.
+
+    Attributes
+    ----------
+    results_maxsize : int
+        Maximum number of memoised ETo results (see result).
+    """
+
+    results_maxsize = 8
+
+    def __init__(self, raw, freq, shape, site, time, dtype=np.float64, astro_cache=None, inplace=False, profiler=None):
+        self._raw = raw
+        self._data = {}
+        self._flags = {}
+        self.freq = freq
+        self.hourly = 'h' in freq.lower()
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.site = site
+        self.time = time
+        self.astro_cache = astro_cache
+        self.inplace = inplace
+        self.profiler = profiler
+        self._kind = _freq_kind(freq)
+        self._names = met_names + derived_names(freq)
+        self._est_val = None
+        self._est_flags = None
+        self._results = OrderedDict()
+
+    ## Access used by the graph nodes
+
+    def raw(self, name):
+        """The provided input array for name, or None if it was not provided."""
+        return self._raw.get(name)
+
+    def input(self, name):
+        """
+        An input array ready to be gap-filled and the mask of its missing values. The provided array is left untouched so the node can be recomputed, unless the parameters were set up to fill it in place.
+        """
+        v = self._raw.get(name)
+        if v is None:
+            return np.full(self.shape, np.nan, dtype=self.dtype), np.ones(self.shape, dtype=bool)
+        mask = np.isnan(v)
+        if mask.any() and not self.inplace:
+            v = v.copy()
+        return v, mask
+
+    def flag(self, key, counts):
+        """Record the number of estimation levels used for key on each row."""
+        self._flags[key] = counts
+        self._est_val = None
+        self._est_flags = None
+
+    ## Dependency graph
+
+    def deps(self, key):
+        """The raw inputs and nodes that key is computed from."""
+        inputs, kinds, _ = _NODES[key]
+        return inputs + kinds[self._kind]
+
+    def requires(self, *keys):
+        """
+        All raw inputs and nodes that the given keys (transitively) depend on, including the keys themselves.
+        """
+        needed = set()
+        stack = list(keys)
+        while stack:
+            key = stack.pop()
+            if key in needed:
+                continue
+            needed.add(key)
+            if key in _NODES:
+                stack.extend(d for d in self.deps(key) if d != key)
+        return needed
+
+    def invalidate(self, key):
+        """Discard key and every computed parameter that depends on it."""
+        stale = {key}
+        changed = True
+        while changed:
+            changed = False
+            for k in list(self._data):
+                if k not in stale and k in _NODES and stale.intersection(self.deps(k)):
+                    stale.add(k)
+                    changed = True
+        for k in stale:
+            self._data.pop(k, None)
+            self._flags.pop(k, None)
+        self._est_val = None
+        self._est_flags = None
+        self.clear_results()
+
+    def computed(self):
+        """The parameters that have been computed or provided so far."""
+        return [k for k in self._names if k in self._data]
+
+    def evaluate(self, keys=None):
+        """Compute the given keys (default: all parameters) and return self."""
+        for key in (self._names if keys is None else keys):
+            self[key]
+        return self
+
+    def _profiled(self, key):
+        """Compute node key while recording it as a stage of the profiler."""
+        value = None
+        self.profiler.enter(key.lstrip('_'))
+        try:
+            value = _NODES[key][2](self).astype(self.dtype, copy=False)
+        finally:
+            counts = self._flags.get(key)
+            self.profiler.exit(key.lstrip('_'), rows=0 if value is None else value.size,
+                               filled=0 if counts is None else np.count_nonzero(counts))
+        return value
+
+    def memory_usage(self):
+        """
+        Bytes held by each input and computed parameter, the est_val and est_flags arrays and the memoised ETo results, plus their 'total'. Arrays that share memory (e.g. an input returned unchanged as its gap-filled parameter, or a broadcast view) are only counted once, under the first key.
+        """
+        usage = {}
+        seen = set()
+
+        def held(arr):
+            root = arr
+            while isinstance(root.base, np.ndarray):
+                root = root.base
+            if id(root) in seen:
+                return 0
+            seen.add(id(root))
+            return root.nbytes
+
+        for key, arr in self._raw.items():
+            usage[key] = held(arr)
+        for key, arr in self._data.items():
+            usage[key] = usage.get(key, 0) + held(arr)
+        if self._est_val is not None:
+            usage['est_val'] = held(self._est_val)
+        if self._est_flags is not None:
+            usage['est_flags'] = held(self._est_flags)
+        if self._results:
+            usage['results'] = sum(held(arr) for arr in self._results.values())
+        usage['total'] = sum(usage.values())
+        return usage
+
+    ## Memoised ETo results
+
+    def result(self, key, compute):
+        """
+        The memoised result for key (e.g. ('eto_fao', ref_crop, max_ETo, min_ETo)), calling compute() on a miss. Results are read-only, the least recently used is dropped beyond results_maxsize entries, and all are discarded when a parameter is assigned.
+        """
+        try:
+            value = self._results[key]
+            self._results.move_to_end(key)
+            return value
+        except KeyError:
+            pass
+        value = compute()
+        value.flags.writeable = False
+        self._results[key] = value
+        while len(self._results) > self.results_maxsize:
+            self._results.popitem(last=False)
+        return value
+
+    def clear_results(self):
+        """Discard the memoised ETo results."""
+        self._results.clear()
+
+    @property
+    def est_val(self):
+        """
+        The estimated values array (see ETo.est_val). Computes the estimated parameters if needed.
+        """
+        if self._est_val is None:
+            self.evaluate([key for key in est_weights if key in _NODES])
+            # int32 holds every combination of estimation levels; float32 runs use it to halve the memory
+            est_dtype = np.int32 if self.dtype.itemsize < 8 else np.int64
+            est_val = np.zeros(self.shape, dtype=est_dtype)
+            for key, counts in self._flags.items():
+                est_val += est_weights[key]*counts.astype(est_dtype)
+            self._est_val = est_val
+        return self._est_val
+
+    @property
+    def est_flags(self):
+        """
+        The estimation flags bitmask (see ETo.est_flags). Computes the estimated parameters if needed.
+        """
+        if self._est_flags is None:
+            self.evaluate([key for key in est_weights if key in _NODES])
+            self._est_flags = flags_from_counts(self._flags, self.shape)
+        return self._est_flags
+
+    ## Mapping interface
+
+    def __getitem__(self, key):
+        try:
+            return self._data[key]
+        except KeyError:
+            pass
+        if key in _NODES and (key in self._names or key.startswith('_')):
+            if self.profiler is None:
+                value = _NODES[key][2](self).astype(self.dtype, copy=False)
+            else:
+                value = self._profiled(key)
+            if value.shape != self.shape:
+                # Terms that only vary with time and latitude (e.g. R_a) are computed on their own shape and broadcast
+                value = np.broadcast_to(value, self.shape)
+        elif key in met_names:
+            value = self._raw.get(key)
+            if value is None:
+                value = np.full(self.shape, np.nan, dtype=self.dtype)
+        else:
+            raise KeyError(key)
+        self._data[key] = value
+        return value
+
+    def __setitem__(self, key, value):
+        value = np.asarray(value, dtype=self.dtype)
+        if value.shape != self.shape:
+            raise ValueError(f'{key} must have shape {self.shape}')
+        self.invalidate(key)
+        if key in met_names:
+            self._raw[key] = value
+        else:
+            self._data[key] = value
+            if key not in self._names:
+                self._names.append(key)
+
+    def __delitem__(self, key):
+        if key in met_names:
+            raise KeyError(f'{key} is an input parameter and cannot be deleted')
+        if key not in self._names:
+            raise KeyError(key)
+        self.invalidate(key)
+        if key not in _NODES:
+            self._names.remove(key)
+
+    def __iter__(self):
+        return iter(list(self._names))
+
+    def __len__(self):
+        return len(self._names)
+
+    def __contains__(self, key):
+        return key in self._names
+
+    def __repr__(self):
+        return f'TsParam(freq={self.freq!r}, shape={self.shape}, computed={self.computed()})'
+
+
+def param_est(self, data, freq='D', z_msl=None, lat=None, lon=None, TZ_lon=None, z_u=2, K_rs=0.16, a_s=0.25, b_s=0.5, alb=0.23, day_of_year=None, hour=None, validate=True, time_axis=-1, T_mean_prev=None, astro_cache=None, dtype=np.float64, copy=True, inplace=False, profiler=None, filled=None):
+    """
+    Function to estimate the parameters necessary to calculate reference ET (ETo) from the `FAO 56 paper <http://www.fao.org/docrep/X0490E/X0490E00.htm>`_ using a minimum of T_min and T_max for daily estimates and T_mean and RH_mean for hourly, but optionally utilising the maximum number of available met parameters.
+
+    Parameters
+    ----------
+    data : dict of str to np.ndarray
+        Input meteorological data, either 1-D (time) or 2-D (station x time). For 2-D data the site parameters z_msl, lat, lon, TZ_lon, z_u and K_rs may be 1-D arrays with one value per station.
+    freq : str
+        Time frequency string ('D' for daily, 'H'/'h' for hourly).
+    z_msl : float, int, np.ndarray, or None
+        Elevation above mean sea level (m).
+    lat : float, int, np.ndarray, or None
+        Latitude (decimal degrees).
+    lon : float, int, np.ndarray, or None
+        Longitude (decimal degrees).
+    TZ_lon : float, int, np.ndarray, or None
+        Longitude of the center of the time zone (decimal degrees).
+    z_u : float, int, or np.ndarray
+        Height of wind speed measurement (m). Default is 2 m.
+    K_rs : float or np.ndarray
+        Rs calc coefficient (0.16 inland, 0.19 coastal).
+    a_s : float
+        Rs calc coefficient.
+    b_s : float
+        Rs calc coefficient.
+    alb : float
+        Albedo. Should be 0.23 for the reference crop.
+    day_of_year : np.ndarray of int
+        Day of year (1-366).
+    hour : np.ndarray of int or None
+        Hour of day (0-23). Required for hourly frequency.
+    validate : bool or str
+        True or 'warn' (default) warns when input values are outside physically reasonable ranges, 'strict' raises a ValueError instead and False or 'off' skips the range checks. The validation report is stored as self.validation (see validate_inputs).
+    time_axis : int
+        Axis of the data arrays that holds time: -1 (default) for 1-D and (station x time) data, or 0 for gridded (time, y, x) data, in which case the site parameters may be grids that broadcast against the (y, x) axes.
+    T_mean_prev : float, np.ndarray, or None
+        T_mean of the time step preceding the first row, used by the monthly soil heat flux when a long record is processed in blocks. If None, G of the first month is 0.
+    astro_cache : AstroCache, bool, or None
+        Cache for the extraterrestrial radiation terms, which only depend on the site and the day of year (and hour). True uses the cache shared by all instances, an AstroCache instance uses that cache, and None (default) computes them directly.
+    dtype : np.dtype
+        Working float dtype of all parameter arrays (default np.float64). np.float32 halves the memory and bandwidth; see the usage guide for its accuracy.
+    copy : bool
+        If True (default), the input arrays are copied. If False, arrays that already have the working dtype and are C-contiguous are used without a copy (np.memmap inputs stay on disk and are paged in as they are read); others are converted once.
+    inplace : bool
+        If True, gap-filled inputs (P, T_mean, e_a, T_dew, R_s, R_n, G) are filled directly in the input arrays instead of in a copy. With copy=False this writes the estimates into the caller's arrays, which then no longer mark the missing values.
+    profiler : StageProfiler, bool, callable, or None
+        Records the wall time and rows of the validation, of each parameter computation and of the ETo methods (see eto.profile.StageProfiler). True creates a new StageProfiler and a callable is used as its callback. None (default) records nothing. The profiler is available as ts_param.profiler.
+    filled : np.ndarray or None
+        Gap filling level of each row of the inputs (1 interpolate, 2 climatology, 3 neighbours, 0 not filled), as returned by eto.gapfill.fill_gaps. It is recorded in est_val (tens of millions) and est_flags.
+
+    Returns
+    -------
+    None (populates self.ts_param, a lazy TsParam mapping)
+    """
+
+    self.freq = freq
+
+    ####################################
+    ##### Set up the input arrays
+    dtype = np.dtype(dtype)
+    if dtype.kind != 'f':
+        raise ValueError(f'dtype must be a floating point type, got {dtype}')
+    if copy:
+        raw = {name: np.array(data[name], dtype=dtype) for name in met_names if name in data}
+    else:
+        raw = {name: np.require(data[name], dtype=dtype, requirements='C') for name in met_names if name in data}
+    shape = next(iter(raw.values())).shape if raw else np.shape(day_of_year)
+
+    ####################################
+    ###### Input range validation and minimum requirements
+    profiler = as_profiler(profiler)
+    mode = validate_mode(validate)
+    if profiler is None:
+        self.validation = validate_inputs(raw, freq, mode)
+    else:
+        profiler.enter('validate')
+        try:
+            self.validation = validate_inputs(raw, freq, mode)
+        finally:
+            profiler.exit('validate', rows=sum(v.size for v in raw.values()) if mode != 'off' else 0)
+
+    ####################################
+    ###### Lazy parameter estimation
+    site = dict(z_msl=z_msl, lat=lat, lon=lon, TZ_lon=TZ_lon, z_u=z_u, K_rs=K_rs, a_s=a_s, b_s=b_s, alb=alb)
+    if time_axis == 0 and len(shape) > 1:
+        # Gridded (time, y, x) data: site grids broadcast against the trailing axes, temporal arrays along the first
+        time_shape = (-1,) + (1,)*(len(shape) - 1)
+        day_of_year = np.asarray(day_of_year).reshape(time_shape)
+        if hour is not None:
+            hour = np.asarray(hour).reshape(time_shape)
+    else:
+        for key in station_params:
+            site[key] = _station_param(site[key], len(shape), dtype)
+    time = dict(day_of_year=day_of_year, hour=hour, axis=time_axis, T_mean_prev=T_mean_prev)
+    if astro_cache is True:
+        astro_cache = default_cache
+    elif astro_cache is False:
+        astro_cache = None
+    self.ts_param = TsParam(raw, freq, shape, site, time, dtype=dtype, astro_cache=astro_cache, inplace=inplace, profiler=profiler)
+    if filled is not None:
+        self.ts_param.flag('filled', np.broadcast_to(np.asarray(filled, dtype=np.uint8), shape))
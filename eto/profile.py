@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+Optional per-stage timing and counters for the parameter estimation and ETo methods.
+"""
+import functools
+import time
+import numpy as np
+
+
+class StageProfiler(object):
+    """
+    Records the wall time and rows of each stage of the parameter estimation (one stage per parameter of the FAO 56 dependency graph, e.g. 'P', 'e_a', 'T_dew', 'R_a', 'R_s', 'R_nl', 'G', 'U_2'), the input validation ('validate') and the ETo methods ('eto_fao', 'eto_hargreaves'). Times are exclusive: a stage that triggers another stage (e.g. R_n computing R_s) is not charged for it.
+
+    Pass an instance (or True, or a callback) as the profiler argument of ETo or param_est. Without a profiler nothing is recorded and the stages run without any timing calls.
+
+    Parameters
+    ----------
+    callback : callable or None
+        Called as callback(stage, seconds, rows, filled) after every stage, e.g. to forward the metrics to a monitoring system.
+
+    Attributes
+    ----------
+    records : dict of str to dict
+        Per stage: 'calls', 'seconds' (exclusive wall time), 'rows' (values computed) and 'filled' (values estimated by the stage's fallbacks).
+    """
+
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.records = {}
+        self._stack = []
+
+    def enter(self, stage):
+        """Start timing stage."""
+        self._stack.append([stage, time.perf_counter(), 0.0])
+
+    def exit(self, stage, rows=0, filled=0):
+        """Stop timing the innermost stage and record it. stage must be the innermost stage that was entered."""
+        if not self._stack or self._stack[-1][0] != stage:
+            raise ValueError(f'exit({stage!r}) does not match the innermost stage {self._stack[-1][0] if self._stack else None!r}')
+        _, start, child = self._stack.pop()
+        elapsed = time.perf_counter() - start
+        if self._stack:
+            self._stack[-1][2] += elapsed
+        seconds = elapsed - child
+        rec = self.records.setdefault(stage, {'calls': 0, 'seconds': 0.0, 'rows': 0, 'filled': 0})
+        rec['calls'] += 1
+        rec['seconds'] += seconds
+        rec['rows'] += int(rows)
+        rec['filled'] += int(filled)
+        if self.callback is not None:
+            self.callback(stage, seconds, int(rows), int(filled))
+
+    def report(self):
+        """
+        The records as a dict of stage to dict, plus a 'total' entry summing all stages.
+        """
+        report = {stage: dict(rec) for stage, rec in self.records.items()}
+        report['total'] = {key: sum(rec[key] for rec in self.records.values()) for key in ('calls', 'seconds', 'rows', 'filled')}
+        return report
+
+    def reset(self):
+        """Discard the records."""
+        self.records.clear()
+        self._stack.clear()
+
+    def __repr__(self):
+        return f'StageProfiler(stages={list(self.records)})'
+
+
+def as_profiler(profiler):
+    """Resolve the profiler argument of ETo/param_est: None, True, a StageProfiler or a callback."""
+    if profiler is None or profiler is False:
+        return None
+    if profiler is True:
+        return StageProfiler()
+    if isinstance(profiler, StageProfiler):
+        return profiler
+    if callable(profiler):
+        return StageProfiler(callback=profiler)
+    raise TypeError('profiler must be None, True, a StageProfiler or a callable')
+
+
+def profiled(stage):
+    """
+    Decorator recording an ETo method as a stage of the instance's profiler, if it has one.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            profiler = self.ts_param.profiler
+            if profiler is None:
+                return func(self, *args, **kwargs)
+            profiler.enter(stage)
+            result = None
+            try:
+                result = func(self, *args, **kwargs)
+            finally:
+                profiler.exit(stage, rows=np.size(result) if result is not None else 0)
+            return result
+        return wrapper
+    return decorator
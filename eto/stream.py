@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+Streaming reference ET over time series that are processed block by block.
+"""
+import os
+import numpy as np
+from eto.core import ETo
+from eto.memory import plan_chunk_size
+from eto.param_est import met_names
+from eto.util import data_shape, temporal_arrays
+
+_temporal_keys = ('dates', 'day_of_year', 'hour')
+
+
+def eto_stream(blocks, freq='D', z_msl=None, lat=None, lon=None, TZ_lon=None, z_u=2, K_rs=0.16, a_s=0.25, b_s=0.5, alb=0.23, validate=True, method='eto_fao', dtype=np.float64, copy=True, **kwargs):
+    """
+    Estimate reference ET over an iterator of consecutive row blocks, holding only one block in memory at a time. State that crosses block boundaries (the previous T_mean used by the monthly soil heat flux) is carried from one block to the next, so the concatenated results are the same as for the whole record.
+
+    Parameters
+    ----------
+    blocks : iterable of dict of str to np.ndarray
+        Consecutive blocks of the record. Each block holds the met data arrays (see ETo) plus either 'dates' or 'day_of_year' (and 'hour' for hourly data). Blocks may be 1-D (time) or 2-D (station x time).
+    freq : str
+        Time frequency: 'D' for daily, 'H' or 'h' for hourly, 'M' for monthly.
+    z_msl, lat, lon, TZ_lon, z_u, K_rs, a_s, b_s, alb
+        Site and coefficient parameters (see ETo).
+    validate : bool
+        If True (default), warn when input values are outside physically reasonable ranges.
+    dtype : np.dtype
+        The floating point dtype of the working arrays and results (see ETo).
+    copy : bool
+        Whether param_est copies the block arrays (see ETo). With False, blocks that are views of np.memmap files are read from the file as they are used.
+    method : str or None
+        The ETo method to evaluate on each block, e.g. 'eto_fao' (default), 'eto_hargreaves' or 'etc'. If None, the ETo object of each block is yielded instead.
+    **kwargs
+        Passed to the method.
+
+    Yields
+    ------
+    np.ndarray or ETo
+        The method result for each block, or the block's ETo object if method is None.
+    """
+    T_mean_prev = None
+    for block in blocks:
+        data = {k: v for k, v in block.items() if k not in _temporal_keys}
+        shape = data_shape(data)
+        day_of_year, hour = temporal_arrays(freq, shape[-1] if shape else 0, block.get('day_of_year'), block.get('hour'), block.get('dates'))
+
+        et = ETo()
+        et.param_est(data, freq, z_msl, lat, lon, TZ_lon, z_u, K_rs, a_s, b_s, alb,
+                     day_of_year=day_of_year, hour=hour, validate=validate, T_mean_prev=T_mean_prev, dtype=dtype, copy=copy)
+
+        if freq.upper() == 'M':
+            T_mean_prev = np.array(et.ts_param['T_mean'][..., -1])
+
+        if method is None:
+            yield et
+        else:
+            yield getattr(et, method)(**kwargs)
+
+
+def _open_out(out, shape, dtype):
+    """An output array: out itself, or a new .npy memmap file if out is a path."""
+    if isinstance(out, (str, os.PathLike)):
+        return np.lib.format.open_memmap(out, mode='w+', dtype=dtype, shape=shape)
+    if not isinstance(out, np.ndarray) or out.shape != tuple(shape):
+        raise ValueError(f'out must be a path or a np.ndarray of shape {tuple(shape)}')
+    return out
+
+
+def eto_memmap(data, out, freq='D', z_msl=None, lat=None, lon=None, TZ_lon=None, z_u=2, K_rs=0.16, a_s=0.25, b_s=0.5, alb=0.23, day_of_year=None, hour=None, dates=None, validate=True, method='eto_fao', params=None, window=None, memory_limit=None, dtype=np.float64, **kwargs):
+    """
+    Estimate reference ET for a record larger than memory, reading the inputs from np.memmap (or any array-like) and writing the result, and optionally the ts_param intermediates, to memory-mapped .npy files. The record is processed in windows along the time axis with eto_stream, so only one window of inputs, parameters and results is resident at a time and the result is the same as for the whole record.
+
+    Parameters
+    ----------
+    data : dict of str to np.ndarray
+        Input meteorological data as 1-D (time) or 2-D (station x time) arrays (see ETo), typically opened with np.load(path, mmap_mode='r').
+    out : str, os.PathLike or np.ndarray
+        Path of a .npy file to create for the result, or an array (e.g. an np.memmap) with the shape of the data to write it into.
+    freq : str
+        Time frequency: 'D' for daily, 'H' or 'h' for hourly, 'M' for monthly.
+    z_msl, lat, lon, TZ_lon, z_u, K_rs, a_s, b_s, alb
+        Site and coefficient parameters (see ETo).
+    day_of_year, hour, dates : np.ndarray or None
+        Temporal arrays for the whole record (see ETo).
+    validate : bool
+        If True (default), warn when input values are outside physically reasonable ranges.
+    method : str
+        The ETo method to evaluate, e.g. 'eto_fao' (default), 'eto_hargreaves' or 'etc'.
+    params : dict of str to (str, os.PathLike or np.ndarray) or None
+        ts_param entries to write out, e.g. {'R_n': 'R_n.npy', 'e_a': 'e_a.npy'}, each a path of a .npy file to create or an array with the shape of the data.
+    window : int or None
+        Number of time steps per window. Default is derived from memory_limit, or 2**16 time steps.
+    memory_limit : int or None
+        Memory budget in bytes for one window (see eto.memory.plan_chunk_size), used when window is None.
+    dtype : np.dtype
+        The floating point dtype of the working arrays, result and parameter files (see ETo).
+    **kwargs
+        Passed to the method. Arrays whose last axis has the length of the record (e.g. a Kc curve) are sliced to each window.
+
+    Returns
+    -------
+    np.ndarray
+        The result array, an np.memmap if out is a path.
+    """
+    shape = data_shape(data)
+    if not shape:
+        raise ValueError('data must contain at least one met array')
+    n = shape[-1]
+    n_series = int(np.prod(shape[:-1]))
+    day_of_year, hour = temporal_arrays(freq, n, day_of_year, hour, dates)
+
+    if window is None:
+        if memory_limit is None:
+            window = 2**16
+        else:
+            inputs = tuple(name for name in met_names if name in data)
+            window = max(1, plan_chunk_size(memory_limit, freq, method, inputs, dtype) // n_series)
+
+    out = _open_out(out, shape, dtype)
+    params = {key: _open_out(arr, shape, dtype) for key, arr in (params or {}).items()}
+
+    def blocks():
+        for start in range(0, n, window):
+            stop = min(start + window, n)
+            block = {name: arr[..., start:stop] for name, arr in data.items()}
+            block['day_of_year'] = day_of_year[..., start:stop]
+            if hour is not None:
+                block['hour'] = hour[..., start:stop]
+            yield block
+
+    site = dict(z_msl=z_msl, lat=lat, lon=lon, TZ_lon=TZ_lon, z_u=z_u, K_rs=K_rs, a_s=a_s, b_s=b_s, alb=alb)
+    ets = eto_stream(blocks(), freq, **site, validate=validate, method=None, dtype=dtype, copy=False)
+    for start, et in zip(range(0, n, window), ets):
+        stop = min(start + window, n)
+        win_kwargs = {k: (v[..., start:stop] if np.ndim(v) and np.shape(v)[-1] == n else v) for k, v in kwargs.items()}
+        getattr(et, method)(out=out[..., start:stop], **win_kwargs)
+        for key, arr in params.items():
+            arr[..., start:stop] = et.ts_param[key]
+
+    for arr in [out] + list(params.values()):
+        if isinstance(arr, np.memmap):
+            arr.flush()
+    return out
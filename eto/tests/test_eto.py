@@ -7,6 +7,19 @@ import csv
 import io
 import numpy as np
 from eto import ETo, datasets
+from eto.fused import eto_fused
+from eto.grid import eto_grid
+from eto.stream import eto_memmap, eto_stream
+from eto.aggregate import aggregate, monthly_inputs
+from eto.astro import AstroCache
+from eto.gapfill import climatology_fill, fill_gaps, interpolate_gaps, neighbour_fill
+from eto.flags import EST_FLAGS, decode_flags, est_val_from_flags, flag_counts, flag_mask, flags_from_est_val
+from eto.param_est import validate_inputs
+from eto.parallel import StationPool, eto_parallel
+from eto.profile import StageProfiler
+from eto.memory import measure_peak, plan_chunk_size, plan_memory
+from eto.crop_coefficients import KC_TABLE, kc_curve
+from eto.water_balance import evaporation_layer, root_zone_balance
 import pytest
 
 
@@ -824,3 +837,881 @@ def test_etc_adj_full_stress():
     et = ETo(data, 'D', z_msl=100, lat=-43.6, dates=dates)
     result = et.etc_adj(Kc=1.15, TAW=100.0, Dr=100.0)
     np.testing.assert_allclose(result, 0.0)
+
+
+###############################
+### Group 12: Fused single-pass kernel
+
+@pytest.mark.parametrize('engine', ['numba', 'numpy'])
+@pytest.mark.parametrize('freq', ['D', 'M'])
+def test_eto_fused_matches_eto_fao(daily_data, daily_params, engine, freq):
+    """Fused evaluation reproduces ETo.eto_fao and the requested intermediates."""
+    if engine == 'numba':
+        pytest.importorskip('numba')
+    data, dates = daily_data
+    et = ETo(data, freq, dates=dates, **daily_params)
+    eto_vals, ts = eto_fused(data, freq, dates=dates, engine=engine, chunk_size=100,
+                             params=['R_n', 'G', 'e_a', 'est_val'], **daily_params)
+    np.testing.assert_allclose(eto_vals, et.eto_fao(), atol=0.011)
+    np.testing.assert_allclose(ts['R_n'], et.ts_param['R_n'], rtol=1e-10)
+    np.testing.assert_allclose(ts['G'], et.ts_param['G'], atol=1e-12)
+    np.testing.assert_array_equal(ts['est_val'], et.est_val)
+
+
+@pytest.mark.parametrize('engine', ['numba', 'numpy'])
+def test_eto_fused_hourly_tall(hourly_et, daily_params, engine):
+    if engine == 'numba':
+        pytest.importorskip('numba')
+    data = {k: hourly_et.ts_param[k] for k in ('T_mean', 'e_a', 'R_s')}
+    n = len(data['T_mean'])
+    dates = np.arange('2000-01-01', np.datetime64('2000-01-01') + np.timedelta64(n, 'h'), dtype='datetime64[h]')
+    eto_vals, ts = eto_fused(data, 'h', dates=dates, ref_crop='tall', engine=engine,
+                             params=['e_mean'], chunk_size=1000, **daily_params)
+    np.testing.assert_allclose(eto_vals, hourly_et.eto_fao(ref_crop='tall'), atol=0.011)
+    np.testing.assert_allclose(ts['e_mean'], hourly_et.ts_param['e_mean'], rtol=1e-10)
+
+
+def test_eto_fused_bad_param_raises():
+    data = {'T_min': np.array([10.0]), 'T_max': np.array([25.0])}
+    with pytest.raises(ValueError, match='not available'):
+        eto_fused(data, 'D', z_msl=100, lat=-43.6, day_of_year=[1], params=['e_mean'])
+
+
+###############################
+### Group 13: Lazy ts_param
+
+def test_hargreaves_skips_humidity_and_radiation(daily_data, daily_params):
+    """Hargreaves only computes T_mean and R_a."""
+    data, dates = daily_data
+    et = ETo(data, 'D', dates=dates, **daily_params)
+    et.eto_hargreaves()
+    computed = set(et.ts_param.computed())
+    assert {'T_mean', 'R_a'} <= computed
+    assert not computed & {'e_a', 'R_n', 'G', 'U_2', 'delta', 'gamma'}
+
+
+def test_ts_param_keys_and_requires(daily_et):
+    assert set(daily_et.ts_param) >= {'T_min', 'e_s', 'VPD', 'R_a', 'U_2'}
+    assert 'e_mean' not in daily_et.ts_param
+    assert daily_et.ts_param.requires('R_a') == {'R_a', '_w_s'}
+    assert 'e_a' in daily_et.ts_param.requires('R_n')
+
+
+def test_ts_param_setitem_invalidates_dependents():
+    data = {
+        'T_min': np.array([10.0, 12.0]),
+        'T_max': np.array([25.0, 28.0]),
+    }
+    _, dates = make_daily_data(data, n_days=2)
+    et = ETo(data, 'D', z_msl=100, lat=-43.6, dates=dates)
+    eto1 = et.eto_fao()
+    assert et.est_val[0] == 1142111
+    et.ts_param['R_s'] = np.array([30.0, 30.0])
+    assert 'R_n' not in et.ts_param.computed()
+    eto2 = et.eto_fao()
+    assert (eto2 > eto1).all()
+    assert et.est_val[0] == 1140111
+
+
+###############################
+### Group 14: Multi-station batch mode
+
+@pytest.mark.parametrize('freq', ['D', 'h'])
+def test_batch_matches_per_station(freq):
+    """2-D (station x time) inputs with per-station site vectors match a per-station loop."""
+    rng = np.random.default_rng(42)
+    n_st, n_t = 4, 48
+    T_min = rng.uniform(0, 10, (n_st, n_t))
+    data = {'T_min': T_min, 'T_max': T_min + 10, 'T_mean': T_min + 5,
+            'RH_mean': rng.uniform(40, 80, (n_st, n_t)), 'U_z': rng.uniform(0, 4, (n_st, n_t))}
+    data['U_z'][1, 5] = np.nan
+    site = dict(lat=np.array([-45.0, -30.0, 10.0, 50.0]), z_msl=np.array([0.0, 300.0, 800.0, 50.0]),
+                lon=np.array([170.0, 172.0, 174.0, 176.0]), TZ_lon=np.full(n_st, 173.0),
+                z_u=np.array([2.0, 3.0, 10.0, 2.0]), K_rs=np.array([0.16, 0.19, 0.16, 0.19]))
+    if freq == 'h':
+        _, dates = make_hourly_data(data, n_hours=n_t)
+    else:
+        _, dates = make_daily_data(data, n_days=n_t)
+
+    et = ETo(data, freq, dates=dates, **site)
+    eto_vals = et.eto_fao()
+    assert eto_vals.shape == (n_st, n_t)
+    for i in range(n_st):
+        et1 = ETo({k: v[i] for k, v in data.items()}, freq, dates=dates, **{k: v[i] for k, v in site.items()})
+        np.testing.assert_array_equal(eto_vals[i], et1.eto_fao())
+        np.testing.assert_array_equal(et.est_val[i], et1.est_val)
+
+
+###############################
+### Group 15: Gridded (time, y, x) data
+
+def test_eto_grid_matches_per_cell():
+    """A (time, y, x) cube matches per-cell estimates, with R_a computed once per latitude row."""
+    rng = np.random.default_rng(7)
+    n_t, n_y, n_x = 10, 3, 4
+    T_min = rng.uniform(0, 10, (n_t, n_y, n_x))
+    data = {'T_min': T_min, 'T_max': T_min + 8}
+    lat = np.repeat(np.linspace(-45, -35, n_y)[:, np.newaxis], n_x, axis=1)
+    z_msl = rng.uniform(0, 1000, (n_y, n_x))
+    _, dates = make_daily_data(data, n_days=n_t)
+
+    cube = eto_grid(data, 'D', z_msl=z_msl, lat=lat, dates=dates)
+    assert cube.shape == (n_t, n_y, n_x)
+    for y in range(n_y):
+        for x in range(n_x):
+            et1 = ETo({k: v[:, y, x] for k, v in data.items()}, 'D', z_msl=z_msl[y, x], lat=lat[y, x], dates=dates)
+            np.testing.assert_array_equal(cube[:, y, x], et1.eto_fao())
+
+    har = eto_grid(data, 'D', z_msl=z_msl, lat=lat, dates=dates, method='eto_hargreaves')
+    assert har.shape == (n_t, n_y, n_x)
+
+
+def test_eto_grid_requires_3d():
+    data = {'T_min': np.zeros((2, 3)), 'T_max': np.ones((2, 3))}
+    with pytest.raises(ValueError, match='3-D'):
+        eto_grid(data, 'D', z_msl=0, lat=-40, day_of_year=[1, 2])
+
+
+###############################
+### Group 16: Streaming blocks
+
+def _blocks(data, dates, size):
+    for start in range(0, len(dates), size):
+        block = {k: v[start:start + size] for k, v in data.items()}
+        block['dates'] = dates[start:start + size]
+        yield block
+
+
+@pytest.mark.parametrize('freq', ['D', 'M'])
+def test_eto_stream_matches_whole_record(daily_data, daily_params, freq):
+    """Concatenated block results equal the whole-record result, including the monthly G carry-over."""
+    data, dates = daily_data
+    et = ETo(data, freq, dates=dates, **daily_params)
+    streamed = list(eto_stream(_blocks(data, dates, 97), freq, **daily_params))
+    assert len(streamed) > 1
+    np.testing.assert_array_equal(np.concatenate(streamed), et.eto_fao())
+
+
+def test_eto_stream_yields_eto_objects(daily_data, daily_params):
+    data, dates = daily_data
+    objs = list(eto_stream(_blocks(data, dates, 200), 'M', method=None, **daily_params))
+    G = np.concatenate([o.ts_param['G'] for o in objs])
+    et = ETo(data, 'M', dates=dates, **daily_params)
+    np.testing.assert_allclose(G, et.ts_param['G'], atol=1e-12)
+
+
+###############################
+### Group 17: Astronomy cache
+
+@pytest.mark.parametrize('freq', ['D', 'h'])
+def test_astro_cache_matches_direct(freq):
+    n = 24 * 10
+    data = {'T_min': np.full(n, 8.0), 'T_max': np.full(n, 20.0), 'T_mean': np.full(n, 14.0),
+            'RH_mean': np.full(n, 60.0), 'n_sun': np.full(n, 6.0)}
+    if freq == 'h':
+        _, dates = make_hourly_data(data, n_hours=n)
+    else:
+        _, dates = make_daily_data(data, n_days=n)
+    cache = AstroCache(maxsize=2)
+    site = dict(z_msl=100, lat=-43.6, lon=172, TZ_lon=173, dates=dates)
+    et = ETo(data, freq, **site)
+    et_cached = ETo(data, freq, astro_cache=cache, **site)
+    np.testing.assert_allclose(et_cached.ts_param['R_a'], et.ts_param['R_a'], rtol=1e-12)
+    np.testing.assert_allclose(et_cached.ts_param['R_s'], et.ts_param['R_s'], rtol=1e-12)
+    assert cache.misses == 1
+
+    ETo(data, freq, astro_cache=cache, **site).eto_fao()
+    assert cache.hits >= 1
+
+
+def test_astro_cache_lru_eviction():
+    cache = AstroCache(maxsize=2)
+    for lat in (-40.0, -41.0, -42.0):
+        cache.daily(lat)
+    assert len(cache) == 2
+    cache.daily(-40.0)
+    assert cache.misses == 4
+
+
+###############################
+### Group 18: Single precision
+
+def test_float32_dtype(daily_data, daily_params, daily_results):
+    data, dates = daily_data
+    et = ETo(data, 'D', dates=dates, dtype=np.float32, **daily_params)
+    eto_fao = et.eto_fao()
+    eto_har = et.eto_hargreaves()
+    for res in (eto_fao, eto_har, et.etc(Kc=1.1), et.etc_dual(Kcb=0.8, Ke=0.3), et.etc_adj(Kc=1.1, TAW=100, Dr=20)):
+        assert res.dtype == np.float32
+    assert et.est_val.dtype == np.int32
+    assert all(et.ts_param[k].dtype == np.float32 for k in et.ts_param)
+
+    ref = ETo(data, 'D', dates=dates, **daily_params)
+    np.testing.assert_allclose(eto_fao, ref.eto_fao(), atol=1e-5, equal_nan=True)
+    np.testing.assert_array_equal(et.est_val, ref.est_val)
+    np.testing.assert_allclose(eto_har, daily_results[0]['ETo_Har_mm'], atol=0.011, equal_nan=True)
+
+
+def test_float32_rejects_non_float():
+    data = {'T_min': np.array([5.0]), 'T_max': np.array([15.0])}
+    with pytest.raises(ValueError, match='dtype must be a floating point type'):
+        ETo(data, 'D', lat=-43.6, day_of_year=np.array([1]), dtype=np.int32)
+
+
+###############################
+### Group 19: Zero-copy inputs and output buffers
+
+def test_copy_false_uses_caller_arrays(daily_data, daily_params):
+    data, dates = daily_data
+    data = {k: np.ascontiguousarray(v, dtype=np.float64) for k, v in data.items()}
+    before = {k: v.copy() for k, v in data.items()}
+    et = ETo(data, 'D', dates=dates, copy=False, **daily_params)
+    assert et.ts_param['T_min'] is data['T_min']
+    et.eto_fao()
+    for k in data:
+        np.testing.assert_array_equal(data[k], before[k])
+
+
+def test_inplace_fills_caller_arrays():
+    data = {'T_min': np.array([10.0, 12.0]), 'T_max': np.array([20.0, 24.0]), 'T_mean': np.array([14.0, np.nan])}
+    et = ETo(data, 'D', z_msl=100, lat=-43.6, day_of_year=np.array([1, 2]), copy=False, inplace=True)
+    et.ts_param['T_mean']
+    np.testing.assert_array_equal(data['T_mean'], [14.0, 18.0])
+    assert et.est_val[1] // 100000 % 10 == 1
+
+
+@pytest.mark.parametrize('method, kwargs', [
+    ('eto_fao', {}),
+    ('eto_fao', {'ref_crop': 'tall'}),
+    ('eto_hargreaves', {}),
+    ('etc', {'Kc': 1.1}),
+    ('etc_dual', {'Kcb': 0.8, 'Ke': 0.3}),
+    ('etc_adj', {'Kc': 1.1, 'TAW': 100, 'Dr': 60}),
+])
+def test_out_buffer(daily_et, method, kwargs):
+    expected = getattr(daily_et, method)(**kwargs)
+    out = np.full(expected.shape, -1.0)
+    res = getattr(daily_et, method)(out=out, **kwargs)
+    assert res is out
+    np.testing.assert_array_equal(out, expected)
+
+
+def test_out_buffer_shape_mismatch(daily_et):
+    with pytest.raises(ValueError):
+        daily_et.eto_fao(out=np.empty(3))
+
+
+###############################
+### Group 20: Memoised ETo results
+
+def test_etc_reuses_eto_fao(daily_data, daily_params):
+    data, dates = daily_data
+    et = ETo(data, 'D', dates=dates, **daily_params)
+    calls = []
+    eto_fao = et.eto_fao
+    et.eto_fao = lambda **kwargs: calls.append(kwargs) or eto_fao(**kwargs)
+
+    expected = eto_fao()
+    for crop in KC_TABLE:
+        for stage in ('ini', 'mid', 'end'):
+            np.testing.assert_array_equal(et.etc(crop=crop, stage=stage), KC_TABLE[crop][('ini', 'mid', 'end').index(stage)]*expected)
+    et.etc_dual(Kcb=0.8, Ke=0.3)
+    et.etc_adj(Kc=1.1, TAW=100, Dr=60)
+    assert len(calls) == 1
+
+    et.etc(Kc=1.0, ref_crop='tall')
+    assert len(calls) == 2
+
+    et.ts_param['U_2'] = np.full(et.ts_param.shape, 3.0)
+    np.testing.assert_array_equal(et.etc(Kc=1.0), eto_fao())
+    assert len(calls) == 3
+
+
+def test_eto_result_cache_is_bounded(daily_et):
+    daily_et.ts_param.results_maxsize = 2
+    for max_ETo in (10, 12, 15):
+        daily_et.etc(Kc=1.0, max_ETo=max_ETo)
+    assert len(daily_et.ts_param._results) == 2
+    assert not daily_et.eto_fao_cached().flags.writeable
+
+
+###############################
+### Group 21: ETc matrix
+
+def test_etc_matrix_matches_etc(daily_et):
+    res = daily_et.etc_matrix()
+    assert res.shape == (len(KC_TABLE), 3) + daily_et.ts_param.shape
+    for i, crop in enumerate(KC_TABLE):
+        for j, stage in enumerate(('ini', 'mid', 'end')):
+            np.testing.assert_array_equal(res[i, j], daily_et.etc(crop=crop, stage=stage))
+
+
+def test_etc_matrix_subset_and_custom_table(daily_et):
+    table = dict(KC_TABLE, Hops=(0.3, 1.05, 0.85))
+    res = daily_et.etc_matrix(crops=['hops', 'rice'], stages=['mid'], table=table, ref_crop='tall')
+    assert res.shape == (2, 1) + daily_et.ts_param.shape
+    np.testing.assert_array_equal(res[0, 0], daily_et.etc(Kc=1.05, ref_crop='tall'))
+    with pytest.raises(ValueError):
+        daily_et.etc_matrix(crops=['hops'])
+    with pytest.raises(ValueError):
+        daily_et.etc_matrix(stages=['dev'])
+
+
+###############################
+### Group 22: Kc curves
+
+def test_kc_curve_matches_fao_curve():
+    dates = np.arange('2020-01-01', '2021-01-01', dtype='datetime64[D]')
+    planting = np.array(['2020-03-01', '2020-05-10'], dtype='datetime64[D]')
+    L = np.array([[20, 30, 40, 30], [25, 35, 45, 20]])
+    Kc = kc_curve(dates, planting, L, crop=['maize_grain', 'Wheat_spring'])
+    assert Kc.shape == (2, len(dates))
+    for i, crop in enumerate(['maize_grain', 'wheat_spring']):
+        ini, mid, end = KC_TABLE[crop]
+        x = np.cumsum([0] + list(L[i]))
+        day = (dates - planting[i]).astype(int)
+        expected = np.interp(day, x, [ini, ini, mid, mid, end])
+        expected[(day < 0) | (day >= x[-1])] = np.nan
+        np.testing.assert_allclose(Kc[i], expected, equal_nan=True)
+
+    single = kc_curve(dates, planting[0], L[0], Kc=KC_TABLE['maize_grain'], fill=0)
+    np.testing.assert_allclose(single, np.nan_to_num(Kc[0]))
+
+    with pytest.raises(ValueError):
+        kc_curve(dates, planting, [20, 0, 40, 30], Kc=(0.3, 1.2, 0.6))
+
+
+def test_etc_with_kc_curve(daily_data, daily_params):
+    data, dates = daily_data
+    et = ETo(data, 'D', dates=dates, **daily_params)
+    planting = dates[0] + np.array([0, 30, 60])
+    Kc = kc_curve(dates, planting, (20, 30, 40, 30), Kc=(0.3, 1.2, 0.6), fill=0)
+    res = et.etc(Kc=Kc)
+    assert res.shape == (3, len(dates))
+    np.testing.assert_array_equal(res[1], Kc[1]*et.eto_fao())
+
+
+###############################
+### Group 23: Root zone soil water balance
+
+def _root_zone_loop(ETc, TAW, p, P, I):
+    Dr = 0.0
+    out = []
+    for t in range(len(ETc)):
+        Ks = min(max((TAW - Dr)/((1 - p)*TAW), 0), 1)
+        Dr = min(max(Dr - P[t] - I[t] + Ks*ETc[t], 0), TAW)
+        out.append((Dr, Ks))
+    return np.array(out).T
+
+
+@pytest.mark.parametrize('engine', ['numpy', 'numba'])
+def test_root_zone_balance_matches_loop(engine):
+    if engine == 'numba':
+        pytest.importorskip('numba')
+    rng = np.random.default_rng(3)
+    n_fields, n_time = 5, 200
+    ETc = rng.random((n_fields, n_time))*6
+    P = np.where(rng.random((n_fields, n_time)) < 0.1, rng.random((n_fields, n_time))*40, 0)
+    I = np.zeros(n_time)
+    I[100] = 30
+    TAW = np.linspace(60, 140, n_fields).reshape(-1, 1)
+    res = root_zone_balance(ETc, TAW, p=0.4, P=P, I=I, engine=engine)
+    assert res['Dr'].shape == (n_fields, n_time)
+    for f in range(n_fields):
+        Dr, Ks = _root_zone_loop(ETc[f], TAW[f, 0], 0.4, P[f], I)
+        np.testing.assert_allclose(res['Dr'][f], Dr, rtol=1e-12)
+        np.testing.assert_allclose(res['Ks'][f], Ks, rtol=1e-12)
+    np.testing.assert_allclose(res['ETc_adj'], res['Ks']*ETc)
+    assert (res['DP'] >= 0).all()
+
+
+@pytest.mark.parametrize('engine', ['numpy', 'numba'])
+def test_root_zone_balance_no_stress_band(engine):
+    if engine == 'numba':
+        pytest.importorskip('numba')
+    ## p = 1 leaves no readily available water band: Ks stays 1 and the root zone is emptied up to TAW
+    ETc = np.full((2, 30), 5.0)
+    res = root_zone_balance(ETc, TAW=np.array([[50.0], [80.0]]), p=np.array([[1.0], [0.5]]), engine=engine)
+    np.testing.assert_array_equal(res['Ks'][0], 1)
+    np.testing.assert_array_equal(res['Dr'][0], np.minimum(np.arange(1, 31)*5.0, 50))
+    assert (res['Ks'][1, -1] < 1) and np.isfinite(res['Ks']).all()
+
+
+def test_etc_balance(daily_et):
+    Kc = np.array([[0.8], [1.1]])
+    res = daily_et.etc_balance(Kc, TAW=120, engine='numpy')
+    assert res['Dr'].shape == (2,) + daily_et.ts_param.shape
+    eto = daily_et.eto_fao()
+    np.testing.assert_array_equal(res['ETc_adj'][:, 0], Kc[:, 0]*eto[0])
+    assert np.nanmax(res['Dr']) <= 120
+
+
+###############################
+### Group 24: Dual Kc evaporation layer
+
+def _evaporation_loop(ETo, Kcb, Kc_max, TEW, REW, few, P):
+    De = 0.0
+    out = []
+    for t in range(len(ETo)):
+        Kr = 1.0 if De <= REW else (TEW - De)/(TEW - REW)
+        Ke = min(Kr*(Kc_max - Kcb), few*Kc_max)
+        DPe = max(P[t] - De, 0)
+        De = min(max(De - P[t] + Ke*ETo[t]/few + DPe, 0), TEW)
+        out.append((De, Ke))
+    return np.array(out).T
+
+
+@pytest.mark.parametrize('engine', ['numpy', 'numba'])
+def test_evaporation_layer_matches_loop(engine):
+    if engine == 'numba':
+        pytest.importorskip('numba')
+    rng = np.random.default_rng(4)
+    n_time = 120
+    ETo = rng.random(n_time)*6
+    P = np.where(rng.random((3, n_time)) < 0.1, 20.0, 0)
+    Kcb = np.array([[0.15], [0.6], [1.0]])
+    res = evaporation_layer(ETo, Kcb, 1.2, TEW=25, REW=8, fc=0.3, P=P, engine=engine)
+    assert res['Ke'].shape == (3, n_time)
+    for f in range(3):
+        De, Ke = _evaporation_loop(ETo, Kcb[f, 0], 1.2, 25, 8, 0.7, P[f])
+        np.testing.assert_allclose(res['De'][f], De, rtol=1e-12)
+        np.testing.assert_allclose(res['Ke'][f], Ke, rtol=1e-12)
+    np.testing.assert_allclose(res['ETc'], (Kcb + res['Ke'])*ETo)
+
+
+def test_etc_dual_balance(daily_et):
+    res = daily_et.etc_dual_balance(Kcb=np.array([[0.3], [0.9]]), h=np.array([[0.3], [2.0]]), TEW=22, REW=9)
+    assert res['ETc'].shape == (2,) + daily_et.ts_param.shape
+    np.testing.assert_allclose(res['ETc'][1], daily_et.etc_dual(Kcb=0.9, Ke=res['Ke'][1]), atol=1e-12)
+    with pytest.raises(ValueError):
+        evaporation_layer(np.ones(3), 0.5, 1.2, TEW=5, REW=8)
+
+
+###############################
+### Group 25: Process pool with shared memory
+
+def test_eto_parallel_matches_serial():
+    rng = np.random.default_rng(5)
+    n_stations, n = 9, 60
+    data = {'T_min': rng.random((n_stations, n))*10, 'T_max': 15 + rng.random((n_stations, n))*10,
+            'RH_mean': 50 + rng.random((n_stations, n))*20, 'U_z': rng.random((n_stations, n))*3}
+    data['RH_mean'][2, 5] = np.nan
+    _, dates = make_daily_data({}, n_days=n)
+    site = dict(z_msl=np.linspace(0, 800, n_stations), lat=np.linspace(-45, -35, n_stations), dates=dates)
+
+    with StationPool(2) as pool:
+        res = eto_parallel(data, 'D', pool=pool, stations_per_task=2, **site)
+        res_etc = eto_parallel(data, 'D', pool=pool, method='etc', Kc=1.1, **site)
+    et = ETo(data, 'D', **site)
+    np.testing.assert_array_equal(res, et.eto_fao())
+    np.testing.assert_array_equal(res_etc, et.etc(Kc=1.1))
+
+    with pytest.raises(ValueError):
+        eto_parallel({'T_min': np.ones(3), 'T_max': np.ones(3)}, 'D', day_of_year=np.arange(1, 4))
+
+
+def test_eto_parallel_per_station_kwargs():
+    rng = np.random.default_rng(6)
+    n_stations, n = 8, 50
+    data = {'T_min': rng.random((n_stations, n))*10, 'T_max': 15 + rng.random((n_stations, n))*10}
+    site = dict(z_msl=100, lat=-40, day_of_year=np.arange(1, n + 1))
+    Kc = rng.random((n_stations, n))
+
+    with StationPool(2) as pool:
+        res = eto_parallel(data, 'D', pool=pool, method='etc', Kc=Kc, stations_per_task=1, **site)
+    np.testing.assert_array_equal(res, ETo(data, 'D', **site).etc(Kc=Kc))
+
+
+###############################
+### Group 26: Multi-threaded chunked evaluation
+
+@pytest.mark.parametrize('engine', ['numpy', 'numba'])
+@pytest.mark.parametrize('freq', ['D', 'M'])
+def test_eto_fused_threads_match_single_pass(daily_data, daily_params, engine, freq):
+    if engine == 'numba':
+        pytest.importorskip('numba')
+    data, dates = daily_data
+    kwargs = dict(dates=dates, engine=engine, params=('G', 'est_val'), **daily_params)
+    eto, ts = eto_fused(data, freq, **kwargs)
+    eto_t, ts_t = eto_fused(data, freq, n_threads=3, chunk_size=500, **kwargs)
+    np.testing.assert_array_equal(eto_t, eto)
+    np.testing.assert_array_equal(ts_t['G'], ts['G'])
+    np.testing.assert_array_equal(ts_t['est_val'], ts['est_val'])
+
+
+@pytest.mark.parametrize('freq', ['D', 'M'])
+def test_eto_grid_threads_match_single_pass(freq):
+    rng = np.random.default_rng(6)
+    n = 48
+    data = {'T_min': rng.random((n, 3, 4))*10, 'T_max': 15 + rng.random((n, 3, 4))*10,
+            'T_mean': np.where(rng.random((n, 3, 4)) < 0.3, np.nan, 12.0), 'RH_mean': 50 + rng.random((n, 3, 4))*20}
+    kwargs = dict(z_msl=100, lat=np.array([-45.0, -43.0, -41.0]), day_of_year=np.arange(n) + 1)
+    np.testing.assert_array_equal(eto_grid(data, freq, n_threads=4, chunk_size=50, **kwargs), eto_grid(data, freq, **kwargs))
+
+
+###############################
+### Group 27: Stage profiling
+
+def test_stage_profiler(daily_data, daily_params):
+    data, dates = daily_data
+    calls = []
+    profiler = StageProfiler(callback=lambda *args: calls.append(args))
+    et = ETo(data, 'D', dates=dates, profiler=profiler, **daily_params)
+    eto = et.eto_fao()
+    et.ts_param['T_dew']
+    report = profiler.report()
+    for stage in ('validate', 'P', 'e_a', 'T_dew', 'R_a', 'R_s', 'R_nl', 'G', 'U_2', 'eto_fao'):
+        assert report[stage]['calls'] == 1
+    assert report['eto_fao']['rows'] == eto.size
+    assert report['R_s']['filled'] == np.count_nonzero(np.isnan(data['R_s']))
+    assert report['total']['seconds'] >= sum(report[s]['seconds'] for s in ('R_a', 'eto_fao'))
+    assert len(calls) == report['total']['calls']
+    np.testing.assert_array_equal(eto, ETo(data, 'D', dates=dates, **daily_params).eto_fao())
+
+
+def test_profiler_exit_mismatch():
+    profiler = StageProfiler()
+    profiler.enter('R_a')
+    profiler.enter('R_s')
+    with pytest.raises(ValueError, match='innermost stage'):
+        profiler.exit('R_a')
+    profiler.exit('R_s')
+    profiler.exit('R_a')
+    with pytest.raises(ValueError):
+        profiler.exit('R_a')
+    assert profiler.report()['total']['calls'] == 2
+
+
+def test_profiler_disabled(daily_et):
+    assert daily_et.ts_param.profiler is None
+    with pytest.raises(TypeError):
+        ETo({'T_min': np.ones(2), 'T_max': np.ones(2)}, 'D', lat=-43.6, day_of_year=np.array([1, 2]), profiler='yes')
+
+
+###############################
+### Group 28: Memory accounting
+
+def test_memory_usage(daily_et):
+    n = daily_et.ts_param.shape[0]
+    before = daily_et.ts_param.memory_usage()
+    assert before['T_min'] == n*8
+    daily_et.eto_fao()
+    usage = daily_et.ts_param.memory_usage()
+    assert usage['R_a'] == n*8
+    assert usage['total'] == sum(v for k, v in usage.items() if k != 'total')
+    daily_et.etc(Kc=1.1)
+    assert daily_et.ts_param.memory_usage()['results'] == n*8
+
+
+@pytest.mark.parametrize('dtype', [np.float64, np.float32])
+@pytest.mark.parametrize('freq, method, keys', [('D', 'eto_fao', ('T_min', 'T_max')), ('D', 'eto_fao', ('T_min', 'T_max', 'R_s', 'RH_mean', 'U_z')),
+                                              ('h', 'eto_fao', ('T_mean', 'RH_mean')), ('D', 'eto_hargreaves', ('T_min', 'T_max')), ('D', 'etc', ('T_min', 'T_max'))])
+def test_plan_memory_bounds_measured_peak(freq, method, keys, dtype):
+    ## The plan is built from the graph and the temporaries counted from the expressions, so it is an upper bound of the measured peak
+    n = 20000
+    rng = np.random.default_rng(7)
+    ranges = {'T_min': (0, 10), 'T_max': (15, 25), 'T_mean': (5, 15), 'RH_mean': (50, 70), 'R_s': (5, 20), 'U_z': (0, 3)}
+    data = {k: (ranges[k][0] + rng.random(n)*(ranges[k][1] - ranges[k][0])).astype(dtype) for k in keys}
+    kwargs = dict(z_msl=100, lat=-43.6, lon=172, TZ_lon=173, day_of_year=np.arange(n) % 365 + 1, hour=np.arange(n) % 24 if freq == 'h' else None, dtype=dtype)
+    method_kwargs = {'Kc': 1.1} if method == 'etc' else {}
+
+    for est_val in (False, True):
+        def run():
+            et = ETo(data, freq, **kwargs)
+            getattr(et, method)(**method_kwargs)
+            if est_val:
+                et.est_val
+        _, measured = measure_peak(run)
+        plan = plan_memory(n, freq, method, inputs=keys, dtype=dtype, est_val=est_val)
+        assert measured['peak'] <= plan['peak'] <= 2*measured['peak']
+
+    chunk = plan_chunk_size(plan['peak'], freq, method, inputs=keys, dtype=dtype, est_val=True)
+    assert chunk == n
+
+
+def test_measure_peak_without_reset_peak(monkeypatch):
+    ## Python 3.8 has no tracemalloc.reset_peak: an active session and its traces are left alone
+    import tracemalloc
+    monkeypatch.delattr(tracemalloc, 'reset_peak', raising=False)
+    tracemalloc.start()
+    try:
+        kept = np.ones(10**6)
+        _, measured = measure_peak(lambda: np.ones(10**5).sum())
+        assert tracemalloc.is_tracing()
+        assert tracemalloc.get_traced_memory()[0] >= kept.nbytes
+    finally:
+        tracemalloc.stop()
+    assert measured['peak'] >= 8*10**5
+
+
+def test_plan_memory_inputs():
+    base = plan_memory(1000)
+    ## R_s given: neither R_s nor _N is computed, and R_s has no estimation counts
+    with_rs = plan_memory(1000, inputs=('T_min', 'T_max', 'R_s'))
+    assert with_rs['params'] == base['params'] - 2*1000*8
+    assert with_rs['flags'] == base['flags'] - 1000
+    ## R_n given: none of the radiation terms are computed
+    with_rn = plan_memory(1000, inputs=('T_min', 'T_max', 'R_n'))
+    assert with_rn['params'] < with_rs['params'] and with_rn['transient'] < base['transient']
+    assert plan_memory(1000, est_val=True)['params'] == base['params'] + 1000*8
+    with pytest.raises(ValueError):
+        plan_memory(1000, 'h', 'eto_hargreaves')
+
+
+###############################
+### Group 29: Cached dataset loader
+
+@pytest.mark.parametrize('name', ['example_daily', 'example_daily_results'])
+def test_dataset_load_matches_csv(name, tmp_path):
+    ref_data, ref_dates = load_csv_zip(datasets.get_path(name))
+    data, dates = datasets.load(name, cache_dir=str(tmp_path))
+    assert set(data) == set(ref_data)
+    for col in ref_data:
+        np.testing.assert_array_equal(data[col], ref_data[col])
+    np.testing.assert_array_equal(dates, ref_dates)
+
+    ## Second load hits the cache and is memory-mapped
+    cached, cached_dates = datasets.load(name, cache_dir=str(tmp_path))
+    assert len(list(tmp_path.iterdir())) == 1
+    assert all(isinstance(arr, np.memmap) for arr in cached.values())
+    np.testing.assert_array_equal(cached_dates, ref_dates)
+
+    uncached, _ = datasets.load(name, cache=False)
+    for col in ref_data:
+        np.testing.assert_array_equal(uncached[col], ref_data[col])
+
+
+def test_dataset_load_hash_and_cleanup(tmp_path, monkeypatch):
+    ## The data file is hashed once per process
+    datasets.load('example_daily', cache_dir=str(tmp_path / 'a'))
+    monkeypatch.setattr(datasets.hashlib, 'sha256', None)
+    datasets.load('example_daily', cache_dir=str(tmp_path / 'a'))
+
+    ## A failed cache write leaves no temporary directory behind
+    def fail(*args, **kwargs):
+        raise OSError('disk full')
+    monkeypatch.setattr(datasets.np, 'save', fail)
+    data, _ = datasets.load('example_daily', cache_dir=str(tmp_path / 'b'))
+    assert 'T_min' in data
+    assert list((tmp_path / 'b').iterdir()) == []
+
+
+def test_dataset_load_eto(tmp_path, daily_params):
+    data, dates = datasets.load('example_daily', cache_dir=str(tmp_path))
+    results, _ = datasets.load('example_daily_results', cache_dir=str(tmp_path))
+    et = ETo(data, 'D', dates=dates, **daily_params)
+    np.testing.assert_allclose(np.nansum(et.eto_fao()), np.nansum(results['ETo_FAO_mm']), rtol=1e-4)
+
+
+###############################
+### Group 30: Memory-mapped windows
+
+def test_eto_memmap_matches_batch(daily_data, daily_params, tmp_path):
+    data, dates = daily_data
+    files = {}
+    for name, arr in data.items():
+        np.save(tmp_path / f'{name}.npy', arr)
+        files[name] = np.load(tmp_path / f'{name}.npy', mmap_mode='r')
+
+    ref = ETo(data, 'D', dates=dates, **daily_params)
+    out = eto_memmap(files, tmp_path / 'eto.npy', 'D', dates=dates, window=1000,
+                     params={'R_n': tmp_path / 'R_n.npy'}, **daily_params)
+    assert isinstance(out, np.memmap)
+    np.testing.assert_array_equal(np.load(tmp_path / 'eto.npy'), ref.eto_fao())
+    np.testing.assert_array_equal(np.load(tmp_path / 'R_n.npy'), ref.ts_param['R_n'])
+
+    Kc = np.linspace(0.3, 1.2, len(dates))
+    etc = eto_memmap(files, np.empty(len(dates)), 'D', dates=dates, memory_limit=10**6, method='etc', Kc=Kc, **daily_params)
+    np.testing.assert_array_equal(etc, ref.etc(Kc=Kc))
+
+
+def test_eto_memmap_monthly_carries_state():
+    rng = np.random.default_rng(3)
+    data = {'T_min': rng.random((2, 40))*10, 'T_max': 15 + rng.random((2, 40))*10}
+    dates = np.arange('2000-01', '2003-05', dtype='datetime64[M]')
+    ref = ETo(data, 'M', z_msl=100, lat=-43.6, dates=dates).eto_fao()
+    out = eto_memmap(data, np.empty((2, 40)), 'M', z_msl=100, lat=-43.6, dates=dates, window=7)
+    np.testing.assert_array_equal(out, ref)
+    with pytest.raises(ValueError):
+        eto_memmap(data, np.empty(40), 'M', z_msl=100, lat=-43.6, dates=dates)
+
+
+###############################
+### Group 31: Estimation flags bitmask
+
+def test_est_flags_matches_est_val(daily_data, daily_params):
+    data, dates = daily_data
+    data = {k: v.copy() for k, v in data.items()}
+    data['e_a'][::7] = np.nan
+    et = ETo(data, 'D', dates=dates, **daily_params)
+    flags = et.est_flags
+    assert flags.dtype == np.uint16
+    assert flags.nbytes*4 == et.est_val.nbytes
+    np.testing.assert_array_equal(est_val_from_flags(flags), et.est_val)
+    np.testing.assert_array_equal(flags_from_est_val(et.est_val), flags)
+
+    ## e_a falls back to T_min on the gaps, R_s to the temperature range
+    e_a_rows = flags & flag_mask('e_a') != 0
+    np.testing.assert_array_equal(e_a_rows, np.isnan(data['e_a']))
+    assert np.array_equal(decode_flags(flags)['e_a_T_min'], e_a_rows)
+    np.testing.assert_array_equal(flags & flag_mask('R_s') == EST_FLAGS['R_s_T_range'], np.isnan(data['R_s']))
+    with pytest.raises(ValueError):
+        flag_mask('RH')
+
+
+def test_flag_counts():
+    flags = np.array([[EST_FLAGS['P'], EST_FLAGS['P'] | EST_FLAGS['G'], 0, EST_FLAGS['G']]], dtype=np.uint16)
+    counts = flag_counts(flags)
+    assert counts['P'].tolist() == [2]
+    assert counts['G'].tolist() == [2]
+    periods = np.array(['2001', '2000', '2001', '2000'], dtype='datetime64[Y]')
+    by_period = flag_counts(flags, periods)
+    assert by_period['P'].tolist() == [[1, 1]]
+    assert by_period['G'].tolist() == [[2, 0]]
+
+
+###############################
+### Group 32: Validation report
+
+def test_validation_report():
+    data = {
+        'R_s': np.array([[np.nan, 12.0, 14.0], [11.0, 10.0, 9.0]]),
+        'T_min': np.array([[10.0, 12.0, 8.0], [11.0, -70.0, 9.0]]),
+        'T_max': np.array([[25.0, 28.0, 27.0], [26.0, 27.0, 29.0]]),
+        'RH_mean': np.array([[60.0, 110.0, 50.0], [np.nan, np.nan, 40.0]]),
+        'P': np.array([[100.0, 0.0, 100.0], [100.0, 100.0, 100.0]]),
+    }
+    with pytest.warns(UserWarning) as record:
+        report = validate_inputs(data, 'D')
+    assert len(record) == 3
+    assert report['out_of_range'] == {'R_s': 0, 'T_min': 1, 'T_max': 0, 'RH_mean': 1, 'P': 1}
+    assert report['first_index'] == {'R_s': None, 'T_min': (1, 1), 'T_max': None, 'RH_mean': (0, 1), 'P': (0, 1)}
+    assert report['missing'] == {'R_s': 1, 'T_min': 0, 'T_max': 0, 'RH_mean': 2, 'P': 0}
+    assert not report['ok']
+    coverage = report['coverage']
+    assert coverage.shape == (len(report['keys']), 2)
+    np.testing.assert_allclose(coverage[report['keys'].index('RH_mean')], [1, 1/3])
+    np.testing.assert_allclose(coverage[report['keys'].index('U_z')], [0, 0])
+
+
+def test_validate_modes():
+    data = {'T_min': np.array([-60.0, 12.0]), 'T_max': np.array([25.0, 28.0])}
+    _, dates = make_daily_data(data, n_days=2)
+    with pytest.raises(ValueError, match='T_min has values outside.*first at 0'):
+        ETo(data, 'D', z_msl=100, lat=-43.6, dates=dates, validate='strict')
+    et = ETo(data, 'D', z_msl=100, lat=-43.6, dates=dates, validate='off')
+    assert et.validation['mode'] == 'off'
+    assert et.validation['out_of_range'] == {}
+    with pytest.warns(UserWarning):
+        et = ETo(data, 'D', z_msl=100, lat=-43.6, dates=dates, validate=True)
+    assert et.validation['out_of_range']['T_min'] == 1
+    with pytest.raises(ValueError, match='validate must be'):
+        ETo(data, 'D', z_msl=100, lat=-43.6, dates=dates, validate='loud')
+
+
+###############################
+### Group 33: Period aggregation
+
+def test_hourly_to_daily_aggregation(hourly_et):
+    eto = hourly_et.eto_fao()
+    daily = hourly_et.aggregate()
+    n_days = len(eto)//24
+    assert daily['period'][0] == np.datetime64('2000-01-01')
+    assert len(daily['period']) == n_days
+    np.testing.assert_allclose(daily['values'], eto.reshape(n_days, 24).sum(axis=1))
+    assert (daily['expected'] == 24).all() and daily['complete'].all()
+
+    etc = hourly_et.aggregate('etc', Kc=1.1)
+    np.testing.assert_allclose(etc['values'], hourly_et.etc(Kc=1.1).reshape(n_days, 24).sum(axis=1))
+
+    monthly = hourly_et.aggregate(period='M', how='mean')
+    assert monthly['period'][1] == np.datetime64('2000-02')
+    assert monthly['expected'][1] == 29*24
+    np.testing.assert_allclose(monthly['values'][0], eto[:31*24].mean())
+
+
+def test_aggregate_counts_partial_periods():
+    dates = np.arange('2020-01-01T00', '2020-01-03T00', dtype='datetime64[h]')[3:]
+    values = np.ones((2, len(dates)))
+    values[1, 30:] = np.nan
+    result = aggregate(values, dates, min_count=20)
+    assert result['count'].tolist() == [[21, 24], [21, 9]]
+    assert result['complete'].tolist() == [[False, True], [False, False]]
+    np.testing.assert_array_equal(result['values'], [[21, 24], [21, np.nan]])
+
+    by_day = aggregate(values[0], day_of_year=np.repeat([1, 2], [21, 24]), how='max')
+    assert by_day['period'].tolist() == [1, 2]
+    assert by_day['expected'] is None
+    with pytest.raises(ValueError):
+        aggregate(values, dates, how='median')
+
+
+###############################
+### Group 34: Gap filling
+
+def test_interpolate_gaps_max_gap():
+    x = np.array([[1.0, np.nan, np.nan, 4.0, np.nan], [np.nan, 1.0, np.nan, 3.0, 4.0]])
+    np.testing.assert_array_equal(interpolate_gaps(x), [[1, 2, 3, 4, np.nan], [np.nan, 1, 2, 3, 4]])
+    np.testing.assert_array_equal(interpolate_gaps(x, max_gap=1), [[1, np.nan, np.nan, 4, np.nan], [np.nan, 1, 2, 3, 4]])
+    assert np.isnan(x[0, 1])
+
+
+def test_climatology_and_neighbour_fill():
+    day_of_year = np.tile(np.arange(1, 4), 3)
+    x = np.array([1.0, 2, 3, 3, 4, 5, np.nan, np.nan, 7])
+    np.testing.assert_array_equal(climatology_fill(x, day_of_year)[6:8], [2, 3])
+
+    stations = np.array([[10.0, 11, 12, 13], [12.0, 13, np.nan, 15], [14.0, 15, 16, np.nan]])
+    filled = neighbour_fill(stations)
+    np.testing.assert_allclose(filled[1, 2], 14)
+    np.testing.assert_allclose(filled[2, 3], 17)
+    np.testing.assert_allclose(neighbour_fill(stations, adjust=False)[1, 2], 14)
+
+
+def test_fill_gaps_recorded_in_est_val(daily_data, daily_params):
+    data, dates = daily_data
+    data = {k: v.copy() for k, v in data.items()}
+    data['T_min'][10] = np.nan
+    data['T_max'][100:110] = np.nan
+    with pytest.raises(ValueError, match='Minimum data input'):
+        ETo(data, 'D', dates=dates, **daily_params)
+
+    filled_data, filled = fill_gaps(data, dates, max_gap=3)
+    assert filled[10] == 1 and (filled[100:110] == 2).all()
+    assert np.count_nonzero(filled) == 11
+    assert np.isnan(filled_data['R_s']).sum() == np.isnan(data['R_s']).sum()
+    et = ETo(filled_data, 'D', dates=dates, filled=filled, **daily_params)
+    assert et.est_val[10] // 10000000 == 1
+    assert et.est_val[100] // 10000000 == 2
+    assert et.est_flags[100] & flag_mask('filled') == EST_FLAGS['filled_climatology']
+    with pytest.raises(ValueError, match='Unknown fill method'):
+        fill_gaps(data, dates, methods=('spline',))
+
+
+###############################
+### Group 35: Monthly mode
+
+def test_monthly_mid_month_day():
+    months = np.arange('2001-01', '2002-01', dtype='datetime64[M]')
+    data = {'T_min': np.full(12, 8.0), 'T_max': np.full(12, 20.0)}
+    et = ETo(data, 'M', z_msl=100, lat=-43.6, dates=months)
+    np.testing.assert_array_equal(et.ts_param.time['day_of_year'], [15, 45, 76, 106, 137, 167, 197, 228, 258, 289, 319, 349])
+    ## Daily dates within the months give the same day numbers
+    days = months.astype('datetime64[D]') + 9
+    np.testing.assert_array_equal(ETo(data, 'M', z_msl=100, lat=-43.6, dates=days).eto_fao(), et.eto_fao())
+
+
+def test_monthly_inputs_from_daily(daily_data, daily_params):
+    data, dates = daily_data
+    monthly, months, days = monthly_inputs(data, dates, min_count={'R_s': 20})
+    assert months[0] == np.datetime64('2000-01') and len(months) == len(np.unique(dates.astype('datetime64[M]')))
+    assert days['T_max'][:2].tolist() == [31, 29]
+    jan = dates < np.datetime64('2000-02-01')
+    np.testing.assert_allclose(monthly['T_max'][0], np.nanmean(data['T_max'][jan]))
+
+    totals, _, _ = monthly_inputs({'R_s': data['R_s']}, dates, how={'R_s': 'sum'})
+    np.testing.assert_allclose(totals['R_s'][0], np.nansum(data['R_s'][jan]))
+
+    eto_monthly = ETo(monthly, 'M', dates=months, **daily_params).eto_fao()
+    eto_daily = ETo(data, 'D', dates=dates, **daily_params).aggregate(period='M', how='mean')['values']
+    np.testing.assert_allclose(eto_monthly, eto_daily, atol=0.25)
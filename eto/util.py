@@ -2,3 +2,112 @@
 """
 Utility functions.
 """
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+
+def jit(func):
+    """
+    Compile a scalar kernel with numba when it is installed. Without numba the function is returned unchanged, so callers should check ``numba is not None`` before relying on it for speed.
+    """
+    if numba is None:
+        return func
+    return numba.njit(nogil=True, cache=False)(func)
+
+
+def resolve_engine(engine):
+    """
+    Resolve an engine name ('auto', 'numba' or 'numpy') to the engine that will actually be used.
+    """
+    if engine == 'auto':
+        return 'numba' if numba is not None else 'numpy'
+    if engine == 'numba':
+        if numba is None:
+            raise ImportError("engine='numba' requires the optional numba package")
+        return engine
+    if engine == 'numpy':
+        return engine
+    raise ValueError(f"engine must be 'auto', 'numba' or 'numpy', got '{engine}'")
+
+
+def data_shape(data):
+    """
+    Check that data is a dict of equally shaped arrays and return that shape (an empty tuple for empty data).
+    """
+    if not isinstance(data, dict):
+        raise TypeError('data must be a dict of str to np.ndarray')
+    shapes = [np.shape(v) for v in data.values()]
+    if shapes and len(set(shapes)) > 1:
+        raise ValueError('All arrays in data must have the same length')
+    return shapes[0] if shapes else ()
+
+
+def mid_month_day(month):
+    """
+    FAO 56 day number of the middle of each month (1-12), J = int(30.4 M - 15), used for monthly data.
+    """
+    return (30.4*np.asarray(month) - 15).astype(int)
+
+
+def temporal_arrays(freq, n, day_of_year=None, hour=None, dates=None):
+    """
+    Derive and check the day of year and hour arrays used for the radiation calculations.
+
+    Parameters
+    ----------
+    freq : str
+        Time frequency: 'D' for daily, 'H' or 'h' for hourly, 'M' for monthly.
+    n : int
+        Length of the time axis of the data arrays.
+    day_of_year : np.ndarray of int, or None
+        Day of year (1-366). Required if dates is not provided.
+    hour : np.ndarray of int, or None
+        Hour of day (0-23). Required for hourly frequency if dates is not provided.
+    dates : np.ndarray of datetime64, or None
+        Datetime array. Used to derive day_of_year and hour if they are not provided. For monthly data the day of year is the FAO 56 mid-month day (see mid_month_day).
+
+    Returns
+    -------
+    tuple of np.ndarray
+        day_of_year and hour (None for non-hourly frequencies).
+    """
+    if dates is not None:
+        dates = np.asarray(dates)
+        if freq.upper() == 'M':
+            day_of_year = mid_month_day(dates.astype('datetime64[M]').astype(int) % 12 + 1)
+        else:
+            day_of_year = (dates.astype('datetime64[D]') - dates.astype('datetime64[Y]')).astype(int) + 1
+        if 'h' in freq.lower():
+            hour = (dates - dates.astype('datetime64[D]')).astype('timedelta64[h]').astype(int)
+    elif day_of_year is not None:
+        day_of_year = np.asarray(day_of_year)
+    else:
+        raise ValueError('Either dates or day_of_year must be provided')
+
+    if np.shape(day_of_year)[-1] != n:
+        raise ValueError('day_of_year length must match data array length')
+    if 'h' in freq.lower():
+        if hour is None:
+            raise ValueError('hour array or dates must be provided for hourly frequency')
+        hour = np.asarray(hour)
+        if np.shape(hour)[-1] != n:
+            raise ValueError('hour length must match data array length')
+    else:
+        hour = None
+
+    return day_of_year, hour
+
+
+def out_array(out, shape, dtype):
+    """
+    Return out after checking that it can hold a result of the given shape, or a new array if out is None.
+    """
+    if out is None:
+        return np.empty(shape, dtype=dtype)
+    if not isinstance(out, np.ndarray) or out.shape != tuple(shape):
+        raise ValueError(f'out must be a np.ndarray of shape {tuple(shape)}')
+    return out
@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+"""
+Daily root zone soil water balance (FAO 56 chapter 8) run for many fields at once.
+"""
+import math
+import numpy as np
+from eto.util import jit, resolve_engine
+from eto.methods.ETo import eto_fao_cached
+from eto.crop_coefficients import kc_max
+
+
+def _field_arrays(ETc, *args):
+    """
+    Broadcast ETc and the balance terms to a common (n_fields, n_time) float64 shape without copying.
+    """
+    arrays = [np.asarray(a, dtype=np.float64) for a in (ETc,) + args]
+    shape = np.broadcast_shapes(*(a.shape for a in arrays))
+    arrays = [np.broadcast_to(a, shape) for a in arrays]
+    if len(shape) == 0:
+        raise ValueError('ETc must have a time axis')
+    if len(shape) == 1:
+        arrays = [a.reshape(1, -1) for a in arrays]
+    return arrays, shape
+
+
+def _root_zone_rows(ETc, TAW, p, P, I, RO, CR, Dr_0, out_Dr, out_Ks, out_ETc_adj, out_DP):
+    """
+    Scalar kernel of the root zone depletion recurrence. The fields are independent, so each one is run through time in turn to walk the row-major arrays contiguously.
+    """
+    n_fields, n_time = out_Dr.shape
+    for f in range(n_fields):
+        Dr = Dr_0[f]
+        for t in range(n_time):
+            taw = TAW[f, t]
+            # No readily available water band (p >= 1): no stress until the root zone is empty
+            raw = (1 - p[f, t])*taw
+            Ks = 1.0 if raw <= 0 else min(max((taw - Dr)/raw, 0.0), 1.0)
+            ETc_adj = Ks*ETc[f, t]
+            Dr = Dr - (P[f, t] - RO[f, t]) - I[f, t] - CR[f, t]
+            if not math.isnan(ETc_adj):
+                Dr += ETc_adj
+            DP = 0.0
+            if Dr < 0:
+                DP = -Dr
+                Dr = 0.0
+            elif Dr > taw:
+                Dr = taw
+            out_Ks[f, t] = Ks
+            out_ETc_adj[f, t] = ETc_adj
+            out_DP[f, t] = DP
+            out_Dr[f, t] = Dr
+
+
+_root_zone_rows_jit = jit(_root_zone_rows)
+
+
+def _root_zone_numpy(ETc, TAW, p, P, I, RO, CR, Dr_0, out_Dr, out_Ks, out_ETc_adj, out_DP):
+    """
+    Pure-NumPy version of _root_zone_rows: the time steps are looped over and the fields vectorised.
+    """
+    Dr = Dr_0.copy()
+    for t in range(out_Dr.shape[1]):
+        taw = TAW[:, t]
+        raw = (1 - p[:, t])*taw
+        with np.errstate(divide='ignore', invalid='ignore'):
+            Ks = np.where(raw <= 0, 1.0, np.clip((taw - Dr)/raw, 0, 1))
+        ETc_adj = Ks*ETc[:, t]
+        Dr = Dr - (P[:, t] - RO[:, t]) - I[:, t] - CR[:, t] + np.nan_to_num(ETc_adj, nan=0.0)
+        out_DP[:, t] = np.maximum(-Dr, 0)
+        Dr = np.minimum(np.maximum(Dr, 0), taw)
+        out_Ks[:, t] = Ks
+        out_ETc_adj[:, t] = ETc_adj
+        out_Dr[:, t] = Dr
+
+
+def root_zone_balance(ETc, TAW, p=0.5, P=0, I=0, RO=0, CR=0, Dr_0=0, engine='auto'):
+    """
+    Daily root zone depletion (FAO 56 Eq 85) and water stress coefficient (FAO 56 Eq 84) for many fields at once.
+
+    Each day Ks is computed from the depletion at the end of the previous day, the crop uses ETc_adj = Ks*ETc, and the depletion becomes Dr = Dr_prev - (P - RO) - I - CR + ETc_adj. Water above field capacity is lost to deep percolation (DP) and the depletion is limited to TAW. Days with a missing (NaN) ETc do not deplete the root zone.
+
+    Parameters
+    ----------
+    ETc : np.ndarray
+        Crop evapotranspiration under standard conditions (mm), either (n_time,) for one field or (n_fields, n_time).
+    TAW : float or np.ndarray
+        Total available water in the root zone (mm). Scalar, per field (n_fields, 1) or per field and day (n_fields, n_time).
+    p : float or np.ndarray
+        Depletion fraction for no stress (default 0.5), broadcast like TAW. Ks is 1 where p >= 1.
+    P : float or np.ndarray
+        Precipitation (mm), broadcast like TAW.
+    I : float or np.ndarray
+        Net irrigation depth (mm), broadcast like TAW.
+    RO : float or np.ndarray
+        Surface runoff (mm), broadcast like TAW.
+    CR : float or np.ndarray
+        Capillary rise from the groundwater table (mm), broadcast like TAW.
+    Dr_0 : float or np.ndarray
+        Root zone depletion at the start (mm), scalar or one value per field. Default 0 (field capacity).
+    engine : str
+        'auto' (default) uses the compiled numba kernel when numba is installed and the NumPy version otherwise; 'numba' or 'numpy' force one of them.
+
+    Returns
+    -------
+    dict of str to np.ndarray
+        'Dr' (depletion at the end of each day), 'Ks', 'ETc_adj' and 'DP' (deep percolation), each with the broadcast shape of the inputs. The balance is always run in float64, as the depletion is accumulated over the whole season.
+    """
+    engine = resolve_engine(engine)
+    (ETc, TAW, p, P, I, RO, CR), shape = _field_arrays(ETc, TAW, p, P, I, RO, CR)
+    n_fields = ETc.shape[0]
+    Dr_0 = np.broadcast_to(np.asarray(Dr_0, dtype=np.float64).reshape(-1), (n_fields,))
+    if (TAW <= 0).any():
+        raise ValueError('TAW must be positive')
+
+    out = {key: np.empty(ETc.shape) for key in ('Dr', 'Ks', 'ETc_adj', 'DP')}
+    if engine == 'numba':
+        _root_zone_rows_jit(ETc, TAW, p, P, I, RO, CR, np.ascontiguousarray(Dr_0), out['Dr'], out['Ks'], out['ETc_adj'], out['DP'])
+    else:
+        _root_zone_numpy(ETc, TAW, p, P, I, RO, CR, Dr_0, out['Dr'], out['Ks'], out['ETc_adj'], out['DP'])
+
+    return {key: value.reshape(shape) for key, value in out.items()}
+
+
+def etc_balance(self, Kc, TAW, p=0.5, P=0, I=0, RO=0, CR=0, Dr_0=0, engine='auto', **kwargs):
+    """
+    Run the root zone soil water balance (see root_zone_balance) on ETc = Kc * ETo for many fields, sharing one ETo evaluation.
+
+    Parameters
+    ----------
+    Kc : float or np.ndarray
+        Crop coefficient, e.g. a (n_fields, n_time) array from kc_curve().
+    TAW, p, P, I, RO, CR, Dr_0, engine
+        See root_zone_balance.
+    **kwargs
+        Passed to eto_fao(), whose result is memoised per instance.
+
+    Returns
+    -------
+    dict of str to np.ndarray
+        'Dr', 'Ks', 'ETc_adj' and 'DP' (mm), in float64 whatever the working dtype of the instance (see root_zone_balance).
+    """
+    ETc = np.asarray(Kc, dtype=np.float64)*eto_fao_cached(self, **kwargs)
+    return root_zone_balance(ETc, TAW, p, P, I, RO, CR, Dr_0, engine)
+
+
+def _evaporation_rows(ETo, Kcb, Kc_max, TEW, REW, few, fw, P, RO, I, De_0, out_De, out_Kr, out_Ke, out_E, out_ETc, out_DPe):
+    """
+    Scalar kernel of the surface layer depletion recurrence, run for each field through time.
+    """
+    n_fields, n_time = out_De.shape
+    for f in range(n_fields):
+        De = De_0[f]
+        for t in range(n_time):
+            tew = TEW[f, t]
+            rew = REW[f, t]
+            Kr = 1.0
+            if De > rew:
+                Kr = max((tew - De)/(tew - rew), 0.0)
+            Ke = min(Kr*(Kc_max[f, t] - Kcb[f, t]), few[f, t]*Kc_max[f, t])
+            Ke = max(Ke, 0.0)
+            E = Ke*ETo[f, t]
+            infil = P[f, t] - RO[f, t] + I[f, t]/fw[f, t]
+            DPe = max(infil - De, 0.0)
+            De = De - infil
+            if few[f, t] > 0 and not math.isnan(E):
+                De += E/few[f, t]
+            De += DPe
+            De = min(max(De, 0.0), tew)
+            out_De[f, t] = De
+            out_Kr[f, t] = Kr
+            out_Ke[f, t] = Ke
+            out_E[f, t] = E
+            out_ETc[f, t] = (Kcb[f, t] + Ke)*ETo[f, t]
+            out_DPe[f, t] = DPe
+
+
+_evaporation_rows_jit = jit(_evaporation_rows)
+
+
+def _evaporation_numpy(ETo, Kcb, Kc_max, TEW, REW, few, fw, P, RO, I, De_0, out_De, out_Kr, out_Ke, out_E, out_ETc, out_DPe):
+    """
+    Pure-NumPy version of _evaporation_rows: the time steps are looped over and the fields vectorised.
+    """
+    De = De_0.copy()
+    for t in range(out_De.shape[1]):
+        tew = TEW[:, t]
+        rew = REW[:, t]
+        Kr = np.where(De > rew, np.maximum((tew - De)/(tew - rew), 0), 1.0)
+        Ke = np.maximum(np.minimum(Kr*(Kc_max[:, t] - Kcb[:, t]), few[:, t]*Kc_max[:, t]), 0)
+        E = Ke*ETo[:, t]
+        infil = P[:, t] - RO[:, t] + I[:, t]/fw[:, t]
+        DPe = np.maximum(infil - De, 0)
+        De = De - infil
+        wet = (few[:, t] > 0) & ~np.isnan(E)
+        De[wet] += E[wet]/few[wet, t]
+        De += DPe
+        De = np.minimum(np.maximum(De, 0), tew)
+        out_De[:, t] = De
+        out_Kr[:, t] = Kr
+        out_Ke[:, t] = Ke
+        out_E[:, t] = E
+        out_ETc[:, t] = (Kcb[:, t] + Ke)*ETo[:, t]
+        out_DPe[:, t] = DPe
+
+
+def evaporation_layer(ETo, Kcb, Kc_max, TEW, REW, fc=0, fw=1, P=0, RO=0, I=0, De_0=0, engine='auto'):
+    """
+    Daily evaporation layer depletion (FAO 56 Eq 77) and soil evaporation coefficient (FAO 56 Eq 71) of the dual crop coefficient method for many fields at once.
+
+    Each day Kr is 1 while the cumulative depth of evaporation De of the previous day is within REW and falls linearly to 0 at TEW (Eq 74). Ke = min(Kr*(Kc_max - Kcb), few*Kc_max) (Eq 71) with few = min(1 - fc, fw) (Eq 75), and the surface layer depletion becomes De = De_prev - (P - RO) - I/fw + E/few + DPe, limited to [0, TEW], where DPe is the water draining below the layer (Eq 79). Transpiration from the surface layer is neglected.
+
+    Parameters
+    ----------
+    ETo : np.ndarray
+        Reference ET (mm), either (n_time,) shared by all fields or (n_fields, n_time).
+    Kcb : float or np.ndarray
+        Basal crop coefficient. Scalar, per field (n_fields, 1) or per field and day (n_fields, n_time).
+    Kc_max : float or np.ndarray
+        Upper limit of Kc following wetting (see kc_max), broadcast like Kcb.
+    TEW : float or np.ndarray
+        Total evaporable water of the surface layer (mm), broadcast like Kcb.
+    REW : float or np.ndarray
+        Readily evaporable water (mm), broadcast like Kcb.
+    fc : float or np.ndarray
+        Fraction of the soil surface covered by vegetation (0-1), broadcast like Kcb.
+    fw : float or np.ndarray
+        Fraction of the soil surface wetted by irrigation or rain (0.01-1), broadcast like Kcb.
+    P : float or np.ndarray
+        Precipitation (mm), broadcast like Kcb.
+    RO : float or np.ndarray
+        Precipitation runoff (mm), broadcast like Kcb.
+    I : float or np.ndarray
+        Irrigation depth (mm), broadcast like Kcb.
+    De_0 : float or np.ndarray
+        Depletion of the surface layer at the start (mm), scalar or one value per field. Default 0 (wet soil).
+    engine : str
+        'auto' (default) uses the compiled numba kernel when numba is installed and the NumPy version otherwise; 'numba' or 'numpy' force one of them.
+
+    Returns
+    -------
+    dict of str to np.ndarray
+        'De', 'Kr', 'Ke', 'E' (soil evaporation, mm), 'ETc' ((Kcb + Ke)*ETo, mm) and 'DPe' (mm), each with the broadcast shape of the inputs.
+    """
+    engine = resolve_engine(engine)
+    fc = np.asarray(fc, dtype=np.float64)
+    fw = np.asarray(fw, dtype=np.float64)
+    few = np.minimum(1 - fc, fw)
+    (ETo, Kcb, Kc_max, TEW, REW, few, fw, P, RO, I), shape = _field_arrays(ETo, Kcb, Kc_max, TEW, REW, few, fw, P, RO, I)
+    n_fields = ETo.shape[0]
+    De_0 = np.broadcast_to(np.asarray(De_0, dtype=np.float64).reshape(-1), (n_fields,))
+    if (REW >= TEW).any():
+        raise ValueError('REW must be less than TEW')
+    if (fw <= 0).any():
+        raise ValueError('fw must be positive')
+
+    keys = ('De', 'Kr', 'Ke', 'E', 'ETc', 'DPe')
+    out = {key: np.empty(ETo.shape) for key in keys}
+    args = (ETo, Kcb, Kc_max, TEW, REW, few, fw, P, RO, I)
+    if engine == 'numba':
+        _evaporation_rows_jit(*args, np.ascontiguousarray(De_0), *(out[key] for key in keys))
+    else:
+        _evaporation_numpy(*args, De_0, *(out[key] for key in keys))
+
+    return {key: value.reshape(shape) for key, value in out.items()}
+
+
+def _rh_min(ts):
+    """RH_min from ts_param, estimated as 100*e_a/e_max (FAO 56 Eq 70) where it was not provided."""
+    RH_min = ts['RH_min']
+    missing = np.isnan(RH_min)
+    if missing.any():
+        RH_min = np.where(missing, 100*ts['e_a']/ts['e_max'], RH_min)
+    return RH_min
+
+
+def etc_dual_balance(self, Kcb, h, TEW, REW, fc=0, fw=1, P=0, RO=0, I=0, De_0=0, engine='auto', **kwargs):
+    """
+    Run the dual crop coefficient evaporation layer simulation (see evaporation_layer) for many fields against one shared ETo evaluation, with Kc_max (FAO 56 Eq 72) derived from the U_2 and RH_min of ts_param. Missing RH_min is estimated from e_a and e_max (FAO 56 Eq 70).
+
+    Parameters
+    ----------
+    Kcb : float or np.ndarray
+        Basal crop coefficient. Scalar, per field (n_fields, 1) or per field and day (n_fields, n_time).
+    h : float or np.ndarray
+        Mean maximum plant height (m), broadcast like Kcb.
+    TEW, REW, fc, fw, P, RO, I, De_0, engine
+        See evaporation_layer.
+    **kwargs
+        Passed to eto_fao(), whose result is memoised per instance.
+
+    Returns
+    -------
+    dict of str to np.ndarray
+        'De', 'Kr', 'Ke', 'E', 'ETc' and 'DPe' (see evaporation_layer).
+    """
+    if 'h' in self.freq.lower():
+        raise ValueError('The evaporation layer balance should not be calculated at time frequencies of less than a day.')
+    ETo = eto_fao_cached(self, **kwargs)
+    Kcb = np.asarray(Kcb, dtype=np.float64)
+    Kc_max = kc_max(Kcb, self.ts_param['U_2'], _rh_min(self.ts_param), h)
+    return evaporation_layer(ETo, Kcb, Kc_max, TEW, REW, fc, fw, P, RO, I, De_0, engine)